@@ -1,13 +1,12 @@
 import sys
 import os
-from PyQt5.QtCore import Qt, QFile, QTextStream
+import time
+from PyQt5.QtCore import Qt, QFile, QTextStream, QCoreApplication
 from PyQt5.QtWidgets import QApplication, QSplashScreen
 from PyQt5.QtGui import QPixmap
-from PyQt5.QtWebEngineWidgets import QWebEngineView
 
 from _stylesheets import breeze_resources
 
-import plotly
 from typing import Literal
 
 
@@ -27,64 +26,105 @@ class SplashScreen(QSplashScreen):
         QApplication.processEvents()
 
 
+PROFILE_ARGUMENT = "--profile-startup"
+DEFAULT_PROFILE_PATH = "startup_profile.json"
+
+
+def parse_profile_argument(argv):
+    """
+    Removes --profile-startup[=path] from argv and returns the output path
+    of the startup profile or None if profiling was not requested.
+    """
+    output_path = None
+    for argument in list(argv[1:]):
+        if argument == PROFILE_ARGUMENT:
+            output_path = DEFAULT_PROFILE_PATH
+        elif argument.startswith(PROFILE_ARGUMENT + "="):
+            output_path = argument.split("=", 1)[1] or DEFAULT_PROFILE_PATH
+        else:
+            continue
+        argv.remove(argument)
+    return output_path
+
+
 # Run imports function
-def run_imports(splash):
+def run_imports(splash, profiler):
     """
-    Sequentially imports packages and updates the splash screen.
+    Imports the modules of the first window and updates the splash screen.
+    The remaining modules are loaded once the window is shown.
     """
-    import_list = [
-        ("Initializing module matplotlib...", "import matplotlib.pyplot as plt"),
-        ("Initializing module seaborn...", "import seaborn as sns"),
-        ("Initializing module seaborn...", "import plotly"),
-        ("Initializing module pandas...", "import pandas as pd"),
-        ("Initializing module numpy...", "import numpy as np"),
-        ("Initializing module scipy...", "import scipy"),
-        ("Initializing module sklearn...", "import sklearn"),
-        ("Initializing module scanpy...", "import scanpy"),
-        ("Initializing FACSPy...", "import FACSPy as fp"),
-    ]
-
-    for message, imp in import_list:
-        splash.show_message(message)
-        exec(imp)
+    from _main_window._startup import ModuleLoader
+
+    module_loader = ModuleLoader(profiler = profiler)
+    module_loader.load_required(splash)
+
+    return module_loader
 
 
 def main():
-    app = QApplication(sys.argv)
-    if hasattr(sys, "_MEIPASS"):
-    # Create and display the splash screen
-        pixmap = QPixmap(os.path.join(sys._MEIPASS, "_icons/facspyqt_logo.png"))
-    else:
-        pixmap = QPixmap("./_icons/facspyqt_logo.png")
-    splash = SplashScreen(pixmap)
-    splash.show()
-    run_imports(splash)
-
-    import FACSPy as fp
-    from _main_window import ToolBar
-    from _main_window._analyze_dataset import (ConfigPanel, PlotWindow)
-    from _main_window._menubar import MenuBar
+    start = time.perf_counter()
+    from _main_window._startup import StartupProfiler
+    profiler = StartupProfiler(output_path = parse_profile_argument(sys.argv),
+                               start = start)
+
+    # QtWebEngine is imported when the first plotly figure is shown. Importing
+    # it after QApplication was created requires shared OpenGL contexts.
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    with profiler.phase("QApplication"):
+        app = QApplication(sys.argv)
+    with profiler.phase("splash screen"):
+        if hasattr(sys, "_MEIPASS"):
+        # Create and display the splash screen
+            pixmap = QPixmap(os.path.join(sys._MEIPASS, "_icons/facspyqt_logo.png"))
+        else:
+            pixmap = QPixmap("./_icons/facspyqt_logo.png")
+        splash = SplashScreen(pixmap)
+        splash.show()
+    with profiler.phase("run_imports"):
+        module_loader = run_imports(splash, profiler)
+
+    with profiler.phase("import main window modules"):
+        from _main_window import ToolBar
+        from _main_window._analyze_dataset import (ConfigPanel, PlotWindow)
+        from _main_window._menubar import MenuBar
+        from _main_window._datashack import (DatasetHandle, DatasetLoadWorker,
+                                             DatasetRegistry, dataset_nbytes, copy_on_write)
+        from _main_window._theme import ThemeManager
+        from _main_window._autosave import AutosaveService, find_orphaned_sessions
+        from _main_window._jobs import JobScheduler, PRIORITY_HIGH
 
     from _main_window._paths import ICON_PATH as icon_path
     from _main_window._paths import DATA_PATH as data_path
     from _stylesheets import dark_stylesheet, light_stylesheet, breeze_resources
-    import copy
     from PyQt5.QtWidgets import (QMainWindow, QSplitter, QVBoxLayout, QHBoxLayout, QWidget, QComboBox,
                                  QLabel, QScrollArea, QSizePolicy, QPushButton, QInputDialog, QMessageBox,
                                  QFrame)
     from PyQt5.QtGui import QIcon
+    from PyQt5.QtCore import QTimer
 
     class FACSPyBrowser(QMainWindow):
-        def __init__(self, light_stylesheet, dark_stylesheet):
+        def __init__(self, theme_manager, module_loader):
             super().__init__()
 
-            self.light_stylesheet = light_stylesheet
-            self.dark_stylesheet = dark_stylesheet
-            self.set_style_sheet(which = "light")
-
-            DATASHACK = {
-                "mouse_lineages": fp.read_dataset(data_path, "mouse_lineages_downsampled.h5ad")
-            }
+            self.module_loader = module_loader
+            self.profiler = module_loader.profiler
+            # the stylesheet is set once on the application, see ThemeManager
+            self.theme_manager = theme_manager
+
+            # background calculations of all windows, see JobScheduler
+            self.jobs = JobScheduler()
+            # the demo dataset is only read from disk once it is selected
+            DATASHACK = DatasetRegistry(scheduler = self.jobs)
+            DATASHACK["mouse_lineages"] = DatasetHandle(data_path, "mouse_lineages_downsampled.h5ad")
+            self._dataset_load_workers = {}
+            # checkpoints of the modified datasets that are offered after a crash
+            self.autosave = AutosaveService(DATASHACK, scheduler = self.jobs)
+            self.autosave.checkpoint_failed.connect(
+                lambda key, error_message: self.statusBar().showMessage(f"Autosave of dataset {key} failed: {error_message}")
+            )
+            DATASHACK.signals.spill_failed.connect(
+                lambda key, error_message: self.statusBar().showMessage(f"Moving dataset {key} to disk failed: {error_message}")
+            )
 
             # Set up the main window
             self.setWindowTitle("FACSPyBrowser")
@@ -96,27 +136,26 @@ def main():
             self.DATASHACK = DATASHACK
 
             # Initialize MenuBar and ToolBar
-            self.menu_bar = MenuBar(self)
-            self.setMenuBar(self.menu_bar)
-            self.toolbar = ToolBar(self)
-            self.addToolBar(self.toolbar)
+            with self.profiler.phase("MenuBar"):
+                self.menu_bar = MenuBar(self)
+                self.setMenuBar(self.menu_bar)
+            with self.profiler.phase("ToolBar"):
+                self.toolbar = ToolBar(self)
+                self.addToolBar(self.toolbar)
 
             self.init_ui()
 
-        def get_style_sheet(self,
-                            which: Literal["light", "dark"]):
-            if which == "light":
-                self.is_dark = False
-                return self.light_stylesheet
-            else:
-                assert which == "dark"
-                self.is_dark = True
-                return self.dark_stylesheet
+        @property
+        def stylesheet(self) -> str:
+            return self.theme_manager.stylesheet
+
+        @property
+        def is_dark(self) -> bool:
+            return self.theme_manager.is_dark
 
         def set_style_sheet(self,
                             which: Literal["light", "dark"]):
-            self.stylesheet = self.get_style_sheet(which)
-            self.setStyleSheet(self.stylesheet)
+            self.theme_manager.apply(which)
 
         def init_ui(self):
             # Create a top container for the dataset selection and display
@@ -172,12 +211,14 @@ def main():
             bottom_splitter = QSplitter(Qt.Horizontal)
 
             # ConfigPanel for the left side
-            self.config_panel = ConfigPanel(self)
-            bottom_splitter.addWidget(self.config_panel)
+            with self.profiler.phase("ConfigPanel"):
+                self.config_panel = ConfigPanel(self)
+                bottom_splitter.addWidget(self.config_panel)
 
             # PlotWindow for the right side
-            self.plot_window = PlotWindow(self)
-            bottom_splitter.addWidget(self.plot_window)
+            with self.profiler.phase("PlotWindow"):
+                self.plot_window = PlotWindow(self)
+                bottom_splitter.addWidget(self.plot_window)
 
             # Connect plot requested signal
             self.config_panel.plot_requested.connect(self.plot_window.switch_to_specific_plot_window)
@@ -226,6 +267,12 @@ def main():
             """
             Triggered when a dataset is selected from the dropdown.
             """
+            selected_key = self.dataset_dropdown.currentText()
+            if isinstance(self.DATASHACK.get(selected_key), DatasetHandle):
+                self.load_dataset_in_background(selected_key)
+                self.update_current_dataset_display()
+                return
+
             if hasattr(self, "config_panel") and self.config_panel._config_panel is not None:
                 self.config_panel._config_panel.update_plotting_dropdowns()
                 self.config_panel._config_panel.update_calculation_dropdowns()
@@ -233,6 +280,85 @@ def main():
                 self.config_panel.update_plotting_tab()  # Trigger dropdown updates in ConfigPanel
             self.update_current_dataset_display()
 
+        def load_dataset_in_background(self, dataset_key):
+            """
+            Reads a lazily registered dataset without blocking the GUI.
+            """
+            handle = self.DATASHACK[dataset_key]
+            if id(handle) in self._dataset_load_workers:
+                return
+
+            worker = DatasetLoadWorker(handle)
+            worker.finished.connect(lambda: self.on_dataset_loaded(worker))
+            worker.error.connect(lambda error_message: self.on_dataset_load_error(worker, error_message))
+            self._dataset_load_workers[id(handle)] = worker
+            # the user waits for the selected dataset
+            self.jobs.submit(worker, "Load dataset", writes = False, priority = PRIORITY_HIGH)
+
+        def on_dataset_loaded(self, worker):
+            """
+            Replaces the handle by the loaded dataset. The handle is looked up by
+            identity as the entry might have been renamed while it was loading.
+            """
+            self._dataset_load_workers.pop(id(worker.handle), None)
+            dataset_key = self.DATASHACK.restore_handle(worker.handle, worker.dataset)
+            if dataset_key is not None and self.dataset_dropdown.currentText() == dataset_key:
+                self.on_dataset_selected()
+
+        def offer_checkpoint_restore(self):
+            """
+            Offers to restore the autosave checkpoints of sessions that did
+            not exit cleanly and starts autosaving this session.
+            """
+            sessions = find_orphaned_sessions()
+            if sessions:
+                checkpoints = [
+                    f"{key} (saved {time.strftime('%Y-%m-%d %H:%M', time.localtime(checkpoint['saved_at']))})"
+                    for manifest in sessions.values() for key, checkpoint in manifest.items()
+                ]
+                reply = QMessageBox.question(self, "Restore Datasets",
+                                             "FACSPyUI was not closed properly. Restore the following datasets " +
+                                             "from their last autosave checkpoint?\n\n" + "\n".join(checkpoints),
+                                             QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+                for session_dir, manifest in sessions.items():
+                    if reply != QMessageBox.Yes:
+                        self.autosave.discard_session(session_dir)
+                        continue
+                    for key, checkpoint in manifest.items():
+                        restored_key = key
+                        while restored_key in self.DATASHACK:
+                            restored_key += "-restored"
+                        # read once selected, like the demo dataset
+                        self.DATASHACK[restored_key] = DatasetHandle(session_dir, checkpoint["file"])
+                    self.autosave.restored_sessions.append(session_dir)
+                self.populate_dataset_dropdown()
+            self.autosave.start()
+
+        def closeEvent(self, event):
+            """
+            Warns about running jobs. They are aborted if they do not stop
+            in time or, if that is not safe, waited for, see JobScheduler.shutdown.
+            """
+            running = self.jobs.running_jobs()
+            if running:
+                aborted = [job.label for job in running if job.can_terminate()]
+                waited_for = [job.label for job in running if not job.can_terminate()]
+                message = ""
+                if aborted:
+                    message += "The following jobs are still running and will be aborted:\n\n" + "\n".join(aborted) + "\n\n"
+                if waited_for:
+                    message += ("The following jobs are still running and quitting waits until they stop:\n\n" +
+                                "\n".join(waited_for) + "\n\n")
+                reply = QMessageBox.question(self, "Jobs Running", message + "Quit anyway?",
+                                             QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+                if reply != QMessageBox.Yes:
+                    event.ignore()
+                    return
+            super().closeEvent(event)
+
+        def on_dataset_load_error(self, worker, error_message):
+            self._dataset_load_workers.pop(id(worker.handle), None)
+            QMessageBox.critical(self, "Error", f"Failed to load dataset: {error_message}")
 
         def _parse_dimreds(self,
                            dataset):
@@ -250,9 +376,10 @@ def main():
             n_cells, n_channels = dataset.shape
             metadata_cols = list(dataset.obs.columns)
             layers = list(dataset.layers.keys())
+            size_mb = dataset_nbytes(dataset) / 1024 ** 2
 
             return (
-                f"Dataset with {n_cells} cells and {n_channels} channels\n" +
+                f"Dataset with {n_cells} cells and {n_channels} channels ({size_mb:.1f} MB in memory)\n" +
                 "Available metadata: \n" + 
                 f"\t{', '.join(metadata_cols)}\n" + 
                 "Available data formats:\n" + 
@@ -268,11 +395,22 @@ def main():
             selected_key = self.dataset_dropdown.currentText()
             if not hasattr(self, "dataset_display"):
                 return
-            if (dataset := self.DATASHACK.get(selected_key)):
-                dataset_repr = self.create_dataset_string(dataset)
-                self.dataset_display.setText(dataset_repr)
-            else:
+            entry = self.DATASHACK.peek(selected_key)
+            if entry is None:
                 self.dataset_display.setText("")
+            elif isinstance(entry, DatasetHandle):
+                self.dataset_display.setText(entry.describe())
+            else:
+                # cached per dataset version, so switching datasets does not rebuild it
+                dataset_repr = self.DATASHACK.cached(selected_key, "summary", self.create_dataset_string)
+                self.dataset_display.setText(dataset_repr)
+
+        def on_dataset_modified(self, dataset):
+            """
+            Called by tools after they changed a dataset in place.
+            """
+            self.DATASHACK.mark_modified(dataset)
+            self.update_current_dataset_display()
 
         def load_dataset(self, dataset_key, dataset_value):
             """
@@ -290,11 +428,14 @@ def main():
             Copies the currently selected dataset.
             """
             selected_key = self.dataset_dropdown.currentText()
+            if isinstance(self.DATASHACK.get(selected_key), DatasetHandle):
+                QMessageBox.warning(self, "Warning", f"Dataset '{selected_key}' is still loading.")
+                return
             if selected_key in self.DATASHACK:
                 new_name, ok = QInputDialog.getText(self, "Copy Dataset", "Enter new dataset name:")
                 if ok and new_name:
                     if new_name not in self.DATASHACK:
-                        self.DATASHACK[new_name] = copy.deepcopy(self.DATASHACK[selected_key])
+                        self.DATASHACK[new_name] = copy_on_write(self.DATASHACK[selected_key])
                         self.populate_dataset_dropdown()
                         self.dataset_dropdown.setCurrentText(new_name)  # Select the new dataset
                         QMessageBox.information(self, "Success", f"Dataset '{selected_key}' copied to '{new_name}'.")
@@ -312,7 +453,7 @@ def main():
                 new_name, ok = QInputDialog.getText(self, "Rename Dataset", "Enter new dataset name:")
                 if ok and new_name:
                     if new_name not in self.DATASHACK:
-                        self.DATASHACK[new_name] = self.DATASHACK.pop(selected_key)
+                        self.DATASHACK.rename(selected_key, new_name)
                         self.populate_dataset_dropdown()
                         self.dataset_dropdown.setCurrentText(new_name)  # Select the renamed dataset
                         QMessageBox.information(self, "Success", f"Dataset '{selected_key}' renamed to '{new_name}'.")
@@ -346,11 +487,32 @@ def main():
     # dark_stream = QTextStream(dark_file)
     # dark_stylesheet = dark_stream.readAll()
 
-    window = FACSPyBrowser(light_stylesheet, dark_stylesheet)
-    window.setStyleSheet(light_stylesheet)
-    window.show()
+    # applying the stylesheet before the widgets exist polishes every widget only once
+    theme_manager = ThemeManager(app, light_stylesheet, dark_stylesheet)
+    with profiler.phase("stylesheet (application)"):
+        theme_manager.apply("light")
+    with profiler.phase("FACSPyBrowser"):
+        window = FACSPyBrowser(theme_manager, module_loader)
+    with profiler.phase("window.show()"):
+        window.show()
     splash.finish(window)
+    module_loader.start_deferred(
+        on_error = lambda error_message: window.statusBar().showMessage(f"Loading modules failed: {error_message}")
+    )
+    QTimer.singleShot(0, window.offer_checkpoint_restore)
+    # the checkpoints are only kept if the application does not exit cleanly
+    app.aboutToQuit.connect(window.autosave.shutdown)
+    app.aboutToQuit.connect(window.jobs.shutdown)
+
+    def finish_startup_profile():
+        profiler.mark("event loop running")
+        print(f"Startup profile written to {profiler.write()}")
+    if profiler.enabled:
+        QTimer.singleShot(0, finish_startup_profile)
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
+    # dataset creation reads the FCS files on a process pool
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
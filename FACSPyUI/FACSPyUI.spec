@@ -26,6 +26,10 @@ hiddenimports = []
 hiddenimports += collect_hidden_imports('_stylesheets', '_stylesheets')
 hiddenimports += collect_hidden_imports('_main_window', '_main_window')
 
+# imported by name through the ModuleLoader in _main_window/_startup.py
+hiddenimports += ['numpy', 'pandas', 'matplotlib.pyplot', 'plotly', 'FACSPy',
+                  'seaborn', 'scipy', 'sklearn', 'scanpy']
+
 
 a = Analysis(
     ['FACSPyUI.py'],
@@ -1,36 +1,43 @@
-from ._edit_supplements import (EditSupplementWindow,
-                                EditMetadataWindow,
-                                EditPanelWindow,
-                                EditCofactorTableWindow)
-from ._dataset_sampling import (SubsampleDatasetWindow,
-                                EqualizeGroupSizesWindow,
-                                SubsetGateWindow)
-from ._transformations import (BaseTransformationWindow,
-                               AsinhTransformationWindow,
-                               LogTransformationWindow,
-                               LogicleTransformationWindow,
-                               HyperlogTransformationWindow,
-                               CalculateCofactorsWindow)
-from ._sc_dimensionality_reductions import (BaseDimensionalityReductionWindow,
-                                            SinglecellPCAWindow,
-                                            SinglecellUMAPWindow,
-                                            SinglecellTSNEWindow,
-                                            SinglecellDiffmapWindow,
-                                            SinglecellNeighborsWindow)
-from ._sw_dimensionality_reductions import (BaseSamplewiseDimensionalityReductionWindow,
-                                            SamplewisePCAWindow,
-                                            SamplewiseTSNEWindow,
-                                            SamplewiseUMAPWindow,
-                                            SamplewiseMDSWindow)
-from ._clustering import (LeidenWindow,
-                          ParcWindow,
-                          FlowsomWindow,
-                          PhenographWindow)
-from ._integration import (ScanoramaWindow,
-                           HarmonyWindow)
-from ._gate_frequency import GateFrequencyWindow
-from ._mfi import MFIWindow
-from ._fop import FOPWindow
+import importlib
+
+# the window modules import FACSPy at module level and are only
+# loaded once a window is requested, see ANALYSIS_MENUS in _menubar.py
+_LAZY_ATTRIBUTES = {
+    "EditSupplementWindow": "._edit_supplements",
+    "EditMetadataWindow": "._edit_supplements",
+    "EditPanelWindow": "._edit_supplements",
+    "EditCofactorTableWindow": "._edit_supplements",
+    "SubsampleDatasetWindow": "._dataset_sampling",
+    "EqualizeGroupSizesWindow": "._dataset_sampling",
+    "SubsetGateWindow": "._dataset_sampling",
+    "BaseTransformationWindow": "._transformations",
+    "AsinhTransformationWindow": "._transformations",
+    "LogTransformationWindow": "._transformations",
+    "LogicleTransformationWindow": "._transformations",
+    "HyperlogTransformationWindow": "._transformations",
+    "CalculateCofactorsWindow": "._transformations",
+    "BaseDimensionalityReductionWindow": "._sc_dimensionality_reductions",
+    "SinglecellPCAWindow": "._sc_dimensionality_reductions",
+    "SinglecellUMAPWindow": "._sc_dimensionality_reductions",
+    "SinglecellTSNEWindow": "._sc_dimensionality_reductions",
+    "SinglecellDiffmapWindow": "._sc_dimensionality_reductions",
+    "SinglecellNeighborsWindow": "._sc_dimensionality_reductions",
+    "BaseSamplewiseDimensionalityReductionWindow": "._sw_dimensionality_reductions",
+    "SamplewisePCAWindow": "._sw_dimensionality_reductions",
+    "SamplewiseTSNEWindow": "._sw_dimensionality_reductions",
+    "SamplewiseUMAPWindow": "._sw_dimensionality_reductions",
+    "SamplewiseMDSWindow": "._sw_dimensionality_reductions",
+    "LeidenWindow": "._clustering",
+    "ParcWindow": "._clustering",
+    "FlowsomWindow": "._clustering",
+    "PhenographWindow": "._clustering",
+    "ScanoramaWindow": "._integration",
+    "HarmonyWindow": "._integration",
+    "GateFrequencyWindow": "._gate_frequency",
+    "MFIWindow": "._mfi",
+    "FOPWindow": "._fop",
+    "PipelineWindow": "._pipeline"
+}
 
 __all__ = [
     "EditSupplementWindow",
@@ -65,6 +72,14 @@ __all__ = [
     "HarmonyWindow",
     "GateFrequencyWindow",
     "MFIWindow",
-    "FOPWindow"
+    "FOPWindow",
+    "PipelineWindow"
 
 ]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
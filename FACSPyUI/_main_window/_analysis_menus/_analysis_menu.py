@@ -11,7 +11,6 @@ class BaseAnalysisMenu(QWidget):
     def __init__(self, main_window, title, advanced_params):
         super().__init__()
         self.main_window = main_window
-        self.setStyleSheet(self.main_window.stylesheet)
         self.setWindowTitle(title)
         self.advanced_params = advanced_params
         self.enable_documentation()
@@ -1,3 +1,5 @@
+import time
+
 from PyQt5.QtWidgets import (QMessageBox, QVBoxLayout, 
                              QPushButton, QFormLayout, QLabel,
                              QLineEdit, QComboBox, QCheckBox,
@@ -6,7 +8,9 @@ from PyQt5.QtCore import pyqtSignal, QThread, QMutex, QMutexLocker
 
 import FACSPy as fp
 
-from .._utils import LoadingScreen, MultiSelectComboBox
+from .._isolated import run_tool
+from .._leiden_sweep import leiden_sweep, parse_resolutions
+from .._utils import LoadingScreen, MultiSelectComboBox, format_duration
 
 from ._analysis_menu import BaseAnalysisMenu
 
@@ -101,6 +105,8 @@ class BaseClusteringWindow(BaseAnalysisMenu):
 class LeidenWorker(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    # (fraction done or None, stage)
+    progress = pyqtSignal(object, str)
 
     def __init__(self, dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs):
         super().__init__()
@@ -121,8 +127,11 @@ class LeidenWorker(QThread):
                     self.error.emit("Leiden clustering calculation was canceled.")
                     return
 
-            fp.tl.leiden(
+            run_tool(
                 self.dataset,
+                "leiden",
+                self.is_canceled,
+                progress_callback=self.progress.emit,
                 gate=self.gate,
                 layer=self.layer,
                 use_only_fluo=self.use_only_fluo,
@@ -135,6 +144,64 @@ class LeidenWorker(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
+    def stop(self):
+        with QMutexLocker(self._mutex):
+            self._is_running = False
+
+class LeidenSweepWorker(QThread):
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+    # (fraction done or None, stage)
+    progress = pyqtSignal(object, str)
+
+    def __init__(self, dataset, gate, layer, use_only_fluo, scaling, exclude_channels, resolutions, advanced_kwargs):
+        super().__init__()
+        self.dataset = dataset
+        self.gate = gate
+        self.layer = layer
+        self.use_only_fluo = use_only_fluo
+        self.scaling = scaling
+        self.exclude_channels = exclude_channels
+        self.resolutions = resolutions
+        self.advanced_kwargs = advanced_kwargs
+        self.report = []
+        self.graph_reused = False
+        self.elapsed = 0
+        self._is_running = True
+        self._mutex = QMutex()
+
+    def run(self):
+        try:
+            start = time.time()
+            self.report, self.graph_reused = leiden_sweep(
+                self.dataset,
+                self.gate,
+                self.layer,
+                self.resolutions,
+                neighbors_kwargs = {
+                    "gate": self.gate,
+                    "layer": self.layer,
+                    "use_only_fluo": self.use_only_fluo,
+                    "exclude": self.exclude_channels,
+                    "scaling": self.scaling
+                },
+                is_canceled = self.is_canceled,
+                progress_callback = self.progress.emit,
+                **self.advanced_kwargs
+            )
+            self.elapsed = time.time() - start
+            self.finished.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
     def stop(self):
         with QMutexLocker(self._mutex):
             self._is_running = False
@@ -159,6 +226,13 @@ class LeidenWindow(BaseClusteringWindow):
         self.resolution_input = QLineEdit()
         self.resolution_input.setPlaceholderText("e.g., 1.0")
 
+        self.sweep_label = QLabel("Resolution sweep:")
+        self.sweep_input = QLineEdit()
+        self.sweep_input.setPlaceholderText("e.g., 0.2, 0.5, 1.0 or 0.1:2.0:0.1")
+        self.sweep_input.setToolTip("Runs one Leiden clustering per resolution in parallel on a shared\n"
+                                    "neighbors graph and writes one column per resolution.\n"
+                                    "Leave empty to run the single resolution above.")
+
         self.directed_label = QLabel("Directed:")
         self.directed_input = QComboBox()
         self.directed_input.addItems(["True", "False"])
@@ -173,6 +247,7 @@ class LeidenWindow(BaseClusteringWindow):
 
         # Add to advanced settings layout
         self.advanced_settings_layout.addRow(self.resolution_label, self.resolution_input)
+        self.advanced_settings_layout.addRow(self.sweep_label, self.sweep_input)
         self.advanced_settings_layout.addRow(self.directed_label, self.directed_input)
         self.advanced_settings_layout.addRow(self.use_weights_label, self.use_weights_input)
         self.advanced_settings_layout.addRow(self.n_iterations_label, self.n_iterations_input)
@@ -204,6 +279,12 @@ class LeidenWindow(BaseClusteringWindow):
                 'n_iterations': int(self.n_iterations_input.text()) if self.n_iterations_input.text() else -1
             }
 
+            resolutions = parse_resolutions(self.sweep_input.text())
+            if resolutions:
+                self.start_sweep(dataset_key, dataset, gate, layer, use_only_fluo, scaling,
+                                 exclude_channels, resolutions, advanced_kwargs)
+                return
+
             # Show loading screen
             loading_message = "Calculating Leiden clustering...\n\n"
             loading_message += f"Population: {gate}\n"
@@ -212,12 +293,13 @@ class LeidenWindow(BaseClusteringWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the Leiden worker thread
+            # Create and queue the Leiden worker thread
             self.calculation_canceled = False
             self.leiden_worker = LeidenWorker(dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs)
             self.leiden_worker.finished.connect(self.on_leiden_finished)
             self.leiden_worker.error.connect(self.on_leiden_error)
-            self.leiden_worker.start()
+            self.leiden_worker.progress.connect(self.loading_screen.set_progress)
+            self.main_window.jobs.submit(self.leiden_worker, "Leiden clustering", dataset_key)
 
         except Exception as e:
             self.show_error("Leiden Calculation Error", str(e))
@@ -229,9 +311,47 @@ class LeidenWindow(BaseClusteringWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "Leiden clustering completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.leiden_worker.dataset)
             self.close()
 
+    def start_sweep(self, dataset_key, dataset, gate, layer, use_only_fluo, scaling,
+                    exclude_channels, resolutions, advanced_kwargs):
+        """
+        Queues a resolution sweep. The window stays open afterwards, so the
+        range can be narrowed down around the best resolution.
+        """
+        del advanced_kwargs["resolution"]
+        loading_message = f"Calculating Leiden clustering for {len(resolutions)} resolutions...\n\n"
+        loading_message += f"Population: {gate}\n"
+        loading_message += f"Data: {layer}"
+        self.loading_screen = LoadingScreen(main_window = self.main_window, message=loading_message)
+        self.loading_screen.cancel_signal.connect(self.cancel_calculation)
+        self.loading_screen.show()
+
+        self.calculation_canceled = False
+        self.leiden_worker = LeidenSweepWorker(dataset, gate, layer, use_only_fluo, scaling,
+                                               exclude_channels, resolutions, advanced_kwargs)
+        self.leiden_worker.finished.connect(self.on_sweep_finished)
+        self.leiden_worker.error.connect(self.on_leiden_error)
+        self.leiden_worker.progress.connect(self.loading_screen.set_progress)
+        self.main_window.jobs.submit(self.leiden_worker, "Leiden resolution sweep", dataset_key)
+
+    def on_sweep_finished(self):
+        """
+        Reports the number of clusters and the runtime of every resolution.
+        """
+        self.loading_screen.close()
+        if self.calculation_canceled:
+            return
+        worker = self.leiden_worker
+        self.main_window.on_dataset_modified(worker.dataset)
+        lines = [f"{resolution:g}: {n_clusters} clusters in {format_duration(seconds)} ({column})"
+                 for resolution, column, n_clusters, seconds in worker.report]
+        graph = "reused" if worker.graph_reused else "computed"
+        QMessageBox.information(self, "Leiden Resolution Sweep",
+                                "\n".join(lines) +
+                                f"\n\nNeighbors graph {graph}, total time {format_duration(worker.elapsed)}.")
+
     def on_leiden_error(self, error_message):
         """
         Handles any error that occurs during the Leiden clustering calculation.
@@ -254,6 +374,8 @@ class LeidenWindow(BaseClusteringWindow):
 class FlowsomWorker(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    # (fraction done or None, stage)
+    progress = pyqtSignal(object, str)
 
     def __init__(self, dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs):
         super().__init__()
@@ -273,8 +395,11 @@ class FlowsomWorker(QThread):
                 if not self._is_running:
                     self.error.emit("FlowSOM clustering calculation was canceled.")
                     return
-            fp.tl.flowsom(
+            run_tool(
                 self.dataset,
+                "flowsom",
+                self.is_canceled,
+                progress_callback=self.progress.emit,
                 gate=self.gate,
                 layer=self.layer,
                 use_only_fluo=self.use_only_fluo,
@@ -287,6 +412,10 @@ class FlowsomWorker(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
     def stop(self):
         with QMutexLocker(self._mutex):
             self._is_running = False
@@ -421,12 +550,13 @@ class FlowsomWindow(BaseClusteringWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the FlowSOM worker thread
+            # Create and queue the FlowSOM worker thread
             self.calculation_canceled = False
             self.flowsom_worker = FlowsomWorker(dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs)
             self.flowsom_worker.finished.connect(self.on_flowsom_finished)
             self.flowsom_worker.error.connect(self.on_flowsom_error)
-            self.flowsom_worker.start()
+            self.flowsom_worker.progress.connect(self.loading_screen.set_progress)
+            self.main_window.jobs.submit(self.flowsom_worker, "FlowSOM clustering", dataset_key)
 
         except Exception as e:
             self.show_error("FlowSOM Calculation Error", str(e))
@@ -438,7 +568,7 @@ class FlowsomWindow(BaseClusteringWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "FlowSOM clustering completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.flowsom_worker.dataset)
             self.close()
 
     def on_flowsom_error(self, error_message):
@@ -463,6 +593,8 @@ class FlowsomWindow(BaseClusteringWindow):
 class ParcWorker(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    # (fraction done or None, stage)
+    progress = pyqtSignal(object, str)
 
     def __init__(self, dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs):
         super().__init__()
@@ -483,8 +615,11 @@ class ParcWorker(QThread):
                     self.error.emit("PARC clustering calculation was canceled.")
                     return
 
-            fp.tl.parc(
+            run_tool(
                 self.dataset,
+                "parc",
+                self.is_canceled,
+                progress_callback=self.progress.emit,
                 gate=self.gate,
                 layer=self.layer,
                 use_only_fluo=self.use_only_fluo,
@@ -497,6 +632,10 @@ class ParcWorker(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
     def stop(self):
         with QMutexLocker(self._mutex):
             self._is_running = False
@@ -644,12 +783,13 @@ class ParcWindow(BaseClusteringWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the PARC worker thread
+            # Create and queue the PARC worker thread
             self.calculation_canceled = False
             self.parc_worker = ParcWorker(dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs)
             self.parc_worker.finished.connect(self.on_parc_finished)
             self.parc_worker.error.connect(self.on_parc_error)
-            self.parc_worker.start()
+            self.parc_worker.progress.connect(self.loading_screen.set_progress)
+            self.main_window.jobs.submit(self.parc_worker, "PARC clustering", dataset_key)
 
         except Exception as e:
             self.show_error("PARC Calculation Error", str(e))
@@ -661,7 +801,7 @@ class ParcWindow(BaseClusteringWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "PARC clustering completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.parc_worker.dataset)
             self.close()
 
     def on_parc_error(self, error_message):
@@ -686,6 +826,8 @@ class ParcWindow(BaseClusteringWindow):
 class PhenographWorker(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    # (fraction done or None, stage)
+    progress = pyqtSignal(object, str)
 
     def __init__(self, dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs):
         super().__init__()
@@ -707,8 +849,11 @@ class PhenographWorker(QThread):
                     return
 
             # Perform Phenograph clustering computation here
-            fp.tl.phenograph(
+            run_tool(
                 self.dataset,
+                "phenograph",
+                self.is_canceled,
+                progress_callback=self.progress.emit,
                 gate=self.gate,
                 layer=self.layer,
                 use_only_fluo=self.use_only_fluo,
@@ -721,6 +866,10 @@ class PhenographWorker(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
     def stop(self):
         with QMutexLocker(self._mutex):
             self._is_running = False
@@ -868,12 +1017,13 @@ class PhenographWindow(BaseClusteringWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the Phenograph worker thread
+            # Create and queue the Phenograph worker thread
             self.calculation_canceled = False
             self.phenograph_worker = PhenographWorker(dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs)
             self.phenograph_worker.finished.connect(self.on_phenograph_finished)
             self.phenograph_worker.error.connect(self.on_phenograph_error)
-            self.phenograph_worker.start()
+            self.phenograph_worker.progress.connect(self.loading_screen.set_progress)
+            self.main_window.jobs.submit(self.phenograph_worker, "Phenograph clustering", dataset_key)
 
         except Exception as e:
             self.show_error("Phenograph Calculation Error", str(e))
@@ -885,7 +1035,7 @@ class PhenographWindow(BaseClusteringWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "Phenograph clustering completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.phenograph_worker.dataset)
             self.close()
 
     def on_phenograph_error(self, error_message):
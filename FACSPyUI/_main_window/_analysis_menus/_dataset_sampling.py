@@ -3,7 +3,6 @@ from PyQt5.QtWidgets import (QMessageBox, QWidget, QVBoxLayout,
                              QLineEdit, QComboBox)
 
 import FACSPy as fp
-import scanpy as sc
 
 class SubsampleDatasetWindow(QWidget):
     def __init__(self, main_window):
@@ -62,6 +61,7 @@ class SubsampleDatasetWindow(QWidget):
                 raise ValueError("Invalid dataset selected.")
 
             dataset = self.main_window.DATASHACK[dataset_key]
+            sc = self.main_window.module_loader.require("scanpy")
 
             cells = self.cells_input.text().strip()
             fraction = self.fraction_input.text().strip()
@@ -87,7 +87,7 @@ class SubsampleDatasetWindow(QWidget):
             fp.sync.synchronize_dataset(dataset)
 
             # Update the dataset display
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(dataset)
 
             # Show success message and close the window
             QMessageBox.information(self, "Success", "Dataset subsampled successfully.")
@@ -203,7 +203,7 @@ class EqualizeGroupSizesWindow(QWidget):
             fp.sync.synchronize_dataset(dataset)
 
             # Update the dataset display
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(dataset)
 
             # Show success message and close the window
             QMessageBox.information(self, "Success", "Group sizes equalized successfully.")
@@ -295,7 +295,7 @@ class SubsetGateWindow(QWidget):
             self.main_window.DATASHACK[dataset_key] = dataset
 
             # Update the dataset display
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(dataset)
 
             # Show success message and close the window
             QMessageBox.information(self, "Success", f"Dataset subsetted successfully using {gating_col}.")
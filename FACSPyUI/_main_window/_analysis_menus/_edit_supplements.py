@@ -1,9 +1,12 @@
 from PyQt5.QtWidgets import (QMenuBar, QAction, QMessageBox, QWidget,
-                             QVBoxLayout, QTableWidget, QTableWidgetItem,
+                             QVBoxLayout, QTableView,
                              QPushButton, QInputDialog, QHBoxLayout)
+from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QKeySequence
 import FACSPy as fp
-import pandas as pd
+
+from .._table_model import DataFrameTableModel
+from .._datashack import materialize_on_write
 
 class EditSupplementWindow(QWidget):
     def __init__(self, main_window, dataframe):
@@ -44,12 +47,10 @@ class EditSupplementWindow(QWidget):
         remove_row_action.triggered.connect(self.remove_row)
         self.modify_menu.addAction(remove_row_action)
 
-        # Create a table widget
-        self.table = QTableWidget()
-        self.initialize_table(self.dataframe.columns)
-
-        # Populate the table with metadata
-        self.load_table(self.dataframe)
+        # Create a table view, the model only renders the visible cells
+        self.table = QTableView()
+        self.model = DataFrameTableModel(self.dataframe)
+        self.table.setModel(self.model)
 
         # Enable double-click on headers to rename columns
         self.table.horizontalHeader().sectionDoubleClicked.connect(self.rename_column)
@@ -63,63 +64,48 @@ class EditSupplementWindow(QWidget):
 
         self.setLayout(layout)
 
-    def initialize_table(self, headers):
-        """
-        Initializes the table with given headers.
-        """
-        self.table.setColumnCount(len(headers))
-        self.table.setHorizontalHeaderLabels(headers)
-        self.table.setRowCount(0)  # Initialize with no rows
-
     def load_table(self, df):
         """
-        Loads the DataFrame into the table widget.
+        Loads the DataFrame into the table.
         """
-        self.table.setRowCount(len(df))
-
-        for row_index, row_data in df.iterrows():
-            for column_index, value in enumerate(row_data):
-                self.table.setItem(row_index, column_index, QTableWidgetItem(str(value)))
+        self.model.load_dataframe(df)
 
     def add_column(self):
         """
         Adds a new column to the table.
         """
-        current_column_count = self.table.columnCount()
-        self.table.insertColumn(current_column_count)
-        self.table.setHorizontalHeaderItem(current_column_count, QTableWidgetItem("new column"))
+        self.model.add_column("new column")
 
     def remove_column(self):
         """
         Removes the currently selected column.
         """
-        current_column = self.table.currentColumn()
+        current_column = self.table.currentIndex().column()
         if current_column >= 0:
-            self.table.removeColumn(current_column)
+            self.model.remove_column(current_column)
 
     def add_row(self):
         """
         Adds a new row to the table.
         """
-        current_row_count = self.table.rowCount()
-        self.table.insertRow(current_row_count)
+        self.model.add_row()
 
     def remove_row(self):
         """
         Removes the currently selected row.
         """
-        current_row = self.table.currentRow()
+        current_row = self.table.currentIndex().row()
         if current_row >= 0:
-            self.table.removeRow(current_row)
+            self.model.remove_row(current_row)
 
     def rename_column(self, index):
         """
         Renames the column at the given index.
         """
-        old_name = self.table.horizontalHeaderItem(index).text()
+        old_name = self.model.header(index)
         new_name, ok = QInputDialog.getText(self, "Rename Column", f"Enter new name for column '{old_name}':")
         if ok and new_name:
-            self.table.setHorizontalHeaderItem(index, QTableWidgetItem(new_name))
+            self.model.setHeaderData(index, Qt.Horizontal, new_name)
 
 
 class EditMetadataWindow(EditSupplementWindow):
@@ -145,22 +131,14 @@ class EditMetadataWindow(EditSupplementWindow):
         """
         try:
             # Extract data from the table and update the DataFrame
-            new_data = []
-            for row in range(self.table.rowCount()):
-                row_data = {}
-                for column in range(self.table.columnCount()):
-                    item = self.table.item(row, column)
-                    row_data[self.table.horizontalHeaderItem(column).text()] = item.text() if item else ""
-                new_data.append(row_data)
-
-            new_metadata_df = pd.DataFrame(new_data)
+            new_metadata_df = self.model.to_dataframe()
             metadata = fp.dt.Metadata(metadata=new_metadata_df)
             dataset = self.main_window.DATASHACK[self.dataset_key]
             dataset.uns["metadata"] = metadata
             fp.sync.synchronize_dataset(dataset)
 
             # Update the dataset display
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(dataset)
 
             # Show success message and close the window
             QMessageBox.information(self, "Success", "Metadata changed successfully.")
@@ -194,22 +172,14 @@ class EditPanelWindow(EditSupplementWindow):
         """
         try:
             # Extract data from the table and update the DataFrame
-            new_data = []
-            for row in range(self.table.rowCount()):
-                row_data = {}
-                for column in range(self.table.columnCount()):
-                    item = self.table.item(row, column)
-                    row_data[self.table.horizontalHeaderItem(column).text()] = item.text() if item else ""
-                new_data.append(row_data)
-
-            new_panel_df = pd.DataFrame(new_data)
+            new_panel_df = self.model.to_dataframe()
             panel = fp.dt.Panel(panel=new_panel_df)
             dataset = self.main_window.DATASHACK[self.dataset_key]
             dataset.uns["panel"] = panel
             fp.sync.synchronize_dataset(dataset)
 
             # Update the dataset display
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(dataset)
 
             # Show success message and close the window
             QMessageBox.information(self, "Success", "Panel changed successfully.")
@@ -261,22 +231,14 @@ class EditCofactorTableWindow(EditSupplementWindow):
         """
         try:
             # Extract data from the table and update the DataFrame
-            new_data = []
-            for row in range(self.table.rowCount()):
-                row_data = {}
-                for column in range(self.table.columnCount()):
-                    item = self.table.item(row, column)
-                    row_data[self.table.horizontalHeaderItem(column).text()] = item.text() if item else ""
-                new_data.append(row_data)
-
-            new_cofactors = pd.DataFrame(new_data)
+            new_cofactors = self.model.to_dataframe()
             cofactor_table = fp.dt.CofactorTable(cofactors=new_cofactors)
             dataset = self.main_window.DATASHACK[self.dataset_key]
             dataset.uns["cofactors"] = cofactor_table
 
             # Perform transformation if a layer was selected
             if self.selected_layer:
-                fp.dt.transform(dataset,
+                materialize_on_write(dataset, fp.dt.transform,
                                 transform="asinh",
                                 key_added=self.selected_layer,
                                 cofactor_table=cofactor_table)
@@ -284,7 +246,7 @@ class EditCofactorTableWindow(EditSupplementWindow):
             fp.sync.synchronize_dataset(dataset)
 
             # Update the dataset display
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(dataset)
 
             # Show success message and close the window
             QMessageBox.information(self, "Success", "Cofactor table changed successfully.")
@@ -7,6 +7,7 @@ from PyQt5.QtCore import pyqtSignal, QThread, QMutex, QMutexLocker
 import FACSPy as fp
 
 from .._utils import LoadingScreen
+from .._create_dataset._ingest import record_tool_kwargs
 from ._analysis_menu import BaseAnalysisMenu
 
 
@@ -126,14 +127,15 @@ class FOPWorker(QThread):
             if not self.cutoff:
                 self.cutoff = None
 
-            fp.tl.fop(
-                self.dataset,
+            kwargs = dict(
                 layer=self.data_format,
                 cutoff=self.cutoff,
                 groupby=self.group_by,
                 use_only_fluo=self.use_markers_only,
                 aggregate=self.aggregate
             )
+            fp.tl.fop(self.dataset, **kwargs)
+            record_tool_kwargs(self.dataset, "fop", kwargs)
 
             self.finished.emit()
 
@@ -178,12 +180,12 @@ class FOPWindow(BaseFOPWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the worker thread
+            # Create and queue the worker thread
             self.calculation_canceled = False
             self.fop_worker = FOPWorker(dataset, data_format, cutoff, group_by, use_markers_only, aggregate)
             self.fop_worker.finished.connect(self.on_fop_finished)
             self.fop_worker.error.connect(self.on_fop_error)
-            self.fop_worker.start()
+            self.main_window.jobs.submit(self.fop_worker, "Frequency of parent", dataset_key)
 
         except Exception as e:
             self.show_error("FOP Calculation Error", str(e))
@@ -195,7 +197,7 @@ class FOPWindow(BaseFOPWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "FOP calculation completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.fop_worker.dataset)
             self.close()
 
     def on_fop_error(self, error_message):
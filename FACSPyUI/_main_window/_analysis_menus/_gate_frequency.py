@@ -55,12 +55,12 @@ class GateFrequencyWindow(QWidget):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the worker thread
+            # Create and queue the worker thread
             self.calculation_canceled = False
             self.gate_frequencies_worker = GateFrequenciesWorker(dataset)
             self.gate_frequencies_worker.finished.connect(self.on_gate_frequencies_finished)
             self.gate_frequencies_worker.error.connect(self.on_gate_frequencies_error)
-            self.gate_frequencies_worker.start()
+            self.main_window.jobs.submit(self.gate_frequencies_worker, "Gate frequencies", dataset_key)
 
         except Exception as e:
             self.show_error("Gate Frequencies Calculation Error", str(e))
@@ -69,7 +69,7 @@ class GateFrequencyWindow(QWidget):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "Gate frequencies calculation completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.gate_frequencies_worker.dataset)
             self.close()
 
     def on_gate_frequencies_error(self, error_message):
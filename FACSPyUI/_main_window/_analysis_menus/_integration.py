@@ -6,6 +6,7 @@ from PyQt5.QtCore import pyqtSignal, QThread, QMutex, QMutexLocker
 
 import FACSPy as fp
 
+from .._isolated import run_tool
 from .._utils import LoadingScreen
 from ._analysis_menu import BaseAnalysisMenu
 
@@ -108,6 +109,8 @@ class BaseIntegrationWindow(BaseAnalysisMenu):
 class HarmonyWorker(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    # (fraction done or None, stage)
+    progress = pyqtSignal(object, str)
 
     def __init__(self, dataset, gate, layer, batch_column, embedding_to_integrate, integrated_embedding_name, advanced_kwargs):
         super().__init__()
@@ -128,8 +131,11 @@ class HarmonyWorker(QThread):
                     self.error.emit("Harmony integration was canceled.")
                     return
 
-            fp.tl.harmony_integrate(
+            run_tool(
                 self.dataset,
+                "harmony_integrate",
+                self.is_canceled,
+                progress_callback=self.progress.emit,
                 gate=self.gate,
                 layer=self.layer,
                 key=self.batch_column,
@@ -142,6 +148,10 @@ class HarmonyWorker(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
     def stop(self):
         self._is_running = False
 
@@ -211,14 +221,15 @@ class HarmonyWindow(BaseIntegrationWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the Harmony worker thread
+            # Create and queue the Harmony worker thread
             self.calculation_canceled = False
             self.harmony_worker = HarmonyWorker(
                 dataset, gate, layer, batch_column, embedding_to_integrate, integrated_embedding_name, advanced_kwargs
             )
             self.harmony_worker.finished.connect(self.on_integration_finished)
             self.harmony_worker.error.connect(self.on_integration_error)
-            self.harmony_worker.start()
+            self.harmony_worker.progress.connect(self.loading_screen.set_progress)
+            self.main_window.jobs.submit(self.harmony_worker, "Harmony integration", dataset_key)
 
         except Exception as e:
             self.show_error("Harmony Integration Error", str(e))
@@ -230,7 +241,7 @@ class HarmonyWindow(BaseIntegrationWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "Harmony integration completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.harmony_worker.dataset)
             self.close()
 
     def on_integration_error(self, error_message):
@@ -255,6 +266,8 @@ class HarmonyWindow(BaseIntegrationWindow):
 class ScanoramaWorker(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    # (fraction done or None, stage)
+    progress = pyqtSignal(object, str)
 
     def __init__(self, dataset, gate, layer, batch_column, embedding_to_integrate, integrated_embedding_name, advanced_kwargs):
         super().__init__()
@@ -275,8 +288,11 @@ class ScanoramaWorker(QThread):
                     self.error.emit("Scanorama integration was canceled.")
                     return
 
-            fp.tl.scanorama_integrate(
+            run_tool(
                 self.dataset,
+                "scanorama_integrate",
+                self.is_canceled,
+                progress_callback=self.progress.emit,
                 gate=self.gate,
                 layer=self.layer,
                 key=self.batch_column,
@@ -289,6 +305,10 @@ class ScanoramaWorker(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
     def stop(self):
         self._is_running = False
 
@@ -348,14 +368,15 @@ class ScanoramaWindow(BaseIntegrationWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the Scanorama worker thread
+            # Create and queue the Scanorama worker thread
             self.calculation_canceled = False
             self.scanorama_worker = ScanoramaWorker(
                 dataset, gate, layer, batch_column, embedding_to_integrate, integrated_embedding_name, advanced_kwargs
             )
             self.scanorama_worker.finished.connect(self.on_integration_finished)
             self.scanorama_worker.error.connect(self.on_integration_error)
-            self.scanorama_worker.start()
+            self.scanorama_worker.progress.connect(self.loading_screen.set_progress)
+            self.main_window.jobs.submit(self.scanorama_worker, "Scanorama integration", dataset_key)
 
         except Exception as e:
             self.show_error("Scanorama Integration Error", str(e))
@@ -367,7 +388,7 @@ class ScanoramaWindow(BaseIntegrationWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "Scanorama integration completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.scanorama_worker.dataset)
             self.close()
 
     def on_integration_error(self, error_message):
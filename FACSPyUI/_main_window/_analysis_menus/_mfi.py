@@ -8,6 +8,7 @@ import FACSPy as fp
 
 from .._utils import LoadingScreen
 from .._utils import error_handler
+from .._create_dataset._ingest import record_tool_kwargs
 from ._analysis_menu import BaseAnalysisMenu
 
 
@@ -124,12 +125,13 @@ class MFIWorker(QThread):
                     self.error.emit("Marker expression calculation was canceled.")
                     return
 
-            fp.tl.mfi(self.dataset,
-                      layer=self.data_format,
-                      groupby=self.group_by,
-                      method=self.agg_method,
-                      use_only_fluo=self.use_markers_only,
-                      aggregate=self.aggregate)
+            kwargs = dict(layer=self.data_format,
+                          groupby=self.group_by,
+                          method=self.agg_method,
+                          use_only_fluo=self.use_markers_only,
+                          aggregate=self.aggregate)
+            fp.tl.mfi(self.dataset, **kwargs)
+            record_tool_kwargs(self.dataset, "mfi", kwargs)
 
             self.finished.emit()
         except Exception as e:
@@ -173,12 +175,12 @@ class MFIWindow(BaseExpressionWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the worker thread
+            # Create and queue the worker thread
             self.calculation_canceled = False
             self.mfi_worker = MFIWorker(dataset, data_format, group_by, agg_method, use_markers_only, aggregate)
             self.mfi_worker.finished.connect(self.on_mfi_finished)
             self.mfi_worker.error.connect(self.on_mfi_error)
-            self.mfi_worker.start()
+            self.main_window.jobs.submit(self.mfi_worker, "Marker expression", dataset_key)
 
         except Exception as e:
             self.show_error("Marker Expression Calculation Error", str(e))
@@ -190,7 +192,7 @@ class MFIWindow(BaseExpressionWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "Marker expression calculation completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.mfi_worker.dataset)
             self.close()
 
     def on_mfi_error(self, error_message):
@@ -0,0 +1,216 @@
+from PyQt5.QtWidgets import (QWidget, QMessageBox, QVBoxLayout, QHBoxLayout,
+                             QPushButton, QFormLayout, QLabel, QLineEdit,
+                             QComboBox, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QAbstractItemView)
+
+from .._pipeline import (Pipeline, PipelineStep, PipelineWorker,
+                         STEP_TOOLS, default_pipeline)
+from .._utils import LoadingScreen, MultiSelectComboBox, format_duration
+
+
+def parse_value(value: str):
+    """
+    Converts a parameter typed into the step table like the advanced
+    settings of the analysis windows do.
+    """
+    value = value.strip()
+    if value in ("True", "False"):
+        return value == "True"
+    if value in ("None", ""):
+        return None
+    try:
+        return float(value) if "." in value else int(value)
+    except ValueError:
+        return value
+
+
+def parse_params(text: str) -> dict:
+    """
+    Parses 'key=value; key=value'.
+    """
+    params = {}
+    for entry in text.split(";"):
+        if not entry.strip():
+            continue
+        if "=" not in entry:
+            raise ValueError(f"Parameter '{entry.strip()}' has to be given as key=value.")
+        key, value = entry.split("=", 1)
+        params[key.strip()] = parse_value(value)
+    return params
+
+
+def format_params(params: dict) -> str:
+    return "; ".join(f"{key}={value}" for key, value in params.items())
+
+
+class PipelineWindow(QWidget):
+    """
+    Builds a pipeline of transform, neighbors, UMAP and Leiden steps and
+    runs it on the selected dataset. The window stays open, so a pipeline
+    can be run again after changing a parameter. Steps whose parameters
+    and inputs did not change are reused.
+    """
+    COLUMNS = ["Step", "Tool", "Depends on", "Parameters (key=value; ...)"]
+
+    def __init__(self, main_window):
+        super().__init__()
+        self.main_window = main_window
+        self.pipeline_worker = None
+        self.calculation_canceled = False
+        self.setWindowTitle("Analysis Pipeline")
+        self.setGeometry(150, 150, 800, 500)
+
+        self.main_layout = QVBoxLayout()
+
+        # parameters that all single-cell steps share
+        self.form_layout = QFormLayout()
+        self.gate_dropdown = QComboBox()
+        self.form_layout.addRow(QLabel("Gate:"), self.gate_dropdown)
+        self.layer_input = QLineEdit("transformed")
+        self.form_layout.addRow(QLabel("Transformed layer:"), self.layer_input)
+        self.use_marker_dropdown = QComboBox()
+        self.use_marker_dropdown.addItems(["True", "False"])
+        self.form_layout.addRow(QLabel("Use marker channels only:"), self.use_marker_dropdown)
+        self.exclude_channels_dropdown = MultiSelectComboBox()
+        self.form_layout.addRow(QLabel("Exclude channels:"), self.exclude_channels_dropdown)
+        self.scaling_dropdown = QComboBox()
+        self.scaling_dropdown.addItems(["MinMaxScaler", "StandardScaler", "RobustScaler", "None"])
+        self.form_layout.addRow(QLabel("Scale data:"), self.scaling_dropdown)
+        self.main_layout.addLayout(self.form_layout)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.main_layout.addWidget(self.table)
+
+        step_layout = QHBoxLayout()
+        self.tool_dropdown = QComboBox()
+        self.tool_dropdown.addItems(STEP_TOOLS)
+        self.add_step_button = QPushButton("Add Step")
+        self.add_step_button.clicked.connect(lambda: self.add_step(self.tool_dropdown.currentText()))
+        self.remove_step_button = QPushButton("Remove Step")
+        self.remove_step_button.clicked.connect(self.remove_step)
+        step_layout.addWidget(self.tool_dropdown)
+        step_layout.addWidget(self.add_step_button)
+        step_layout.addWidget(self.remove_step_button)
+        self.main_layout.addLayout(step_layout)
+
+        self.result_label = QLabel("")
+        self.main_layout.addWidget(self.result_label)
+
+        self.run_button = QPushButton("Run Pipeline")
+        self.run_button.clicked.connect(self.run_pipeline)
+        self.main_layout.addWidget(self.run_button)
+
+        self.setLayout(self.main_layout)
+
+        for step in default_pipeline().steps:
+            self.add_step(step.tool, step.name, step.params, step.depends_on)
+        self.populate_dropdowns()
+
+    def populate_dropdowns(self):
+        dataset = self.main_window.DATASHACK.get(self.main_window.dataset_dropdown.currentText(), None)
+        if dataset is None:
+            return
+        self.gate_dropdown.clear()
+        self.gate_dropdown.addItems(dataset.uns.get("gating_cols", []))
+        self.exclude_channels_dropdown.clear()
+        self.exclude_channels_dropdown.addItems(dataset.var.index.tolist())
+
+    def add_step(self, tool, name = None, params = None, depends_on = None):
+        if name is None:
+            names = {self.table.item(row, 0).text() for row in range(self.table.rowCount())}
+            name = tool
+            number = 1
+            while name in names:
+                number += 1
+                name = f"{tool}_{number}"
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        self.table.setItem(row, 0, QTableWidgetItem(name))
+        tool_dropdown = QComboBox()
+        tool_dropdown.addItems(STEP_TOOLS)
+        tool_dropdown.setCurrentText(tool)
+        self.table.setCellWidget(row, 1, tool_dropdown)
+        self.table.setItem(row, 2, QTableWidgetItem(", ".join(depends_on or [])))
+        self.table.setItem(row, 3, QTableWidgetItem(format_params(params or {})))
+
+    def remove_step(self):
+        rows = sorted({index.row() for index in self.table.selectedIndexes()}, reverse = True)
+        for row in rows:
+            self.table.removeRow(row)
+
+    def build_pipeline(self) -> Pipeline:
+        steps = []
+        for row in range(self.table.rowCount()):
+            text = lambda column: self.table.item(row, column).text() if self.table.item(row, column) else ""
+            depends_on = [name.strip() for name in text(2).split(",") if name.strip()]
+            steps.append(PipelineStep(text(0).strip(),
+                                      self.table.cellWidget(row, 1).currentText(),
+                                      parse_params(text(3)),
+                                      depends_on))
+        scaling = self.scaling_dropdown.currentText()
+        common_params = {
+            "gate": self.gate_dropdown.currentText(),
+            "layer": self.layer_input.text().strip(),
+            "use_only_fluo": self.use_marker_dropdown.currentText() == "True",
+            "scaling": None if scaling == "None" else scaling,
+            "exclude": list(self.exclude_channels_dropdown.currentText())
+        }
+        pipeline = Pipeline(steps, common_params)
+        # raises for unknown dependencies and cycles before anything runs
+        pipeline.ordered_steps()
+        return pipeline
+
+    def run_pipeline(self):
+        try:
+            dataset_key = self.main_window.dataset_dropdown.currentText()
+            dataset = self.main_window.DATASHACK.get(dataset_key, None)
+            if dataset is None:
+                raise ValueError("No dataset selected or dataset not found.")
+            pipeline = self.build_pipeline()
+            if not pipeline.common_params["layer"]:
+                raise ValueError("Transformed layer name must be provided.")
+
+            self.loading_screen = LoadingScreen(main_window = self.main_window, message = "Running pipeline...")
+            self.loading_screen.cancel_signal.connect(self.cancel_calculation)
+            self.loading_screen.show()
+
+            self.calculation_canceled = False
+            self.pipeline_worker = PipelineWorker(dataset, pipeline)
+            self.pipeline_worker.finished.connect(self.on_pipeline_finished)
+            self.pipeline_worker.error.connect(self.on_pipeline_error)
+            self.pipeline_worker.progress.connect(self.loading_screen.set_progress)
+            self.main_window.jobs.submit(self.pipeline_worker, "Pipeline", dataset_key)
+
+        except Exception as e:
+            self.show_error("Pipeline Error", str(e))
+
+    def on_pipeline_finished(self):
+        self.loading_screen.close()
+        if self.calculation_canceled:
+            return
+        worker = self.pipeline_worker
+        computed = [f"{name} ({format_duration(worker.seconds[name])})" for name in worker.computed]
+        self.result_label.setText(f"Computed: {', '.join(computed) or '-'}\n" +
+                                  f"Reused: {', '.join(worker.reused) or '-'}")
+        if worker.computed:
+            self.main_window.on_dataset_modified(worker.dataset)
+
+    def on_pipeline_error(self, error_message):
+        self.loading_screen.close()
+        # the steps before the failing one have changed the dataset
+        self.main_window.on_dataset_modified(self.pipeline_worker.dataset)
+        if not self.calculation_canceled:
+            self.show_error("Pipeline Error", error_message)
+
+    def cancel_calculation(self):
+        self.calculation_canceled = True
+        if self.pipeline_worker:
+            self.pipeline_worker.stop()
+            self.loading_screen.close()
+            QMessageBox.information(self, "Cancelled", "The pipeline has been cancelled.")
+
+    def show_error(self, title, message):
+        QMessageBox.critical(self, title, message)
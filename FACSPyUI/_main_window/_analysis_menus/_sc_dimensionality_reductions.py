@@ -6,6 +6,7 @@ from PyQt5.QtCore import Qt, pyqtSignal, QThread, QMutex, QMutexLocker
 
 import FACSPy as fp
 
+from .._isolated import run_tool
 from .._utils import LoadingScreen, MultiSelectComboBox
 from ._analysis_menu import BaseAnalysisMenu
 
@@ -102,6 +103,8 @@ class BaseDimensionalityReductionWindow(BaseAnalysisMenu):
 class PCAWorker(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    # (fraction done or None, stage)
+    progress = pyqtSignal(object, str)
 
     def __init__(self, dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs):
         super().__init__()
@@ -122,8 +125,11 @@ class PCAWorker(QThread):
                     self.error.emit("PCA calculation was canceled.")
                     return
 
-            fp.tl.pca(
+            run_tool(
                 self.dataset,
+                "pca",
+                self.is_canceled,
+                progress_callback=self.progress.emit,
                 gate=self.gate,
                 layer=self.layer,
                 use_only_fluo=self.use_only_fluo,
@@ -136,6 +142,10 @@ class PCAWorker(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
     def stop(self):
         with QMutexLocker(self._mutex):
             self._is_running = False
@@ -206,12 +216,13 @@ class SinglecellPCAWindow(BaseDimensionalityReductionWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the PCA worker thread
+            # Create and queue the PCA worker thread
             self.calculation_canceled = False
             self.pca_worker = PCAWorker(dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs)
             self.pca_worker.finished.connect(self.on_pca_finished)
             self.pca_worker.error.connect(self.on_pca_error)
-            self.pca_worker.start()
+            self.pca_worker.progress.connect(self.loading_screen.set_progress)
+            self.main_window.jobs.submit(self.pca_worker, "PCA", dataset_key)
 
         except Exception as e:
             self.show_error("PCA Calculation Error", str(e))
@@ -223,7 +234,7 @@ class SinglecellPCAWindow(BaseDimensionalityReductionWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "PCA calculation completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.pca_worker.dataset)
             self.close()
 
     def on_pca_error(self, error_message):
@@ -249,6 +260,8 @@ class SinglecellPCAWindow(BaseDimensionalityReductionWindow):
 class UMAPWorker(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    # (fraction done or None, stage)
+    progress = pyqtSignal(object, str)
 
     def __init__(self, dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs):
         super().__init__()
@@ -269,8 +282,11 @@ class UMAPWorker(QThread):
                     self.error.emit("UMAP calculation was canceled.")
                     return
 
-            fp.tl.umap(
+            run_tool(
                 self.dataset,
+                "umap",
+                self.is_canceled,
+                progress_callback=self.progress.emit,
                 gate=self.gate,
                 layer=self.layer,
                 use_only_fluo=self.use_only_fluo,
@@ -283,6 +299,10 @@ class UMAPWorker(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
     def stop(self):
         with QMutexLocker(self._mutex):
             self._is_running = False
@@ -398,12 +418,13 @@ class SinglecellUMAPWindow(BaseDimensionalityReductionWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the UMAP worker thread
+            # Create and queue the UMAP worker thread
             self.calculation_canceled = False
             self.umap_worker = UMAPWorker(dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs)
             self.umap_worker.finished.connect(self.on_umap_finished)
             self.umap_worker.error.connect(self.on_umap_error)
-            self.umap_worker.start()
+            self.umap_worker.progress.connect(self.loading_screen.set_progress)
+            self.main_window.jobs.submit(self.umap_worker, "UMAP", dataset_key)
 
         except Exception as e:
             self.show_error("UMAP Calculation Error", str(e))
@@ -415,7 +436,7 @@ class SinglecellUMAPWindow(BaseDimensionalityReductionWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "UMAP calculation completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.umap_worker.dataset)
             self.close()
 
     def on_umap_error(self, error_message):
@@ -440,6 +461,8 @@ class SinglecellUMAPWindow(BaseDimensionalityReductionWindow):
 class TSNEWorker(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    # (fraction done or None, stage)
+    progress = pyqtSignal(object, str)
 
     def __init__(self, dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs):
         super().__init__()
@@ -460,8 +483,11 @@ class TSNEWorker(QThread):
                     self.error.emit("TSNE calculation was canceled.")
                     return
 
-            fp.tl.tsne(
+            run_tool(
                 self.dataset,
+                "tsne",
+                self.is_canceled,
+                progress_callback=self.progress.emit,
                 gate=self.gate,
                 layer=self.layer,
                 use_only_fluo=self.use_only_fluo,
@@ -474,6 +500,10 @@ class TSNEWorker(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
     def stop(self):
         with QMutexLocker(self._mutex):
             self._is_running = False
@@ -553,12 +583,13 @@ class SinglecellTSNEWindow(BaseDimensionalityReductionWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the t-SNE worker thread
+            # Create and queue the t-SNE worker thread
             self.calculation_canceled = False
             self.tsne_worker = TSNEWorker(dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs)
             self.tsne_worker.finished.connect(self.on_tsne_finished)
             self.tsne_worker.error.connect(self.on_tsne_error)
-            self.tsne_worker.start()
+            self.tsne_worker.progress.connect(self.loading_screen.set_progress)
+            self.main_window.jobs.submit(self.tsne_worker, "TSNE", dataset_key)
 
         except Exception as e:
             self.show_error("t-SNE Calculation Error", str(e))
@@ -570,7 +601,7 @@ class SinglecellTSNEWindow(BaseDimensionalityReductionWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "t-SNE calculation completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.tsne_worker.dataset)
             self.close()
 
     def on_tsne_error(self, error_message):
@@ -595,6 +626,8 @@ class SinglecellTSNEWindow(BaseDimensionalityReductionWindow):
 class DiffmapWorker(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    # (fraction done or None, stage)
+    progress = pyqtSignal(object, str)
 
     def __init__(self, dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs):
         super().__init__()
@@ -615,8 +648,11 @@ class DiffmapWorker(QThread):
                     self.error.emit("Diffusion Map calculation was canceled.")
                     return
 
-            fp.tl.diffmap(
+            run_tool(
                 self.dataset,
+                "diffmap",
+                self.is_canceled,
+                progress_callback=self.progress.emit,
                 gate=self.gate,
                 layer=self.layer,
                 use_only_fluo=self.use_only_fluo,
@@ -629,6 +665,10 @@ class DiffmapWorker(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
     def stop(self):
         with QMutexLocker(self._mutex):
             self._is_running = False
@@ -683,12 +723,13 @@ class SinglecellDiffmapWindow(BaseDimensionalityReductionWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the Diffusion Map worker thread
+            # Create and queue the Diffusion Map worker thread
             self.calculation_canceled = False
             self.diffmap_worker = DiffmapWorker(dataset, gate, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs)
             self.diffmap_worker.finished.connect(self.on_diffmap_finished)
             self.diffmap_worker.error.connect(self.on_diffmap_error)
-            self.diffmap_worker.start()
+            self.diffmap_worker.progress.connect(self.loading_screen.set_progress)
+            self.main_window.jobs.submit(self.diffmap_worker, "Diffusion map", dataset_key)
 
         except Exception as e:
             self.show_error("Diffusion Map Calculation Error", str(e))
@@ -700,7 +741,7 @@ class SinglecellDiffmapWindow(BaseDimensionalityReductionWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "Diffusion Map calculation completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.diffmap_worker.dataset)
             self.close()
 
     def on_diffmap_error(self, error_message):
@@ -725,6 +766,8 @@ class SinglecellDiffmapWindow(BaseDimensionalityReductionWindow):
 class NeighborsWorker(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    # (fraction done or None, stage)
+    progress = pyqtSignal(object, str)
 
     def __init__(self,
                  dataset,
@@ -757,8 +800,11 @@ class NeighborsWorker(QThread):
                     self.error.emit("Neighbors calculation was canceled.")
                     return
 
-            fp.tl.neighbors(
+            run_tool(
                 self.dataset,
+                "neighbors",
+                self.is_canceled,
+                progress_callback=self.progress.emit,
                 gate=self.gate,
                 layer=self.layer,
                 use_only_fluo=self.use_only_fluo,
@@ -773,6 +819,10 @@ class NeighborsWorker(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
     def stop(self):
         with QMutexLocker(self._mutex):
             self._is_running = False
@@ -862,7 +912,7 @@ class SinglecellNeighborsWindow(BaseDimensionalityReductionWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the Neighbors worker thread
+            # Create and queue the Neighbors worker thread
             self.calculation_canceled = False
             self.neighbors_worker = NeighborsWorker(
                 dataset,
@@ -878,7 +928,8 @@ class SinglecellNeighborsWindow(BaseDimensionalityReductionWindow):
             )
             self.neighbors_worker.finished.connect(self.on_neighbors_finished)
             self.neighbors_worker.error.connect(self.on_neighbors_error)
-            self.neighbors_worker.start()
+            self.neighbors_worker.progress.connect(self.loading_screen.set_progress)
+            self.main_window.jobs.submit(self.neighbors_worker, "Neighbors", dataset_key)
 
         except Exception as e:
             self.show_error("Neighbors Calculation Error", str(e))
@@ -890,7 +941,7 @@ class SinglecellNeighborsWindow(BaseDimensionalityReductionWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "Neighbors calculation completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.neighbors_worker.dataset)
             self.close()
 
     def on_neighbors_error(self, error_message):
@@ -231,12 +231,12 @@ class SamplewisePCAWindow(BaseSamplewiseDimensionalityReductionWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the PCA worker thread
+            # Create and queue the PCA worker thread
             self.calculation_canceled = False
             self.pca_worker = SamplewisePCAWorker(dataset, data_metric, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs)
             self.pca_worker.finished.connect(self.on_pca_finished)
             self.pca_worker.error.connect(self.on_pca_error)
-            self.pca_worker.start()
+            self.main_window.jobs.submit(self.pca_worker, "Samplewise PCA", dataset_key)
 
         except Exception as e:
             self.show_error("PCA Calculation Error", str(e))
@@ -248,7 +248,7 @@ class SamplewisePCAWindow(BaseSamplewiseDimensionalityReductionWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "Samplewise PCA calculation completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.pca_worker.dataset)
             self.close()
 
     def on_pca_error(self, error_message):
@@ -416,12 +416,12 @@ class SamplewiseMDSWindow(BaseSamplewiseDimensionalityReductionWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the MDS worker thread
+            # Create and queue the MDS worker thread
             self.calculation_canceled = False
             self.mds_worker = SamplewiseMDSWorker(dataset, data_metric, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs)
             self.mds_worker.finished.connect(self.on_mds_finished)
             self.mds_worker.error.connect(self.on_mds_error)
-            self.mds_worker.start()
+            self.main_window.jobs.submit(self.mds_worker, "Samplewise MDS", dataset_key)
 
         except Exception as e:
             self.show_error("MDS Calculation Error", str(e))
@@ -433,7 +433,7 @@ class SamplewiseMDSWindow(BaseSamplewiseDimensionalityReductionWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "Samplewise MDS calculation completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.mds_worker.dataset)
             self.close()
 
     def on_mds_error(self, error_message):
@@ -652,12 +652,12 @@ class SamplewiseUMAPWindow(BaseSamplewiseDimensionalityReductionWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the UMAP worker thread
+            # Create and queue the UMAP worker thread
             self.calculation_canceled = False
             self.umap_worker = SamplewiseUMAPWorker(dataset, data_metric, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs)
             self.umap_worker.finished.connect(self.on_umap_finished)
             self.umap_worker.error.connect(self.on_umap_error)
-            self.umap_worker.start()
+            self.main_window.jobs.submit(self.umap_worker, "Samplewise UMAP", dataset_key)
 
         except Exception as e:
             self.show_error("UMAP Calculation Error", str(e))
@@ -669,7 +669,7 @@ class SamplewiseUMAPWindow(BaseSamplewiseDimensionalityReductionWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "Samplewise UMAP calculation completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.umap_worker.dataset)
             self.close()
 
     def on_umap_error(self, error_message):
@@ -869,12 +869,12 @@ class SamplewiseTSNEWindow(BaseSamplewiseDimensionalityReductionWindow):
             self.loading_screen.cancel_signal.connect(self.cancel_calculation)
             self.loading_screen.show()
 
-            # Create and start the t-SNE worker thread
+            # Create and queue the t-SNE worker thread
             self.calculation_canceled = False
             self.tsne_worker = SamplewiseTSNEWorker(dataset, data_metric, layer, use_only_fluo, scaling, exclude_channels, advanced_kwargs)
             self.tsne_worker.finished.connect(self.on_tsne_finished)
             self.tsne_worker.error.connect(self.on_tsne_error)
-            self.tsne_worker.start()
+            self.main_window.jobs.submit(self.tsne_worker, "Samplewise TSNE", dataset_key)
 
         except Exception as e:
             self.show_error("t-SNE Calculation Error", str(e))
@@ -886,7 +886,7 @@ class SamplewiseTSNEWindow(BaseSamplewiseDimensionalityReductionWindow):
         self.loading_screen.close()
         if not self.calculation_canceled:
             QMessageBox.information(self, "Success", "Samplewise t-SNE calculation completed.")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(self.tsne_worker.dataset)
             self.close()
 
     def on_tsne_error(self, error_message):
@@ -5,6 +5,7 @@ from PyQt5.QtWidgets import (QMessageBox, QWidget, QVBoxLayout,
 import pandas as pd
 
 import FACSPy as fp
+from .._datashack import materialize_on_write
 
 class BaseTransformationWindow(QWidget):
     def __init__(self, main_window, title, default_kwargs):
@@ -255,11 +256,11 @@ class AsinhTransformationWindow(BaseTransformationWindow):
 
             dataset = self.main_window.DATASHACK[dataset_key]
             transform_kwargs = self.get_transform_kwargs()  # Retrieve additional transformation arguments
-            fp.dt.transform(dataset, transform="asinh", key_added=layer_name, cofactor_table=cofactor_arg, transform_kwargs = transform_kwargs)
+            materialize_on_write(dataset, fp.dt.transform, transform="asinh", key_added=layer_name, cofactor_table=cofactor_arg, transform_kwargs = transform_kwargs)
             fp.sync.synchronize_dataset(dataset)
 
             # Update the dataset display
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(dataset)
 
             # Show success message and close the window
             QMessageBox.information(self, "Success", "Data transformed successfully.")
@@ -297,10 +298,10 @@ class LogTransformationWindow(BaseTransformationWindow):
             transform_kwargs = self.get_transform_kwargs()
 
             # Transform the data
-            fp.dt.transform(dataset, transform="log", key_added=layer_name, transform_kwargs=transform_kwargs)
+            materialize_on_write(dataset, fp.dt.transform, transform="log", key_added=layer_name, transform_kwargs=transform_kwargs)
             fp.sync.synchronize_dataset(dataset)
             QMessageBox.information(self, "Success", f"Data transformed with log. New layer: {layer_name}")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(dataset)
             self.close()
         except Exception as e:
             self.show_error("Transformation Error", str(e))
@@ -345,10 +346,10 @@ class HyperlogTransformationWindow(BaseTransformationWindow):
             transform_kwargs = self.get_transform_kwargs()
 
             # Transform the data
-            fp.dt.transform(dataset, transform="hyperlog", key_added=layer_name, transform_kwargs = transform_kwargs)
+            materialize_on_write(dataset, fp.dt.transform, transform="hyperlog", key_added=layer_name, transform_kwargs = transform_kwargs)
             fp.sync.synchronize_dataset(dataset)
             QMessageBox.information(self, "Success", f"Data transformed with hyperlog. New layer: {layer_name}")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(dataset)
             self.close()
         except Exception as e:
             self.show_error("Transformation Error", str(e))
@@ -393,10 +394,10 @@ class LogicleTransformationWindow(BaseTransformationWindow):
             transform_kwargs = self.get_transform_kwargs()
 
             # Transform the data
-            fp.dt.transform(dataset, transform="logicle", key_added=layer_name, transform_kwargs=transform_kwargs)
+            materialize_on_write(dataset, fp.dt.transform, transform="logicle", key_added=layer_name, transform_kwargs=transform_kwargs)
             fp.sync.synchronize_dataset(dataset)
             QMessageBox.information(self, "Success", f"Data transformed with logicle. New layer: {layer_name}")
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(dataset)
             self.close()
         except Exception as e:
             self.show_error("Transformation Error", str(e))
@@ -531,7 +532,7 @@ class CalculateCofactorsWindow(QWidget):
             fp.dt.calculate_cofactors(dataset, add_to_adata = True)
 
             # Close the window and update the dataset display
-            self.main_window.update_current_dataset_display()
+            self.main_window.on_dataset_modified(dataset)
             self.close()
 
         except Exception as e:
@@ -1,23 +1,48 @@
+import importlib
+
 from ._config_panel import ConfigPanel, BaseConfigPanel
 from ._plot_window import PlotWindow, PlotWindowFunctionGeneric, COLORMAPS
-from ._mfi import ConfigPanelMFI, PlotWindowMFI
-from ._fop import ConfigPanelFOP, PlotWindowFOP
-from ._gate_frequency import ConfigPanelGateFrequency, PlotWindowGateFrequency
-from ._metadata import ConfigPanelMetadata, PlotWindowMetadata
-from ._samplewise_dimred import ConfigPanelSamplewiseDimred, PlotWindowSamplewiseDimred
-from ._singlecell_dimred import ConfigPanelSinglecellDimred, PlotWindowSinglecellDimred
-from ._cell_counts import ConfigPanelCellCounts, PlotWindowCellCounts
-from ._marker_correlation import ConfigPanelMarkerCorrelation, PlotWindowMarkerCorrelation
-from ._sample_correlation import ConfigPanelSampleCorrelation, PlotWindowSampleCorrelation
-from ._sample_distance import ConfigPanelSampleDistance, PlotWindowSampleDistance
-from ._expression_heatmap import ConfigPanelExpressionHeatmap, PlotWindowExpressionHeatmap
-from ._biax import ConfigPanelBiaxScatter, PlotWindowBiaxScatter
-from ._marker_density import ConfigPanelMarkerDensity, PlotWindowMarkerDensity
-from ._cluster_abundance import ConfigPanelClusterAbundance, PlotWindowClusterAbundance
-from ._cluster_frequency import ConfigPanelClusterFrequency, PlotWindowClusterFrequency
-from ._fold_change import ConfigPanelFoldChange, PlotWindowFoldChange
-from ._cluster_heatmap import ConfigPanelClusterHeatmap, PlotWindowClusterHeatmap
-from ._transformation_plot import ConfigPanelTransformationPlot, PlotWindowTransformationPlot
+
+# the analysis specific panels import FACSPy and are
+# only loaded once the respective plot is selected
+_LAZY_ATTRIBUTES = {
+    "ConfigPanelMFI": "._mfi",
+    "PlotWindowMFI": "._mfi",
+    "ConfigPanelFOP": "._fop",
+    "PlotWindowFOP": "._fop",
+    "ConfigPanelGateFrequency": "._gate_frequency",
+    "PlotWindowGateFrequency": "._gate_frequency",
+    "ConfigPanelMetadata": "._metadata",
+    "PlotWindowMetadata": "._metadata",
+    "ConfigPanelSamplewiseDimred": "._samplewise_dimred",
+    "PlotWindowSamplewiseDimred": "._samplewise_dimred",
+    "ConfigPanelSinglecellDimred": "._singlecell_dimred",
+    "PlotWindowSinglecellDimred": "._singlecell_dimred",
+    "ConfigPanelCellCounts": "._cell_counts",
+    "PlotWindowCellCounts": "._cell_counts",
+    "ConfigPanelMarkerCorrelation": "._marker_correlation",
+    "PlotWindowMarkerCorrelation": "._marker_correlation",
+    "ConfigPanelSampleCorrelation": "._sample_correlation",
+    "PlotWindowSampleCorrelation": "._sample_correlation",
+    "ConfigPanelSampleDistance": "._sample_distance",
+    "PlotWindowSampleDistance": "._sample_distance",
+    "ConfigPanelExpressionHeatmap": "._expression_heatmap",
+    "PlotWindowExpressionHeatmap": "._expression_heatmap",
+    "ConfigPanelBiaxScatter": "._biax",
+    "PlotWindowBiaxScatter": "._biax",
+    "ConfigPanelMarkerDensity": "._marker_density",
+    "PlotWindowMarkerDensity": "._marker_density",
+    "ConfigPanelClusterAbundance": "._cluster_abundance",
+    "PlotWindowClusterAbundance": "._cluster_abundance",
+    "ConfigPanelClusterFrequency": "._cluster_frequency",
+    "PlotWindowClusterFrequency": "._cluster_frequency",
+    "ConfigPanelFoldChange": "._fold_change",
+    "PlotWindowFoldChange": "._fold_change",
+    "ConfigPanelClusterHeatmap": "._cluster_heatmap",
+    "PlotWindowClusterHeatmap": "._cluster_heatmap",
+    "ConfigPanelTransformationPlot": "._transformation_plot",
+    "PlotWindowTransformationPlot": "._transformation_plot"
+}
 
 __all__ = [
     "ConfigPanel",
@@ -61,3 +86,10 @@ __all__ = [
     "ConfigPanelTransformationPlot",
     "PlotWindowTransformationPlot"
 ]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
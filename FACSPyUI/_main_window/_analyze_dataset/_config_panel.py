@@ -2,10 +2,11 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QComboBox, QLabel,
                              QHBoxLayout, QPushButton, QGroupBox,
                              QMessageBox, QScrollArea, QLineEdit, QCheckBox,
                              QFormLayout)
-from PyQt5.QtGui import QStandardItemModel, QStandardItem, QFont, QColor
+from PyQt5.QtGui import QStandardItemModel, QStandardItem, QFont
 from PyQt5.QtCore import pyqtSignal
 from typing import Optional
 from .._utils import MultiSelectComboBox, HoverLabel
+from .._datashack import DatasetHandle
 
 CATEGORICAL_CMAPS = [
     "Set1", "Set2", "tab10", "Set3", "hls", "Paired"
@@ -44,6 +45,7 @@ class ConfigPanel(QWidget):
         self.analysis_dropdown = QComboBox()
         self.populate_analysis_dropdown()
         self.analysis_dropdown.currentIndexChanged.connect(self.on_analysis_type_selected)
+        self.main_window.theme_manager.theme_changed.connect(self.update_section_heading_colors)
 
         dropdown_layout = QHBoxLayout()
         dropdown_layout.addWidget(analysis_label)
@@ -81,14 +83,15 @@ class ConfigPanel(QWidget):
         ]
         # todo: Cluster Heatmap, Cofactor Distribution, Transformation Plot
 
+        self._section_heading_items = []
         for section_idx, section_heading in enumerate(section_headings):
             heading_item = QStandardItem(section_heading)
             heading_item.setFont(QFont("Arial", weight=QFont.Bold))
             heading_item.setSelectable(False)
             heading_item.setEnabled(False)
-            color = "white" if self.main_window.toolbar.is_dark_mode else "black"
-            heading_item.setForeground(QColor(color))
+            heading_item.setForeground(self.main_window.theme_manager.heading_color())
             model.appendRow(heading_item)
+            self._section_heading_items.append(heading_item)
 
             for item_text in section_items[section_idx]:
                 item = QStandardItem("   " + item_text)
@@ -97,6 +100,15 @@ class ConfigPanel(QWidget):
         self.analysis_dropdown.setModel(model)
         self.analysis_dropdown.setCurrentIndex(0)
 
+    def update_section_heading_colors(self):
+        """
+        Recolors the section headings in place when the theme changes.
+        The model and the current selection are left untouched.
+        """
+        color = self.main_window.theme_manager.heading_color()
+        for heading_item in self._section_heading_items:
+            heading_item.setForeground(color)
+
     def add_default_placeholder(self):
         """
         Adds a default placeholder for the initial state.
@@ -306,6 +318,10 @@ class BaseConfigPanel(QWidget):
             if dataset is None:
                 raise ValueError("No dataset selected or dataset not found.")
 
+            # dropdowns are populated again once the dataset finished loading
+            if isinstance(dataset, DatasetHandle):
+                return
+
             if hasattr(self, 'layer_dropdown'):
                 self.layer_dropdown.clear()
                 self.layer_dropdown.addItems(dataset.layers.keys())
@@ -338,12 +354,12 @@ class BaseConfigPanel(QWidget):
             if hasattr(self, 'group1_dropdown'):
                 self.group1_dropdown.clear()
                 cluster_col = self.group_by_fold_change_dropdown.currentText()
-                self.group1_dropdown.addItems(dataset.obs[cluster_col].unique().tolist())
+                self.group1_dropdown.addItems(self.unique_obs_values(cluster_col))
 
             if hasattr(self, 'group2_dropdown'):
                 self.group2_dropdown.clear()
                 cluster_col = self.group_by_fold_change_dropdown.currentText()
-                self.group2_dropdown.addItems(dataset.obs[cluster_col].unique().tolist())
+                self.group2_dropdown.addItems(self.unique_obs_values(cluster_col))
 
             if hasattr(self, 'colorby_dropdown'):
                 self.colorby_dropdown.clear()
@@ -367,8 +383,8 @@ class BaseConfigPanel(QWidget):
             if hasattr(self, 'sample_identifier_dropdown'):
                 self.sample_identifier_dropdown.clear()
                 self.sample_identifier_dropdown.addItems(
-                    dataset.obs["sample_ID"].unique().tolist() + 
-                    dataset.obs["file_name"].unique().tolist()
+                    self.unique_obs_values("sample_ID") +
+                    self.unique_obs_values("file_name")
                 )
 
             if hasattr(self, 'scatter_dropdown'):
@@ -406,13 +422,24 @@ class BaseConfigPanel(QWidget):
             if hasattr(self, 'cluster_selection_dropdown'):
                 self.cluster_selection_dropdown.clear()
                 cluster_col = self.cluster_key_dropdown.currentText()
-                clusters = dataset.obs[cluster_col].unique().tolist()
-                clusters = [str(cl) for cl in clusters]
-                self.cluster_selection_dropdown.addItems(clusters)
+                self.cluster_selection_dropdown.addItems(self.unique_obs_values(cluster_col))
 
         except Exception as e:
             self.show_error("Dropdown Population Error", str(e))
 
+    def unique_obs_values(self,
+                          column: str) -> list[str]:
+        """
+        Returns the unique values of an obs column of the selected dataset.
+        The values are cached until the dataset version changes.
+        """
+        dataset_key = self.main_window.dataset_dropdown.currentText()
+        return self.main_window.DATASHACK.cached(
+            dataset_key,
+            ("unique", column),
+            lambda dataset: [str(entry) for entry in dataset.obs[column].unique().tolist()]
+        )
+
     def generate_plot_config(self):
         plot_config = {}
         
@@ -626,13 +653,9 @@ class BaseConfigPanel(QWidget):
     def update_cluster_selection_dropdown(self):
         if not hasattr(self, 'cluster_selection_dropdown'):
             return
-        dataset_key = self.main_window.dataset_dropdown.currentText()
-        dataset = self.main_window.DATASHACK.get(dataset_key, None)
         cluster_col = self.cluster_key_dropdown.currentText()
         self.cluster_selection_dropdown.clear()
-        options = dataset.obs[cluster_col].unique().tolist()
-        options = [str(entry) for entry in options]
-        self.cluster_selection_dropdown.addItems(options)
+        self.cluster_selection_dropdown.addItems(self.unique_obs_values(cluster_col))
 
 
     def add_cluster_selection_input(self):
@@ -667,11 +690,8 @@ class BaseConfigPanel(QWidget):
         self.form_layout.addRow(self.group_by_fold_change_label, container)
 
     def update_group_selection_dropdown(self):
-        dataset_key = self.main_window.dataset_dropdown.currentText()
-        dataset = self.main_window.DATASHACK.get(dataset_key, None)
         cluster_col = self.group_by_fold_change_dropdown.currentText()
-        options = dataset.obs[cluster_col].unique().tolist()
-        options = [str(entry) for entry in options]
+        options = self.unique_obs_values(cluster_col)
 
         if hasattr(self, 'group1_dropdown'):
             self.group1_dropdown.clear()
@@ -1181,7 +1201,6 @@ class BaseConfigPanel(QWidget):
         Displays an error message in a QMessageBox.
         """
         error_dialog = QMessageBox(self)
-        error_dialog.setStyleSheet(self.main_window.stylesheet)
         error_dialog.setIcon(QMessageBox.Critical)
         error_dialog.setWindowTitle(title)
         error_dialog.setText(message)
@@ -1192,7 +1211,6 @@ class BaseConfigPanel(QWidget):
         Displays an error dialog with the provided message.
         """
         error_dialog = QMessageBox(self)
-        error_dialog.setStyleSheet(self.main_window.stylesheet)
         error_dialog.setIcon(QMessageBox.Critical)
         error_dialog.setWindowTitle("Error")
         error_dialog.setText(message)
@@ -1,4 +1,5 @@
 import os
+import sys
 from PyQt5.QtCore import pyqtSlot, Qt, QPoint, QTimer
 from PyQt5.QtWidgets import (QFileDialog, QDialog, QVBoxLayout, QLabel, QLineEdit,
                              QPushButton, QComboBox, QHBoxLayout, QDialogButtonBox,
@@ -6,19 +7,38 @@ from PyQt5.QtWidgets import (QFileDialog, QDialog, QVBoxLayout, QLabel, QLineEdi
 
 from PyQt5.QtGui import QPainter, QColor, QPen, QPolygon
 
+from .._datashack import DatasetHandle
+from ._raw_data_export import RAW_DATA_FORMATS, RawDataExportWorker
+
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from PyQt5.QtWebEngineWidgets import QWebEngineView
 
 import pandas as pd
-from anndata import AnnData
+from typing import TYPE_CHECKING
 
 from matplotlib import rcParams
-from seaborn.matrix import ClusterGrid
 
 import plotly.express as px
 import plotly.graph_objs as go
 import plotly.io as pio
 
+if TYPE_CHECKING:
+    from anndata import AnnData
+
+
+def _web_engine_view_class():
+    """
+    Imports QtWebEngine on first use so that sessions that only
+    use matplotlib never start a Chromium process.
+    """
+    from PyQt5.QtWebEngineWidgets import QWebEngineView
+    return QWebEngineView
+
+
+def _is_web_engine_view(widget) -> bool:
+    # if QtWebEngine was never imported, the widget cannot be a web view
+    web_engine = sys.modules.get("PyQt5.QtWebEngineWidgets")
+    return web_engine is not None and isinstance(widget, web_engine.QWebEngineView)
+
 
 COLORMAPS = {
     "tab10": [
@@ -199,6 +219,8 @@ class PlotWindowFunctionGeneric(QWidget):
         return self._plot_func(**data_config)
 
     def _show_matplotlib(self, fig):
+        # seaborn is already loaded by FACSPy once a figure exists
+        from seaborn.matrix import ClusterGrid
         if isinstance(fig, ClusterGrid):
             self.current_plot_widget = FigureCanvas(fig.fig)
         else:
@@ -212,7 +234,7 @@ class PlotWindowFunctionGeneric(QWidget):
         print("converted to html")
 
         # Create a QWebEngineView
-        plotly_widget = QWebEngineView()
+        plotly_widget = _web_engine_view_class()()
 
         # Set HTML asynchronously with a timer to ensure proper rendering
         QTimer.singleShot(10, lambda: plotly_widget.setHtml(html))
@@ -290,11 +312,10 @@ class PlotWindowFunctionGeneric(QWidget):
         Shows an error dialog with the provided message.
         """
         error_dialog = QErrorMessage(self)
-        error_dialog.setStyleSheet(self.main_window.stylesheet)
         error_dialog.showMessage(message)
         error_dialog.exec_()
 
-    def retrieve_dataset(self) -> AnnData:
+    def retrieve_dataset(self) -> "AnnData":
         # Retrieve the dataset from the main window's DATASHACK
         dataset_key = self.main_window.dataset_dropdown.currentText()
         dataset = self.main_window.DATASHACK.get(dataset_key, None)
@@ -303,6 +324,10 @@ class PlotWindowFunctionGeneric(QWidget):
             self.show_error_dialog("Please select a dataset")
             return
 
+        if isinstance(dataset, DatasetHandle):
+            self.show_error_dialog("The dataset is still loading")
+            return
+
         return dataset
 
     def save_raw_data(self,
@@ -332,12 +357,19 @@ class PlotWindowFunctionGeneric(QWidget):
         layout.addWidget(file_label)
         layout.addWidget(file_input)
 
+        format_label = QLabel("File format:")
+        format_dropdown = QComboBox()
+        format_dropdown.addItems(RAW_DATA_FORMATS.keys())
+        layout.addWidget(format_label)
+        layout.addWidget(format_dropdown)
+
         button_box = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
         button_box.accepted.connect(lambda: self.perform_save_raw_data(
             plot_config,
             dir_input.text(),
             file_input.text(),
-            dialog
+            dialog,
+            RAW_DATA_FORMATS[format_dropdown.currentText()]
         ))
         button_box.rejected.connect(dialog.reject)
 
@@ -346,18 +378,24 @@ class PlotWindowFunctionGeneric(QWidget):
         dialog.setLayout(layout)
         dialog.exec_()
 
-    def perform_save_raw_data(self, plot_config, directory, filename, dialog):
+    def perform_save_raw_data(self, plot_config, directory, filename, dialog, file_format = ".csv"):
         """
         Saves the current raw data to the specified directory with the
-        given filename, format, and resolution.
+        given filename and format. The file is written in chunks on a
+        background thread.
         """
         if not directory or not filename:
             self.show_error_dialog("Directory and file name cannot be empty.")
             return
         data = self.get_raw_data(plot_config)
+        if not filename.endswith(file_format):
+            filename += file_format
         full_path = os.path.join(directory, filename)
 
-        data.to_csv(full_path)
+        worker = RawDataExportWorker(data, full_path)
+        self.main_window.menu_bar.run_io_worker(worker,
+                                                f"Exporting {filename}...",
+                                                lambda processed, total: f"{processed:,} of {total:,} rows")
 
         dialog.accept()
 
@@ -389,7 +427,7 @@ class PlotWindowFunctionGeneric(QWidget):
 
         format_label = QLabel("File format:")
         format_dropdown = QComboBox()
-        if isinstance(self.current_plot_widget, QWebEngineView):
+        if _is_web_engine_view(self.current_plot_widget):
             format_dropdown.addItems([".pdf"])  # Only PDF for Plotly via QWebEngineView
         else:
             format_dropdown.addItems([".pdf", ".png", ".jpg"])  # All formats for Matplotlib
@@ -440,7 +478,7 @@ class PlotWindowFunctionGeneric(QWidget):
         if isinstance(self.current_plot_widget, FigureCanvas):
             # Matplotlib plot
             self.current_plot_widget.figure.savefig(full_path, dpi=int(resolution), bbox_inches = "tight")
-        elif isinstance(self.current_plot_widget, QWebEngineView):
+        elif _is_web_engine_view(self.current_plot_widget):
             # Plotly plot
             self.current_plot_widget.page().printToPdf(full_path)
 
@@ -0,0 +1,128 @@
+import os
+import gzip
+
+from PyQt5.QtCore import pyqtSignal, QThread, QMutex, QMutexLocker
+
+from .._dataset_io import OperationCanceled, Progress, PARTIAL_SUFFIX
+
+# dropdown label -> file extension
+RAW_DATA_FORMATS = {
+    "Parquet (.parquet)": ".parquet",
+    "Feather / Arrow IPC (.feather)": ".feather",
+    "Compressed CSV (.csv.gz)": ".csv.gz",
+    "CSV (.csv)": ".csv"
+}
+
+# rows that are converted and written at once
+CHUNK_ROWS = 250_000
+
+
+def _chunks(data):
+    for start in range(0, max(len(data), 1), CHUNK_ROWS):
+        yield data.iloc[start:start + CHUNK_ROWS]
+
+
+def _write_csv(data, file, progress: Progress):
+    for i, chunk in enumerate(_chunks(data)):
+        chunk.to_csv(file, header = i == 0)
+        progress.advance(len(chunk))
+
+
+def _write_arrow(data, file_path: str, extension: str, progress: Progress):
+    """
+    Writes Parquet or Feather (Arrow IPC) files chunk by chunk.
+    All chunks are converted with the schema of the first one.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("Parquet and Feather export require the pyarrow package.")
+
+    writer = None
+    schema = None
+    try:
+        for chunk in _chunks(data):
+            table = pa.Table.from_pandas(chunk, schema = schema, preserve_index = True)
+            if writer is None:
+                schema = table.schema
+                if extension == ".parquet":
+                    import pyarrow.parquet as pq
+                    writer = pq.ParquetWriter(file_path, schema, compression = "zstd")
+                else:
+                    import pyarrow.ipc as ipc
+                    writer = ipc.new_file(file_path, schema,
+                                          options = ipc.IpcWriteOptions(compression = "zstd"))
+            writer.write_table(table)
+            progress.advance(len(chunk))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_raw_data(data,
+                   file_path: str,
+                   progress_callback = None,
+                   is_canceled = None):
+    """
+    Writes a dataframe in the format given by the extension of file_path.
+    The file is written to a .part file that replaces the target once complete.
+    """
+    extension = next(
+        (extension for extension in RAW_DATA_FORMATS.values() if file_path.endswith(extension)),
+        ".csv"
+    )
+    partial_file = file_path + PARTIAL_SUFFIX
+    progress = Progress(len(data), progress_callback, is_canceled)
+    try:
+        if extension == ".csv.gz":
+            with gzip.open(partial_file, "wt", compresslevel = 6, newline = "") as file:
+                _write_csv(data, file, progress)
+        elif extension == ".csv":
+            with open(partial_file, "w", newline = "") as file:
+                _write_csv(data, file, progress)
+        else:
+            _write_arrow(data, partial_file, extension, progress)
+        os.replace(partial_file, file_path)
+    except BaseException:
+        if os.path.isfile(partial_file):
+            os.remove(partial_file)
+        raise
+
+    if progress_callback is not None:
+        progress_callback(progress.total, progress.total)
+
+
+class RawDataExportWorker(QThread):
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+    progress = pyqtSignal(object, object)
+
+    def __init__(self,
+                 data,
+                 file_path: str):
+        super().__init__()
+        self.data = data
+        self.file_path = file_path
+        self._is_running = True
+        self._mutex = QMutex()
+
+    def run(self):
+        try:
+            write_raw_data(self.data, self.file_path, self.progress.emit, self.is_canceled)
+            self.finished.emit()
+        except OperationCanceled:
+            self.error.emit("Export was canceled.")
+        except Exception as e:
+            self.error.emit(str(e))
+
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
+    def stop(self):
+        with QMutexLocker(self._mutex):
+            self._is_running = False
+
+    def can_terminate(self) -> bool:
+        # the export is written to a .part file
+        return True
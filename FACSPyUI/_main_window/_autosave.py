@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import shutil
+import uuid
+
+from PyQt5.QtCore import QObject, QThread, QTimer, QLockFile, pyqtSignal
+
+from ._paths import CHECKPOINT_PATH
+from ._dataset_io import DatasetIOWorker, PARTIAL_SUFFIX
+from ._jobs import PRIORITY_LOW
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "session.lock"
+
+# seconds between two looks at the modification state of the datasets
+CHECK_INTERVAL = 30
+
+# seconds that have to pass before the same dataset is checkpointed again
+MIN_CHECKPOINT_INTERVAL = 5 * 60
+
+
+def _checkpoint_files(file_name: str) -> list:
+    file_stem = os.path.splitext(file_name)[0]
+    return [file_stem + suffix for suffix in (".h5ad", ".uns")]
+
+
+class CheckpointCopyWorker(QThread):
+    """
+    Copies the spill files of a dataset that was dropped from memory with
+    unsaved changes into a checkpoint, which does not need to read it back.
+    """
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self,
+                 source_path: str,
+                 target_path: str):
+        super().__init__()
+        self.source_path = source_path
+        self.target_path = target_path
+        self.dataset = None
+
+    def run(self):
+        targets = _checkpoint_files(self.target_path)
+        try:
+            for source, target in zip(_checkpoint_files(self.source_path), targets):
+                shutil.copyfile(source, target + PARTIAL_SUFFIX)
+            for target in targets:
+                os.replace(target + PARTIAL_SUFFIX, target)
+            self.finished.emit()
+        except Exception as e:
+            for target in targets:
+                if os.path.isfile(target + PARTIAL_SUFFIX):
+                    os.remove(target + PARTIAL_SUFFIX)
+            self.error.emit(str(e))
+
+    def stop(self):
+        pass
+
+
+def read_manifest(session_dir: str) -> dict:
+    """
+    Returns the checkpoints of a session as {dataset key: entry}.
+    """
+    manifest_path = os.path.join(session_dir, MANIFEST_FILE)
+    if not os.path.isfile(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r") as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def find_orphaned_sessions(checkpoint_dir: str = CHECKPOINT_PATH) -> dict:
+    """
+    Returns {session directory: manifest} of the sessions that ended without
+    a clean exit. Sessions of running instances hold their lock file and are
+    skipped, locks of crashed instances are detected as stale by QLockFile.
+    """
+    sessions = {}
+    if not os.path.isdir(checkpoint_dir):
+        return sessions
+    for session_name in sorted(os.listdir(checkpoint_dir)):
+        session_dir = os.path.join(checkpoint_dir, session_name)
+        if not os.path.isdir(session_dir):
+            continue
+        lock = QLockFile(os.path.join(session_dir, LOCK_FILE))
+        # only locks of processes that are no longer running are stale
+        lock.setStaleLockTime(0)
+        if not lock.tryLock(0):
+            continue
+        lock.unlock()
+        manifest = read_manifest(session_dir)
+        if manifest:
+            sessions[session_dir] = manifest
+        else:
+            shutil.rmtree(session_dir, ignore_errors = True)
+    return sessions
+
+
+class AutosaveService(QObject):
+    """
+    Writes checkpoints of the modified datasets in DATASHACK to a session
+    directory. A timer compares the version of every loaded dataset with
+    the version of its last checkpoint. At most one checkpoint is written
+    at a time on a DatasetIOWorker, and each dataset is checkpointed at most
+    every MIN_CHECKPOINT_INTERVAL seconds. Datasets that were spilled with
+    unsaved changes are checkpointed by copying their spill files.
+
+    Every dataset alternates between two checkpoint files, and the manifest
+    only points to a file once it is complete. A crash while a checkpoint
+    is written therefore leaves the previous checkpoint intact. As each
+    file always receives the same dataset, later checkpoints copy the
+    components that did not change from it.
+
+    The session directory is deleted on a clean exit, so the checkpoints
+    that are left on the next launch belong to a crashed session.
+    """
+    checkpoint_written = pyqtSignal(str)
+    # dataset key, error message
+    checkpoint_failed = pyqtSignal(str, str)
+
+    def __init__(self,
+                 registry,
+                 checkpoint_dir: str = CHECKPOINT_PATH,
+                 check_interval: float = CHECK_INTERVAL,
+                 min_checkpoint_interval: float = MIN_CHECKPOINT_INTERVAL,
+                 scheduler = None):
+        super().__init__()
+        self.registry = registry
+        # checkpoints wait for the jobs that write to the dataset, see JobScheduler
+        self.scheduler = scheduler
+        self.checkpoint_dir = checkpoint_dir
+        self.min_checkpoint_interval = min_checkpoint_interval
+        self.session_dir = None
+        # dataset key -> {"file": ..., "version": ..., "saved_at": ...}
+        self.checkpoints = {}
+        # dataset key -> stem of its two checkpoint files
+        self._slots = {}
+        # dataset key -> time of the last failed checkpoint
+        self._failed_at = {}
+        # sessions restored from, deleted once this session exits cleanly
+        self.restored_sessions = []
+        self._lock = None
+        self._worker = None
+        self._file_counter = 0
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(check_interval * 1000))
+        self.timer.timeout.connect(self.check)
+
+    def start(self):
+        self.timer.start()
+
+    def _get_session_dir(self) -> str:
+        if self.session_dir is None:
+            session_dir = os.path.join(self.checkpoint_dir, time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8])
+            os.makedirs(session_dir)
+            self._lock = QLockFile(os.path.join(session_dir, LOCK_FILE))
+            self._lock.tryLock(0)
+            self.session_dir = session_dir
+        return self.session_dir
+
+    def _next_candidate(self):
+        """
+        Returns the key of the modified dataset whose checkpoint is oldest.
+        """
+        now = time.time()
+        candidates = []
+        for key in self.registry:
+            if not self.registry.is_modified(key):
+                continue
+            # failing checkpoints are not retried on every check
+            if now - self._failed_at.get(key, 0) < self.min_checkpoint_interval:
+                continue
+            checkpoint = self.checkpoints.get(key)
+            if checkpoint is None:
+                candidates.append((0, key))
+            elif (checkpoint["version"] != self.registry.version(key) and
+                  now - checkpoint["saved_at"] >= self.min_checkpoint_interval):
+                candidates.append((checkpoint["saved_at"], key))
+        return min(candidates)[1] if candidates else None
+
+    def check(self):
+        """
+        Starts the next checkpoint, if a dataset needs one and no checkpoint is running.
+        """
+        if self._worker is not None:
+            return
+        self.remove_stale_checkpoints()
+        key = self._next_candidate()
+        if key is None:
+            return
+
+        if key not in self._slots:
+            self._file_counter += 1
+            self._slots[key] = f"checkpoint_{self._file_counter}"
+        # the file the manifest does not point to
+        file_name = f"{self._slots[key]}_a.h5ad"
+        if self.checkpoints.get(key, {}).get("file") == file_name:
+            file_name = f"{self._slots[key]}_b.h5ad"
+
+        version = self.registry.version(key)
+        file_path = os.path.join(self._get_session_dir(), file_name)
+        # peek does not count as a use for the memory budget
+        entry = self.registry.peek(key)
+        if self.registry.is_spilled(key):
+            worker = CheckpointCopyWorker(entry.file_path, file_path)
+        else:
+            worker = DatasetIOWorker(file_path, entry)
+        worker.finished.connect(lambda: self.on_checkpoint_written(worker, key, version, file_name))
+        worker.error.connect(lambda error_message: self.on_checkpoint_error(key, error_message))
+        self._worker = worker
+        if self.scheduler is not None:
+            self.scheduler.submit(worker, "Checkpoint", key, priority = PRIORITY_LOW, writes = False)
+        else:
+            worker.start()
+
+    def on_checkpoint_written(self, worker, key, version, file_name):
+        self._worker = None
+        self._failed_at.pop(key, None)
+        # the dataset might have been removed or renamed while it was written.
+        # A spilled dataset that was read back in the meantime keeps its version.
+        if worker.dataset is None:
+            still_current = self.registry.version(key) == version
+        else:
+            still_current = self.registry.peek(key) is worker.dataset
+        if not still_current:
+            self.remove_stale_checkpoints()
+            return
+        self.checkpoints[key] = {"file": file_name, "version": version, "saved_at": time.time()}
+        self.write_manifest()
+        self.checkpoint_written.emit(key)
+
+    def on_checkpoint_error(self, key, error_message):
+        self._worker = None
+        self._failed_at[key] = time.time()
+        self.checkpoint_failed.emit(key, error_message)
+
+    def remove_stale_checkpoints(self):
+        """
+        Deletes the checkpoints of datasets that were removed or renamed.
+        """
+        stale = [key for key in self._slots if key not in self.registry]
+        if not stale:
+            return
+        for key in stale:
+            slot = self._slots.pop(key)
+            self.checkpoints.pop(key, None)
+            self._failed_at.pop(key, None)
+            for file_name in _checkpoint_files(f"{slot}_a.h5ad") + _checkpoint_files(f"{slot}_b.h5ad"):
+                file_path = os.path.join(self.session_dir, file_name)
+                if os.path.isfile(file_path):
+                    os.remove(file_path)
+        self.write_manifest()
+
+    def write_manifest(self):
+        manifest_path = os.path.join(self._get_session_dir(), MANIFEST_FILE)
+        with open(manifest_path + ".part", "w") as manifest_file:
+            json.dump(self.checkpoints, manifest_file, indent = 1)
+        os.replace(manifest_path + ".part", manifest_path)
+
+    def discard_session(self, session_dir: str):
+        shutil.rmtree(session_dir, ignore_errors = True)
+
+    def shutdown(self):
+        """
+        Stops autosaving and deletes the checkpoints. Called on a clean exit.
+        """
+        self.timer.stop()
+        if self._worker is not None:
+            self._worker.stop()
+            self._worker.wait()
+        if self._lock is not None:
+            self._lock.unlock()
+        for session_dir in self.restored_sessions + [self.session_dir]:
+            if session_dir is not None:
+                self.discard_session(session_dir)
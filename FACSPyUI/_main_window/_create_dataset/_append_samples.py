@@ -0,0 +1,237 @@
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel, QPushButton,
+                             QLineEdit, QFileDialog, QComboBox, QHBoxLayout,
+                             QMessageBox, QFormLayout)
+from PyQt5.QtCore import pyqtSignal, QThread, QMutex, QMutexLocker
+
+import FACSPy as fp
+
+from .._utils import LoadingScreen
+from ._utils import EditableTableWidget
+from ._ingest import ingest_files, assemble_datasets, append_datasets
+from ._workspace import load_workspace, cached_workspace, WorkspaceLoader
+
+
+class SampleAppender(QThread):
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+    # (files done, total files, file name)
+    progress = pyqtSignal(int, int, str)
+
+    def __init__(self, dataset, input_dir, metadata_table, workspace_path,
+                 subsample_fcs_to, transform, key_added):
+        super().__init__()
+        self.dataset = dataset
+        self.input_dir = input_dir
+        self.metadata_table = metadata_table
+        self.workspace_path = workspace_path
+        self.subsample_fcs_to = subsample_fcs_to
+        self.transform = transform
+        self.key_added = key_added
+        self.combined = None
+        self.not_carried_over = []
+        self._is_running = True
+        self._mutex = QMutex()
+
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
+    def run(self):
+        try:
+            existing_files = set(self.dataset.obs["file_name"].astype(str))
+            new_files = self.metadata_table[~self.metadata_table["file_name"].isin(existing_files)]
+            if new_files.shape[0] == 0:
+                self.error.emit("The metadata table lists no files that are not in the dataset yet.")
+                return
+
+            metadata = fp.dt.Metadata(metadata = self.metadata_table)
+            panel = self.dataset.uns["panel"]
+            datasets = ingest_files(self.input_dir, new_files, panel.to_df(),
+                                    load_workspace(self.workspace_path), self.subsample_fcs_to,
+                                    progress_callback = self.progress.emit,
+                                    is_canceled = self.is_canceled)
+            if datasets is None:
+                self.error.emit("Appending samples was canceled.")
+                return
+
+            appended = assemble_datasets(datasets, metadata, panel)
+            if self.transform != "None":
+                fp.dt.transform(appended,
+                                transform = self.transform,
+                                cofactor_table = self.dataset.uns.get("cofactors"),
+                                key_added = self.key_added)
+
+            self.combined, self.not_carried_over = append_datasets(self.dataset, appended, metadata)
+            self.finished.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+
+    def stop(self):
+        with QMutexLocker(self._mutex):
+            self._is_running = False
+
+
+class AppendSamplesWindow(QWidget):
+    """
+    Adds the samples of an updated metadata table to an existing dataset.
+    Only the files that are not in the dataset yet are read. They get the
+    panel and cofactors of the dataset and are transformed into one of its
+    layers before they are appended.
+    """
+
+    def __init__(self, main_window, dataset_key, dataset):
+        super().__init__()
+        self.main_window = main_window
+        self.dataset_key = dataset_key
+        self.dataset = dataset
+        # the dataset stays in memory while the window is open
+        self.main_window.DATASHACK.acquire(dataset)
+        self.worker = None
+        self.workspace_loader = None
+
+        self.setWindowTitle(f"Append Samples to {dataset_key}")
+        self.setGeometry(150, 150, 800, 600)
+
+        layout = QVBoxLayout()
+
+        self.metadata_table = EditableTableWidget(
+            "Add the new samples to the metadata table:\n\n" + \
+            "Add rows via 'Modify Table > Add Row' or drag-and-drop the updated .csv file",
+            ["sample_ID", "file_name"]
+        )
+        self.metadata_table.model.load_dataframe(dataset.uns["metadata"].to_df())
+        layout.addWidget(self.metadata_table)
+
+        self.input_dir_display = QLineEdit()
+        self.input_dir_display.setReadOnly(True)
+        select_input_dir_button = QPushButton("Select Directory")
+        select_input_dir_button.clicked.connect(self.open_directory_dialog)
+
+        self.workspace_display = QLineEdit()
+        self.workspace_display.setReadOnly(True)
+        workspace_button = QPushButton("Load")
+        workspace_button.clicked.connect(self.open_workspace_dialog)
+
+        self.subsample_fcs_input = QLineEdit()
+
+        self.transformation_combo = QComboBox()
+        self.transformation_combo.addItems(["asinh", "logicle", "log", "hyperlog", "None"])
+
+        # the new cells are transformed into an existing layer
+        self.transformed_layer_combo = QComboBox()
+        self.transformed_layer_combo.addItems([layer for layer in dataset.layers if layer != "compensated"])
+
+        self.append_button = QPushButton("Append Samples")
+        self.append_button.clicked.connect(self.append_samples)
+
+        form_layout = QFormLayout()
+        form_layout.addRow(QLabel("Select input directory:"), self.create_horizontal_layout(self.input_dir_display, select_input_dir_button))
+        self.workspace_label = QLabel("Upload workspace:")
+        form_layout.addRow(self.workspace_label, self.create_horizontal_layout(self.workspace_display, workspace_button))
+        form_layout.addRow(QLabel("Subsample FCS to:"), self.subsample_fcs_input)
+        form_layout.addRow(QLabel("Select transformation:"), self.transformation_combo)
+        form_layout.addRow(QLabel("Transformed layer:"), self.transformed_layer_combo)
+        form_layout.addRow("", self.append_button)
+        layout.addLayout(form_layout)
+
+        self.setLayout(layout)
+
+    def create_horizontal_layout(self, widget1, widget2):
+        layout = QHBoxLayout()
+        layout.addWidget(widget1)
+        layout.addWidget(widget2)
+        return layout
+
+    def open_directory_dialog(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select Directory")
+        if directory:
+            self.input_dir_display.setText(directory)
+
+    def open_workspace_dialog(self):
+        file_name, _ = QFileDialog.getOpenFileName(self, "Open File", "", "All Files (*)")
+        if file_name:
+            self.workspace_display.setText(file_name)
+            self.parse_workspace(file_name)
+
+    def parse_workspace(self, file_name):
+        """
+        Parses the workspace in the background while the metadata are edited.
+        """
+        if cached_workspace(file_name) is not None:
+            self.workspace_label.setText("Upload workspace: (parsed)")
+            return
+        self.workspace_label.setText("Upload workspace: (parsing...)")
+        loader = WorkspaceLoader(file_name)
+        loader.finished.connect(lambda: self.on_workspace_parsed(loader))
+        loader.error.connect(lambda message: self.on_workspace_error(loader, message))
+        self.workspace_loader = loader
+        self.main_window.jobs.submit(loader, "Parse workspace", writes = False)
+
+    def on_workspace_parsed(self, loader):
+        if loader is self.workspace_loader:
+            self.workspace_label.setText("Upload workspace: (parsed)")
+
+    def on_workspace_error(self, loader, error_message):
+        if loader is self.workspace_loader:
+            self.workspace_label.setText("Upload workspace:")
+            QMessageBox.critical(self, "Workspace Error", error_message)
+
+    def append_samples(self):
+        """
+        Reads the new files in the background and appends them to the dataset.
+        """
+        try:
+            metadata_table = self.metadata_table.to_dataframe()
+            _ = fp.dt.Metadata(metadata = metadata_table)
+            subsample_fcs_to = int(self.subsample_fcs_input.text()) if self.subsample_fcs_input.text() else None
+        except Exception as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+
+        self.loading_screen = LoadingScreen(self.main_window, message = "Appending samples...\n\n")
+        self.loading_screen.cancel_signal.connect(self.cancel_calculation)
+        self.loading_screen.show()
+
+        self.calculation_canceled = False
+        self.worker = SampleAppender(self.dataset, self.input_dir_display.text(), metadata_table,
+                                     self.workspace_display.text(), subsample_fcs_to,
+                                     self.transformation_combo.currentText(),
+                                     self.transformed_layer_combo.currentText())
+        self.worker.progress.connect(self.on_append_progress)
+        self.worker.finished.connect(self.on_append_finished)
+        self.worker.error.connect(self.on_append_error)
+        # the new dataset replaces the entry, the existing one is only read
+        self.main_window.jobs.submit(self.worker, "Append samples", self.dataset_key, writes = False)
+
+    def on_append_progress(self, files_done, n_files, file_name):
+        self.loading_screen.set_progress(files_done / n_files,
+                                         "Reading FCS files",
+                                         f"{file_name} ({files_done} of {n_files})")
+
+    def on_append_finished(self):
+        self.loading_screen.close()
+        if self.calculation_canceled:
+            return
+        # the entry might have been removed in the meantime
+        dataset_key = self.dataset_key if self.dataset_key in self.main_window.DATASHACK else f"{self.dataset_key}-appended"
+        self.main_window.load_dataset(dataset_key, self.worker.combined)
+        message = "Samples appended successfully."
+        if self.worker.not_carried_over:
+            message += ("\n\nThe following results were computed on the previous cells " +
+                        "and have to be recalculated:\n" + "\n".join(self.worker.not_carried_over))
+        QMessageBox.information(self, "Success", message)
+        self.close()
+
+    def on_append_error(self, error_message):
+        self.loading_screen.close()
+        if not self.calculation_canceled:
+            QMessageBox.critical(self, "Error", error_message)
+
+    def cancel_calculation(self):
+        self.calculation_canceled = True
+        if self.worker:
+            self.worker.stop()
+
+    def closeEvent(self, event):
+        self.main_window.DATASHACK.release(self.dataset)
+        super().closeEvent(event)
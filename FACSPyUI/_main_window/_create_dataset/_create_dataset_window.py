@@ -15,7 +15,6 @@ class CreateDatasetWindow(QWidget):
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
-        self.setStyleSheet(self.main_window.stylesheet)
 
         self.setWindowTitle("New Analysis")
         self.setGeometry(100, 100, 800, 600)
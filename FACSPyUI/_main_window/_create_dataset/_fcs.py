@@ -0,0 +1,192 @@
+import os
+import re
+
+import numpy as np
+
+# fixed, so that the same files are always subsampled to the same events.
+# The events differ from the ones FACSPy selects with subsample_fcs_to,
+# see write_subsampled_fcs.
+RANDOM_STATE = 187
+
+# keywords that describe the layout of the file and are rewritten
+LAYOUT_KEYWORDS = ("$TOT", "$BEGINDATA", "$ENDDATA", "$BEGINANALYSIS", "$ENDANALYSIS",
+                   "$BEGINSTEXT", "$ENDSTEXT", "$NEXTDATA")
+
+# width of the offset values in a written TEXT segment, fixed so that
+# the offsets can be computed before the segment is written
+OFFSET_WIDTH = 20
+
+
+def _parse_text(text: bytes) -> list:
+    """
+    Splits a TEXT segment into (keyword, value) pairs. A doubled
+    delimiter inside a keyword or value stands for the delimiter itself,
+    so in a run of delimiters every pair is one literal delimiter and an
+    odd one out ends the field.
+    """
+    delimiter = text[:1]
+    fields = []
+    field = []
+    parts = re.split(b"(" + re.escape(delimiter) + b"+)", text[1:])
+    for i, part in enumerate(parts):
+        if i % 2 == 0:
+            field.append(part)
+            continue
+        field.append(delimiter * (len(part) // 2))
+        if len(part) % 2:
+            fields.append(b"".join(field).decode("latin-1"))
+            field = []
+    field = b"".join(field)
+    if field.strip():
+        fields.append(field.decode("latin-1"))
+    return list(zip(fields[0::2], fields[1::2]))
+
+
+class FCSFile:
+    """
+    Reads the HEADER and TEXT segment of an FCS 3.x file and memory maps
+    the DATA segment as an (events x parameters) array. Nothing is decoded
+    until events are selected, so reading a subsample only touches the
+    pages of the selected events.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, "rb") as file:
+            header = file.read(58)
+            self.version = header[:6].decode()
+            text_begin, text_end, data_begin, data_end = (
+                int(header[10 + 8 * i:18 + 8 * i]) for i in range(4)
+            )
+            file.seek(text_begin)
+            text = file.read(text_end - text_begin + 1)
+
+        self.keywords = _parse_text(text)
+        self._lookup = {key.upper(): value for key, value in self.keywords}
+        # offsets above 99,999,999 are only stored in the TEXT segment
+        if data_begin == 0 and data_end == 0:
+            data_begin = int(self._lookup.get("$BEGINDATA", 0))
+            data_end = int(self._lookup.get("$ENDDATA", 0))
+        self.data_begin = data_begin
+        self.data_end = data_end
+
+        self.n_events = int(self._lookup["$TOT"])
+        self.n_parameters = int(self._lookup["$PAR"])
+        self.dtype = self._data_dtype()
+
+    def keyword(self, key: str, default = None):
+        return self._lookup.get(key.upper(), default)
+
+    def _data_dtype(self):
+        """
+        Returns the numpy dtype of one value or None if the DATA segment
+        cannot be memory mapped, e.g. for ASCII data or packed integers.
+        """
+        if self.keyword("$MODE", "L").upper() != "L":
+            return None
+        byte_order = self.keyword("$BYTEORD", "1,2,3,4").replace(" ", "")
+        if byte_order in ("1,2,3,4", "1,2"):
+            endian = "<"
+        elif byte_order in ("4,3,2,1", "2,1"):
+            endian = ">"
+        else:
+            return None
+
+        data_type = self.keyword("$DATATYPE", "").upper()
+        bits = {self.keyword(f"$P{i}B") for i in range(1, self.n_parameters + 1)}
+        if data_type == "F":
+            return np.dtype(f"{endian}f4")
+        if data_type == "D":
+            return np.dtype(f"{endian}f8")
+        if data_type == "I" and len(bits) == 1 and bits.pop() in ("8", "16", "32", "64"):
+            return np.dtype(f"{endian}u{int(self.keyword('$P1B')) // 8}")
+        return None
+
+    @property
+    def can_memory_map(self) -> bool:
+        return self.dtype is not None
+
+    def data(self) -> np.memmap:
+        """
+        Returns the DATA segment as a read-only (events x parameters) memory map.
+        """
+        return np.memmap(self.file_path,
+                         dtype = self.dtype,
+                         mode = "r",
+                         offset = self.data_begin,
+                         shape = (self.n_events, self.n_parameters))
+
+    def subsample_indices(self, n_events: int) -> np.ndarray:
+        """
+        Returns the sorted indices of n_events randomly selected events.
+        Sorted indices read the file front to back.
+        """
+        rng = np.random.default_rng(RANDOM_STATE)
+        return np.sort(rng.choice(self.n_events, size = n_events, replace = False))
+
+    def events(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Decodes the selected events only.
+        """
+        return np.asarray(self.data()[indices])
+
+
+def _build_text(keywords: list, delimiter: str = "/") -> bytes:
+    escaped = lambda value: str(value).replace(delimiter, delimiter * 2)
+    text = delimiter
+    for key, value in keywords:
+        text += f"{escaped(key)}{delimiter}{escaped(value)}{delimiter}"
+    # latin-1 writes back the exact bytes that were read
+    return text.encode("latin-1")
+
+
+def write_subsampled_fcs(file_path: str,
+                         output_path: str,
+                         n_events: int) -> bool:
+    """
+    Writes an FCS 3.1 file with n_events randomly selected events of
+    file_path. All keywords except the segment layout are kept, e.g. the
+    spillover matrix and the channel names, and the events keep their
+    original binary encoding. Only the selected events are read, so memory
+    use follows n_events instead of the size of the acquisition.
+
+    The events are drawn with numpy's default_rng(RANDOM_STATE) and kept
+    in file order. This selects a different, but equally random and
+    reproducible, subset than FACSPy's own subsample_fcs_to, which reads
+    the whole file first. Datasets created with subsampling therefore
+    differ from the ones created before this reader was used.
+
+    Returns False if nothing was written because the file has at most
+    n_events events or its DATA segment cannot be memory mapped.
+    """
+    fcs_file = FCSFile(file_path)
+    if fcs_file.n_events <= n_events or not fcs_file.can_memory_map:
+        return False
+
+    data = fcs_file.events(fcs_file.subsample_indices(n_events)).tobytes()
+
+    text_begin = 58
+    keywords = [(key, value) for key, value in fcs_file.keywords if key.upper() not in LAYOUT_KEYWORDS]
+    layout = [("$TOT", str(n_events)), ("$NEXTDATA", "0"),
+              ("$BEGINANALYSIS", "0"), ("$ENDANALYSIS", "0"),
+              ("$BEGINSTEXT", "0"), ("$ENDSTEXT", "0")]
+    placeholder = "0" * OFFSET_WIDTH
+    text_length = len(_build_text(keywords + layout + [("$BEGINDATA", placeholder), ("$ENDDATA", placeholder)]))
+    data_begin = text_begin + text_length
+    data_end = data_begin + len(data) - 1
+    text = _build_text(keywords + layout + [("$BEGINDATA", str(data_begin).zfill(OFFSET_WIDTH)),
+                                            ("$ENDDATA", str(data_end).zfill(OFFSET_WIDTH))])
+
+    # the HEADER can only hold offsets with up to 8 digits
+    header_offsets = [text_begin, text_begin + len(text) - 1, data_begin, data_end, 0, 0]
+    if data_end > 99_999_999:
+        header_offsets[2:4] = [0, 0]
+    header = b"FCS3.1    " + b"".join(str(offset).rjust(8).encode() for offset in header_offsets)
+
+    partial_path = output_path + ".part"
+    with open(partial_path, "wb") as output_file:
+        output_file.write(header)
+        output_file.write(text)
+        output_file.write(data)
+    os.replace(partial_path, output_path)
+    return True
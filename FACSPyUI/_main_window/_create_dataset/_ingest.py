@@ -0,0 +1,255 @@
+import os
+import time
+import tempfile
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+# workspace of this worker process, set once when the process starts
+_workspace = None
+
+
+def default_n_processes(n_files: int) -> int:
+    # one core is left for the GUI
+    return max(min(n_files, (os.cpu_count() or 2) - 1), 1)
+
+
+def _init_worker(workspace):
+    global _workspace
+    _workspace = workspace
+
+
+def ingest_sample(input_dir: str,
+                  sample_metadata: pd.DataFrame,
+                  panel: pd.DataFrame,
+                  subsample_fcs_to: int):
+    """
+    Reads one FCS file, compensates it, applies the workspace gates and
+    subsamples it. Runs in a worker process, so all arguments are plain
+    tables and paths. The parsed workspace is handed to the process once
+    when it starts, see _init_worker.
+
+    Files with more events than subsample_fcs_to are subsampled from a
+    memory map of their DATA segment first, so FACSPy only reads the
+    selected events.
+    """
+    import FACSPy as fp
+    from ._fcs import write_subsampled_fcs
+
+    with tempfile.TemporaryDirectory(prefix = "facspyui_fcs_") as temp_dir:
+        file_name = sample_metadata["file_name"].iloc[0]
+        if subsample_fcs_to and write_subsampled_fcs(os.path.join(input_dir, file_name),
+                                                     os.path.join(temp_dir, file_name),
+                                                     subsample_fcs_to):
+            input_dir = temp_dir
+        return fp.dt.create_dataset(
+            input_directory = input_dir,
+            metadata = fp.dt.Metadata(metadata = sample_metadata),
+            panel = fp.dt.Panel(panel = panel),
+            workspace = _workspace,
+            subsample_fcs_to = subsample_fcs_to
+        )
+
+
+def _align_gating(datasets: list) -> pd.Index:
+    """
+    Reorders the columns of obsm["gating"] of every dataset to the union
+    of all gates, as a workspace might not define every gate for every sample.
+    Returns the union.
+    """
+    from scipy import sparse
+
+    gates = []
+    for dataset in datasets:
+        gates += [gate for gate in dataset.uns.get("gating_cols", []) if gate not in gates]
+    gating_cols = pd.Index(gates)
+
+    for dataset in datasets:
+        sample_gates = pd.Index(dataset.uns.get("gating_cols", []))
+        if sample_gates.equals(gating_cols) or "gating" not in dataset.obsm:
+            continue
+        gating = sparse.coo_matrix(dataset.obsm["gating"])
+        columns = gating_cols.get_indexer(sample_gates)[gating.col]
+        dataset.obsm["gating"] = sparse.csr_matrix((gating.data, (gating.row, columns)),
+                                                   shape = (dataset.n_obs, len(gating_cols)))
+        dataset.uns["gating_cols"] = gating_cols
+
+    return gating_cols
+
+
+def ingest_files(input_dir: str,
+                 metadata_table: pd.DataFrame,
+                 panel_table: pd.DataFrame,
+                 workspace,
+                 subsample_fcs_to: int,
+                 progress_callback = None,
+                 is_canceled = None,
+                 n_processes: int = None):
+    """
+    Ingests every file of metadata_table in its own task on a process pool.
+    workspace is the parsed FlowJoWorkspace or None.
+    progress_callback receives (files done, total files, file name).
+    Returns the per-file datasets in metadata order or None if canceled.
+    Canceling terminates the running tasks and drops the queued ones.
+    """
+    file_names = list(metadata_table["file_name"])
+    n_processes = n_processes or default_n_processes(len(file_names))
+    # forking a process that runs Qt is not safe
+    pool = multiprocessing.get_context("spawn").Pool(processes = n_processes,
+                                                     initializer = _init_worker,
+                                                     initargs = (workspace,))
+    try:
+        results = [
+            pool.apply_async(ingest_sample, (input_dir,
+                                             metadata_table.iloc[[i]].reset_index(drop = True),
+                                             panel_table,
+                                             subsample_fcs_to))
+            for i in range(len(file_names))
+        ]
+        pool.close()
+
+        pending = set(range(len(results)))
+        while pending:
+            if is_canceled is not None and is_canceled():
+                return None
+            for i in [i for i in pending if results[i].ready()]:
+                pending.remove(i)
+                if not results[i].successful():
+                    try:
+                        results[i].get()
+                    except Exception as e:
+                        raise RuntimeError(f"Failed to read {file_names[i]}: {e}")
+                if progress_callback is not None:
+                    progress_callback(len(results) - len(pending), len(results), file_names[i])
+            time.sleep(0.1)
+
+        return [result.get() for result in results]
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _concatenate(datasets: list):
+    """
+    Concatenates datasets along the cells and returns the result and
+    the union of their gates.
+    """
+    import anndata as ad
+
+    gating_cols = _align_gating(datasets)
+    categorical = {
+        column for dataset in datasets for column in dataset.obs.columns
+        if isinstance(dataset.obs[column].dtype, pd.CategoricalDtype)
+    }
+
+    dataset = ad.concat(datasets, join = "outer", merge = "same")
+    dataset.obs_names = np.arange(dataset.n_obs).astype(str)
+    # categories differ between the files and are merged to objects by concat
+    for column in categorical:
+        dataset.obs[column] = dataset.obs[column].astype("category")
+
+    return dataset, gating_cols
+
+
+def assemble_datasets(datasets: list,
+                      metadata,
+                      panel):
+    """
+    Concatenates the per-file datasets into one dataset. The full metadata
+    and panel replace the per-file ones and the dataset is synchronized.
+    """
+    import FACSPy as fp
+
+    dataset, gating_cols = _concatenate(datasets)
+    dataset.uns = dict(datasets[0].uns)
+    dataset.uns["metadata"] = metadata
+    dataset.uns["panel"] = panel
+    if len(gating_cols):
+        dataset.uns["gating_cols"] = gating_cols
+    fp.sync.synchronize_dataset(dataset)
+    return dataset
+
+
+# uns key prefix of per-sample tables -> FACSPy tool that computes them
+PER_SAMPLE_TOOLS = {
+    "mfi": "mfi",
+    "fop": "fop"
+}
+
+# uns key of {per-sample table key: keyword arguments of the tool that computed it}
+TOOL_KWARGS_KEY = "facspyui_tool_kwargs"
+
+
+def record_tool_kwargs(dataset,
+                       metric: str,
+                       kwargs: dict):
+    """
+    Stores the keyword arguments a per-sample table was computed with,
+    so that appended samples are computed the same way.
+    """
+    key = f"{metric}_{kwargs['groupby']}_{kwargs['layer']}"
+    dataset.uns.setdefault(TOOL_KWARGS_KEY, {})[key] = dict(kwargs)
+
+
+def _recompute_per_sample_tables(dataset, appended) -> list:
+    """
+    Computes the per-sample tables of dataset (named <metric>_<groupby>_<layer>,
+    and gate_frequencies) for the appended samples only and adds their rows.
+    The tools run with the keyword arguments stored by record_tool_kwargs.
+    Returns the keys that could not be extended.
+    """
+    import FACSPy as fp
+
+    tool_kwargs = dataset.uns.get(TOOL_KWARGS_KEY, {})
+    failed = []
+    for key, table in list(dataset.uns.items()):
+        if not isinstance(table, pd.DataFrame):
+            continue
+        try:
+            if key == "gate_frequencies":
+                fp.tl.gate_frequencies(appended)
+            else:
+                metric = key.partition("_")[0]
+                if metric not in PER_SAMPLE_TOOLS:
+                    continue
+                kwargs = tool_kwargs.get(key)
+                # tables computed with unknown options or grouped without
+                # the samples cannot be extended
+                if kwargs is None or "sample_ID" not in kwargs["groupby"]:
+                    failed.append(key)
+                    continue
+                tool = getattr(fp.tl, PER_SAMPLE_TOOLS[metric])
+                tool(appended, **kwargs)
+            dataset.uns[key] = pd.concat([table, appended.uns[key]])
+        except Exception:
+            failed.append(key)
+    return failed
+
+
+def append_datasets(dataset,
+                    appended,
+                    metadata):
+    """
+    Returns a new dataset with the cells of appended added to dataset. The
+    per-sample tables of dataset are extended by computing them for the
+    appended samples only. Returns the new dataset and the components that
+    could not be carried over: layers missing in appended, cell-wise results
+    such as embeddings and per-sample tables that could not be extended.
+    """
+    import FACSPy as fp
+    from .._datashack import copy_on_write
+
+    # aligning the gates changes obsm of the existing dataset otherwise
+    existing = copy_on_write(dataset)
+    combined, gating_cols = _concatenate([existing, appended])
+
+    combined.uns = existing.uns
+    combined.uns["metadata"] = metadata
+    if len(gating_cols):
+        combined.uns["gating_cols"] = gating_cols
+    not_carried_over = [f"layers/{layer}" for layer in existing.layers if layer not in combined.layers]
+    not_carried_over += [f"obsm/{key}" for key in existing.obsm if key not in combined.obsm]
+    not_carried_over += _recompute_per_sample_tables(combined, appended)
+    fp.sync.synchronize_dataset(combined)
+    return combined, not_carried_over
@@ -1,4 +1,3 @@
-import pandas as pd
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel,
                              QPushButton, QLineEdit, QFileDialog,
                              QComboBox, QHBoxLayout, QFrame,
@@ -7,43 +6,52 @@ from .._utils import MultiSelectComboBox
 from PyQt5.QtCore import pyqtSignal, QThread, QMutex, QMutexLocker
 
 from .._utils import LoadingScreen
+from ._ingest import ingest_files, assemble_datasets
+from ._workspace import load_workspace, cached_workspace, WorkspaceLoader
 
 import FACSPy as fp
 
 class DatasetCreator(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    # (files done, total files, file name)
+    progress = pyqtSignal(int, int, str)
 
-    def __init__(self, main_window, input_dir, metadata, panel, wsp, subsample_fcs_to,
-                 transform, cofactor_table, key_added):
+    def __init__(self, main_window, input_dir, metadata, panel, workspace_path, subsample_fcs_to,
+                 transform, cofactor_table, key_added, metadata_table, panel_table, n_processes = None):
         super().__init__()
         self.main_window = main_window
         self.input_dir = input_dir
         self.metadata = metadata
         self.panel = panel
-        self.wsp = wsp
+        self.workspace_path = workspace_path
         self.subsample_fcs_to = subsample_fcs_to
 
         self.transform = transform
         self.cofactor_table = cofactor_table
         self.key_added = key_added
+        self.metadata_table = metadata_table
+        self.panel_table = panel_table
+        self.n_processes = n_processes
         self._is_running = True
         self._mutex = QMutex()  # Mutex for thread-safe flag
 
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
     def run(self):
         try:
-            with QMutexLocker(self._mutex):
-                if not self._is_running:
-                    self.error.emit("Dataset creation was canceled.")
-                    return
-
-            dataset = fp.dt.create_dataset(
-                    input_directory = self.input_dir,
-                    metadata = self.metadata,
-                    panel = self.panel,
-                    workspace = self.wsp,
-                    subsample_fcs_to = self.subsample_fcs_to
-            )
+            if self.is_canceled():
+                self.error.emit("Dataset creation was canceled.")
+                return
+
+            datasets = self.ingest_files()
+            if datasets is None:
+                self.error.emit("Dataset creation was canceled.")
+                return
+
+            dataset = assemble_datasets(datasets, self.metadata, self.panel)
             if self.transform != "None":
                 fp.dt.transform(dataset,
                                 transform = self.transform,
@@ -56,6 +64,18 @@ class DatasetCreator(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+    def ingest_files(self):
+        """
+        Ingests every file on a process pool, see ingest_files.
+        """
+        # waits for the background parse if it is still running
+        workspace = load_workspace(self.workspace_path)
+        return ingest_files(self.input_dir, self.metadata_table, self.panel_table,
+                            workspace, self.subsample_fcs_to,
+                            progress_callback = self.progress.emit,
+                            is_canceled = self.is_canceled,
+                            n_processes = self.n_processes)
+
     def stop(self):
         with QMutexLocker(self._mutex):
             self._is_running = False
@@ -85,6 +105,7 @@ class SettingsTab(QWidget):
         self.upload_workspace_text.setReadOnly(True)
         self.upload_workspace_button = QPushButton("Load")
         self.upload_workspace_button.clicked.connect(self.open_file_dialog)
+        self.workspace_loader = None
 
         # Section 3: Subsample FCS to
         self.subsample_fcs_label = QLabel("Subsample FCS to:")
@@ -174,6 +195,30 @@ class SettingsTab(QWidget):
         file_name, _ = QFileDialog.getOpenFileName(self, "Open File", "", "All Files (*)", options=options)
         if file_name:
             self.upload_workspace_text.setText(file_name)
+            self.parse_workspace(file_name)
+
+    def parse_workspace(self, file_name):
+        """
+        Parses the workspace in the background while the tables are filled in.
+        """
+        if cached_workspace(file_name) is not None:
+            self.upload_workspace_label.setText("Upload workspace: (parsed)")
+            return
+        self.upload_workspace_label.setText("Upload workspace: (parsing...)")
+        loader = WorkspaceLoader(file_name)
+        loader.finished.connect(lambda: self.on_workspace_parsed(loader))
+        loader.error.connect(lambda message: self.on_workspace_error(loader, message))
+        self.workspace_loader = loader
+        self.main_window.jobs.submit(loader, "Parse workspace", writes = False)
+
+    def on_workspace_parsed(self, loader):
+        if loader is self.workspace_loader:
+            self.upload_workspace_label.setText("Upload workspace: (parsed)")
+
+    def on_workspace_error(self, loader, error_message):
+        if loader is self.workspace_loader:
+            self.upload_workspace_label.setText("Upload workspace:")
+            self.show_error("Workspace Error", error_message)
 
     def check_metadata(self):
         """
@@ -222,8 +267,8 @@ class SettingsTab(QWidget):
         else:
             cofactors = None
         input_dir = self.input_dir_display.text()
+        # parsed in the background when the file was selected, see parse_workspace
         wsp_name = self.upload_workspace_text.text()
-        wsp = fp.dt.FlowJoWorkspace(wsp_name)
         subsample_fcs_to = int(self.subsample_fcs_input.text())
 
         key_added = self.transformed_layer_input.text()
@@ -231,18 +276,24 @@ class SettingsTab(QWidget):
 
         # Show loading screen
         loading_message = "Creating dataset...\n\n"
-        self.loading_screen = LoadingScreen(message=loading_message)
+        self.loading_screen = LoadingScreen(self.main_window, message=loading_message)
         self.loading_screen.cancel_signal.connect(self.cancel_calculation)
         self.loading_screen.show()
 
         self.calculation_canceled = False
         self.worker = DatasetCreator(
-            self.main_window, input_dir, metadata, panel, wsp, subsample_fcs_to,
-            transform, cofactors, key_added
+            self.main_window, input_dir, metadata, panel, wsp_name, subsample_fcs_to,
+            transform, cofactors, key_added, metadata_table, panel_table
         )
+        self.worker.progress.connect(self.on_creation_progress)
         self.worker.finished.connect(self.on_creation_finished)
         self.worker.error.connect(self.on_creation_error)
-        self.worker.start()
+        self.main_window.jobs.submit(self.worker, "Dataset creation", "user-created")
+
+    def on_creation_progress(self, files_done, n_files, file_name):
+        self.loading_screen.set_progress(files_done / n_files,
+                                         "Reading FCS files",
+                                         f"{file_name} ({files_done} of {n_files})")
 
     def on_creation_finished(self):
         self.loading_screen.close()
@@ -277,20 +328,8 @@ class SettingsTab(QWidget):
         error_dialog.setText(message)
         error_dialog.exec_()
 
-    def table_to_dataframe(self, table_widget):
+    def table_to_dataframe(self, table_view):
         """
-        Converts a QTableWidget to a pandas DataFrame.
+        Converts the table of an EditableTableWidget to a pandas DataFrame.
         """
-        rows = table_widget.rowCount()
-        columns = table_widget.columnCount()
-        headers = [table_widget.horizontalHeaderItem(c).text() for c in range(columns)]
-        data = []
-
-        for row in range(rows):
-            row_data = {}
-            for column in range(columns):
-                item = table_widget.item(row, column)
-                row_data[headers[column]] = item.text() if item else ""
-            data.append(row_data)
-
-        return pd.DataFrame(data, columns=headers)
+        return table_view.model().to_dataframe()
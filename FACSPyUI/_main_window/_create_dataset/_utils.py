@@ -1,9 +1,11 @@
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem, QFileDialog, 
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel, QTableView, QFileDialog, 
                              QMenu, QInputDialog, QAbstractItemView)
 from PyQt5.QtCore import Qt
 import pandas as pd
 from PyQt5.QtGui import QDropEvent, QDragEnterEvent
 
+from .._table_model import DataFrameTableModel
+
 
 class EditableTableWidget(QWidget):
     def __init__(self, instructions, default_headers):
@@ -13,9 +15,10 @@ class EditableTableWidget(QWidget):
         # Create a QLabel for instructions
         self.label = QLabel(instructions)
 
-        # Create a QTableWidget
-        self.table = QTableWidget()
-        self.initialize_table(default_headers)
+        # Create a QTableView, the model only renders the visible cells
+        self.table = QTableView()
+        self.model = DataFrameTableModel(headers = default_headers)
+        self.table.setModel(self.model)
 
         # Add widgets to the layout
         self.layout.addWidget(self.label)
@@ -38,9 +41,13 @@ class EditableTableWidget(QWidget):
         """
         Initializes the table with given headers.
         """
-        self.table.setColumnCount(len(headers))
-        self.table.setHorizontalHeaderLabels(headers)
-        self.table.setRowCount(0)  # Initialize with no rows
+        self.model.load_dataframe(pd.DataFrame(columns = headers))  # Initialize with no rows
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Returns the table as a DataFrame of strings.
+        """
+        return self.model.to_dataframe()
 
     def load_table(self, file_name):
         """
@@ -54,16 +61,8 @@ class EditableTableWidget(QWidget):
             else:
                 raise ValueError("Unsupported file type. Only CSV and TSV files are supported.")
 
-            # Update the table headers
-            self.initialize_table(df.columns)
-
-            # Set the table row count to the dataframe length
-            self.table.setRowCount(len(df))
-
-            # Populate the table with data
-            for row_index, row_data in df.iterrows():
-                for column_index, value in enumerate(row_data):
-                    self.table.setItem(row_index, column_index, QTableWidgetItem(str(value)))
+            # Update the table headers and data
+            self.model.load_dataframe(df)
 
         except Exception as e:
             print(f"Failed to load file: {e}")
@@ -72,25 +71,22 @@ class EditableTableWidget(QWidget):
         """
         Adds a new column named 'new column' to the table.
         """
-        current_column_count = self.table.columnCount()
-        self.table.insertColumn(current_column_count)
-        self.table.setHorizontalHeaderItem(current_column_count, QTableWidgetItem("new column"))
+        self.model.add_column("new column")
 
     def add_row(self):
         """
         Adds a new empty row to the table.
         """
-        current_row_count = self.table.rowCount()
-        self.table.insertRow(current_row_count)
+        self.model.add_row()
 
     def remove_row(self):
         """
         Removes the currently selected row from the table.
         """
-        selected_indexes = self.table.selectedIndexes()
+        selected_indexes = self.table.selectionModel().selectedIndexes()
         if selected_indexes:
             selected_row = selected_indexes[0].row()
-            self.table.removeRow(selected_row)
+            self.model.remove_row(selected_row)
 
     def header_context_menu(self, position):
         """
@@ -108,13 +104,13 @@ class EditableTableWidget(QWidget):
         """
         Removes the column at the given index.
         """
-        self.table.removeColumn(index)
+        self.model.remove_column(index)
 
     def remove_selected_column(self):
         """
         Removes the currently selected column.
         """
-        selected_indexes = self.table.selectedIndexes()
+        selected_indexes = self.table.selectionModel().selectedIndexes()
         if selected_indexes:
             selected_index = selected_indexes[0]
             column = selected_index.column()
@@ -130,10 +126,10 @@ class EditableTableWidget(QWidget):
         """
         Allows the user to edit the column name.
         """
-        current_name = self.table.horizontalHeaderItem(index).text()
+        current_name = self.model.header(index)
         new_name, ok = QInputDialog.getText(self, "Edit Column Name", "Enter new column name:", text=current_name)
         if ok and new_name:
-            self.table.horizontalHeaderItem(index).setText(new_name)
+            self.model.setHeaderData(index, Qt.Horizontal, new_name)
 
     def dragEnterEvent(self, event: QDragEnterEvent):
         """
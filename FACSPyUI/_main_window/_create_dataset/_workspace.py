@@ -0,0 +1,75 @@
+import os
+import threading
+
+from PyQt5.QtCore import pyqtSignal, QThread
+
+# file path -> ((mtime, size), parsed workspace)
+_workspaces = {}
+# one lock per file path, so that a file is parsed once even if
+# the background parse is still running when the dataset is created
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _stamp(workspace_path: str) -> tuple:
+    stat = os.stat(workspace_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _lock(workspace_path: str) -> threading.Lock:
+    with _locks_lock:
+        return _locks.setdefault(workspace_path, threading.Lock())
+
+
+def cached_workspace(workspace_path: str):
+    """
+    Returns the parsed workspace if the file did not change since it
+    was parsed, otherwise None.
+    """
+    workspace_path = os.path.abspath(workspace_path)
+    cached = _workspaces.get(workspace_path)
+    if cached is not None and cached[0] == _stamp(workspace_path):
+        return cached[1]
+    return None
+
+
+def load_workspace(workspace_path: str):
+    """
+    Parses a FlowJo workspace. The result is cached by file path and
+    modification time, so a workspace is only parsed again once the file
+    changed. Returns None if no workspace is given.
+    """
+    import FACSPy as fp
+    if not workspace_path:
+        return None
+    workspace_path = os.path.abspath(workspace_path)
+    with _lock(workspace_path):
+        workspace = cached_workspace(workspace_path)
+        if workspace is None:
+            stamp = _stamp(workspace_path)
+            workspace = fp.dt.FlowJoWorkspace(workspace_path)
+            _workspaces[workspace_path] = (stamp, workspace)
+        return workspace
+
+
+class WorkspaceLoader(QThread):
+    """
+    Parses a workspace in the background as soon as it is selected.
+    """
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, workspace_path: str):
+        super().__init__()
+        self.workspace_path = workspace_path
+
+    def run(self):
+        try:
+            load_workspace(self.workspace_path)
+            self.finished.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+
+    def stop(self):
+        # parsing cannot be interrupted, queued loaders are dropped by the scheduler
+        pass
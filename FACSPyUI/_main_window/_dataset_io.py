@@ -0,0 +1,1011 @@
+import os
+import time
+import shutil
+import pickle
+import hashlib
+import weakref
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from PyQt5.QtCore import pyqtSignal, QThread, QMutex, QMutexLocker
+
+SPARSE_ENCODINGS = ("csr_matrix", "csc_matrix")
+
+# suffix of the files that are written before they replace the target
+PARTIAL_SUFFIX = ".part"
+
+ZARR_SUFFIX = ".zarr"
+
+# number of cells per chunk of X and the layers in a zarr store. Every
+# chunk holds one channel, so a tool or plot that uses one marker only
+# reads and decompresses the chunks of that marker.
+ZARR_CHUNK_ROWS = 1_000_000
+
+# dask name prefix of matrices that are read lazily from a zarr store
+ZARR_DASK_PREFIX = "zarr::"
+
+# rows of an array that are hashed at once to detect in place changes
+FINGERPRINT_BLOCK_ROWS = 65536
+
+# mappings of an AnnData object that are tracked per entry
+TRACKED_MAPPINGS = ("layers", "obsm", "varm", "obsp", "varp")
+
+# root attribute of an h5ad file while an incremental save updates it
+INCOMPLETE_ATTRIBUTE = "facspyui-incomplete"
+
+# root attribute of an h5ad file or zarr store with the digest of the .uns
+# file written by the same save. The two files cannot be replaced in one
+# step, a mismatch means that a save was interrupted in between.
+UNS_DIGEST_ATTRIBUTE = "facspyui-uns-digest"
+
+
+def _read_elem(element):
+    try:
+        from anndata.io import read_elem
+    except ImportError:
+        from anndata.experimental import read_elem
+    return read_elem(element)
+
+
+def _write_elem(group, key, element):
+    try:
+        from anndata.io import write_elem
+    except ImportError:
+        from anndata.experimental import write_elem
+    write_elem(group, key, element)
+
+
+class OperationCanceled(Exception):
+    pass
+
+
+class Progress:
+    """
+    Counts the bytes of a read or write. The callback receives
+    (processed bytes, total bytes) at most every 100 ms.
+    """
+
+    def __init__(self,
+                 total: int,
+                 callback = None,
+                 is_canceled = None):
+        self.total = max(total, 1)
+        self.processed = 0
+        self.callback = callback
+        self.is_canceled = is_canceled
+        self._last_report = 0.0
+
+    def advance(self, n_bytes: int):
+        if self.is_canceled is not None and self.is_canceled():
+            raise OperationCanceled()
+        self.processed += n_bytes
+        now = time.monotonic()
+        if self.callback is not None and now - self._last_report > 0.1:
+            self._last_report = now
+            self.callback(min(self.processed, self.total), self.total)
+
+
+class ProgressFile:
+    """
+    File object that reports every read and write to a Progress.
+    h5py accepts it in place of a file name, which lets us report
+    byte-level progress and abort an operation from another thread.
+    """
+
+    def __init__(self,
+                 file_path: str,
+                 mode: str,
+                 progress: Progress):
+        self._file = open(file_path, mode)
+        self.progress = progress
+
+    def read(self, size = -1):
+        data = self._file.read(size)
+        self.progress.advance(len(data))
+        return data
+
+    def readinto(self, buffer):
+        n_bytes = self._file.readinto(buffer)
+        self.progress.advance(n_bytes or 0)
+        return n_bytes
+
+    def write(self, data):
+        n_bytes = self._file.write(data)
+        self.progress.advance(n_bytes)
+        return n_bytes
+
+    def seek(self, offset, whence = os.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def truncate(self, size = None):
+        return self._file.truncate(size)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _uns_path(file_path: str) -> str:
+    # FACSPy stores uns as a pickle next to the h5ad file
+    return os.path.splitext(file_path)[0] + ".uns"
+
+
+def _hash_array(digest, array):
+    """
+    Hashes every byte of array, a block of rows at a time so that
+    non-contiguous arrays are never copied as a whole.
+    """
+    if array.dtype.hasobject:
+        digest.update(pickle.dumps(array))
+        return
+    if array.ndim == 0:
+        digest.update(np.ascontiguousarray(array).tobytes())
+        return
+    for start in range(0, array.shape[0], FINGERPRINT_BLOCK_ROWS):
+        digest.update(np.ascontiguousarray(array[start:start + FINGERPRINT_BLOCK_ROWS]).view(np.uint8))
+
+
+def _fingerprint(element):
+    """
+    Returns a token that changes when element is replaced or rewritten.
+    Arrays and sparse matrices are hashed completely, so an in place change
+    of any value is noticed. Memory mapped and lazily read matrices are
+    read-only and only identified by object identity.
+    """
+    import pandas as pd
+
+    if isinstance(element, np.memmap) or hasattr(element, "compute"):
+        return ("lazy", id(element))
+
+    digest = hashlib.blake2b(digest_size = 16)
+    if isinstance(element, pd.DataFrame):
+        digest.update(repr((list(element.columns), list(element.dtypes))).encode())
+        digest.update(pd.util.hash_pandas_object(element, index = True).to_numpy().tobytes())
+        return ("dataframe", digest.hexdigest())
+
+    if all(hasattr(element, name) for name in ("data", "indices", "indptr")):
+        for name in ("data", "indices", "indptr"):
+            _hash_array(digest, getattr(element, name))
+        return ("sparse", id(element), element.shape, element.nnz, digest.hexdigest())
+
+    if isinstance(element, np.ndarray):
+        _hash_array(digest, element)
+        return ("array", id(element), element.shape, str(element.dtype), digest.hexdigest())
+
+    try:
+        digest.update(pickle.dumps(element))
+    except Exception:
+        return ("object", id(element))
+    return ("object", digest.hexdigest())
+
+
+def _components(dataset) -> dict:
+    """
+    Returns every component that is saved separately: X, obs, var, each
+    entry of the layers, obsm, varm, obsp and varp and each key of uns.
+    """
+    elements = {
+        "X": dataset.X,
+        "obs": dataset.obs,
+        "var": dataset.var
+    }
+    for mapping in TRACKED_MAPPINGS:
+        for key, element in getattr(dataset, mapping).items():
+            elements[f"{mapping}/{key}"] = element
+    for key, value in dataset.uns.items():
+        elements[f"uns/{key}"] = value
+    return elements
+
+
+def _hash_components(elements: dict) -> dict:
+    # hashlib releases the GIL while it hashes large buffers
+    with ThreadPoolExecutor(max_workers = os.cpu_count()) as executor:
+        futures = {
+            component: executor.submit(_fingerprint, element)
+            for component, element in elements.items() if element is not None
+        }
+    return {component: futures[component].result() if component in futures else None
+            for component in elements}
+
+
+def component_fingerprints(dataset) -> dict:
+    """
+    Returns the fingerprint of every component that is saved separately,
+    see _components. The components are hashed on one thread each.
+    """
+    return _hash_components(_components(dataset))
+
+
+class _ReadElement:
+    """
+    Fingerprint of a matrix that was read from a file and not hashed yet.
+    It matches as long as the dataset holds the same object.
+    """
+
+    def __init__(self, element):
+        self._reference = weakref.ref(element)
+
+    def matches(self, element) -> bool:
+        return self._reference() is element
+
+
+def _read_fingerprints(dataset) -> dict:
+    """
+    Returns the fingerprints of a dataset that was just read without hashing
+    its matrices, which would read every byte once more. X and the entries of
+    layers, obsm, varm, obsp and varp are identified by the objects that were
+    read. FACSPy stores its results as new entries, so a replaced entry is a
+    changed one. obs, var and uns are small, change in place and are hashed.
+    The matrices are hashed by the first save.
+    """
+    elements = _components(dataset)
+    hashed = {component: element for component, element in elements.items()
+              if component in ("obs", "var") or component.startswith("uns/")}
+    fingerprints = _hash_components(hashed)
+    for component, element in elements.items():
+        if component not in hashed:
+            fingerprints[component] = _ReadElement(element) if element is not None else None
+    return fingerprints
+
+
+def _file_signature(file_path: str):
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+# absolute file path -> (weak reference to the dataset, component
+# fingerprints, file signature) of the dataset last read from or saved
+# to that path. Incremental saves compare against this state.
+_saved_states = {}
+_saved_states_lock = threading.Lock()
+
+
+def _remember_saved_state(file_path: str,
+                          dataset,
+                          fingerprints: dict):
+    with _saved_states_lock:
+        _saved_states[os.path.abspath(file_path)] = (
+            weakref.ref(dataset), fingerprints, _file_signature(file_path)
+        )
+
+
+def may_save_in_place(dataset,
+                      file_path: str) -> bool:
+    """
+    Whether saving dataset to file_path might rewrite the h5ad file in
+    place, see _save_incremental. Unlike dirty_components, nothing is hashed.
+    """
+    if is_zarr_store(file_path):
+        return False
+    file_path = os.path.splitext(file_path)[0] + ".h5ad"
+    with _saved_states_lock:
+        saved_state = _saved_states.get(os.path.abspath(file_path))
+    return saved_state is not None and saved_state[0]() is dataset
+
+
+def dirty_components(dataset,
+                     file_path: str,
+                     fingerprints: dict = None):
+    """
+    Returns the components of dataset that changed since it was last read
+    from or saved to file_path. Returns None if the file holds a different
+    dataset or was changed by someone else, in which case a full save is needed.
+    """
+    with _saved_states_lock:
+        saved_state = _saved_states.get(os.path.abspath(file_path))
+    if saved_state is None:
+        return None
+    reference, saved_fingerprints, signature = saved_state
+    if reference() is not dataset:
+        return None
+    try:
+        if _file_signature(file_path) != signature or not os.path.isfile(_uns_path(file_path)):
+            return None
+    except OSError:
+        return None
+
+    elements = _components(dataset)
+    dirty = {component for component in saved_fingerprints if component not in elements}
+    read = {component for component, fingerprint in saved_fingerprints.items()
+            if isinstance(fingerprint, _ReadElement) and component in elements}
+    dirty |= {component for component in read if not saved_fingerprints[component].matches(elements[component])}
+    if fingerprints is None:
+        fingerprints = _hash_components({component: element for component, element in elements.items()
+                                         if component not in read})
+    dirty |= {
+        component for component in elements
+        if component not in read and fingerprints.get(component) != saved_fingerprints.get(component)
+    }
+    return dirty
+
+
+def _update_components(root,
+                       dataset,
+                       dirty: set,
+                       write_matrix):
+    """
+    Replaces the dirty components in an open h5ad file or zarr store.
+    write_matrix(group, key, matrix) writes X and the layers.
+    """
+    for component in sorted(dirty):
+        name, _, key = component.partition("/")
+        if name == "uns":
+            continue
+        if name in ("X", "obs", "var"):
+            if name in root:
+                del root[name]
+            element = getattr(dataset, name)
+            if name == "X" and element is not None:
+                write_matrix(root, "X", element)
+            elif name != "X":
+                _write_elem(root, name, element)
+            continue
+
+        group = root.require_group(name)
+        group.attrs["encoding-type"] = "dict"
+        group.attrs["encoding-version"] = "0.1.0"
+        if key in group:
+            del group[key]
+        mapping = getattr(dataset, name)
+        if key not in mapping:
+            # the entry was deleted from the dataset
+            continue
+        if name == "layers":
+            write_matrix(group, key, mapping[key])
+        else:
+            _write_elem(group, key, mapping[key])
+
+
+def _dirty_nbytes(dataset, dirty: set) -> int:
+    from ._datashack import _nbytes
+    seen = {}
+    total = 0
+    for component in dirty:
+        name, _, key = component.partition("/")
+        if name in ("X", "obs", "var"):
+            total += _nbytes(getattr(dataset, name), seen)
+        elif name in TRACKED_MAPPINGS:
+            total += _nbytes(getattr(dataset, name).get(key), seen)
+    return total
+
+
+def _file_digest(file_path: str) -> str:
+    digest = hashlib.blake2b(digest_size = 16)
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 ** 2), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _check_consistent(file_path: str,
+                      attrs):
+    """
+    Raises if saving the h5ad file or zarr store at file_path was interrupted.
+    Files written by FACSPy itself carry no uns digest and are not checked.
+    """
+    name = os.path.basename(file_path.rstrip("/\\"))
+    if INCOMPLETE_ATTRIBUTE in attrs:
+        raise ValueError(f"Saving {name} was interrupted, the file is incomplete.")
+    uns_digest = attrs.get(UNS_DIGEST_ATTRIBUTE)
+    if uns_digest is None:
+        return
+    uns_path = _uns_path(file_path)
+    if not os.path.isfile(uns_path) or _file_digest(uns_path) != uns_digest:
+        raise ValueError(f"Saving {name} was interrupted, its .uns file belongs to a different save.")
+
+
+def read_dataset(file_path: str,
+                 progress_callback = None,
+                 is_canceled = None):
+    """
+    Reads an h5ad file and its .uns file written by FACSPy and
+    reports the bytes read to progress_callback.
+    """
+    import h5py
+
+    uns_path = _uns_path(file_path)
+    total = os.path.getsize(file_path)
+    if os.path.isfile(uns_path):
+        total += os.path.getsize(uns_path)
+    progress = Progress(total, progress_callback, is_canceled)
+
+    with ProgressFile(file_path, "rb", progress) as file:
+        with h5py.File(file, "r") as h5_file:
+            _check_consistent(file_path, h5_file.attrs)
+            dataset = _read_elem(h5_file)
+
+    if os.path.isfile(uns_path):
+        with ProgressFile(uns_path, "rb", progress) as file:
+            dataset.uns = pickle.load(file)
+
+    _remember_saved_state(file_path, dataset, _read_fingerprints(dataset))
+    return dataset
+
+
+def _write_h5ad(h5_file, dataset):
+    """
+    Writes the elements of an AnnData object like anndata.write_h5ad.
+    uns is stored in the .uns pickle and written empty.
+    """
+    if dataset.X is not None:
+        _write_elem(h5_file, "X", dataset.X)
+    _write_elem(h5_file, "obs", dataset.obs)
+    _write_elem(h5_file, "var", dataset.var)
+    for key in ("obsm", "varm", "obsp", "varp", "layers"):
+        _write_elem(h5_file, key, dict(getattr(dataset, key)))
+    _write_elem(h5_file, "uns", {})
+    h5_file.attrs["encoding-type"] = "anndata"
+    h5_file.attrs["encoding-version"] = "0.1.0"
+
+
+def save_dataset(dataset,
+                 file_path: str,
+                 progress_callback = None,
+                 is_canceled = None):
+    """
+    Saves a dataset in the FACSPy format (h5ad file and .uns pickle).
+
+    Both files are written to temporary .part files first that replace
+    the targets once everything was written, so a canceled or failed
+    save never leaves a truncated file behind. The h5ad file stores the
+    digest of the .uns file, so that reading detects a pair of files from
+    different saves, see _check_consistent. If the dataset was read
+    from or saved to file_path before, only the components that changed
+    since then are rewritten, see _save_incremental.
+    Returns the bytes the save left unused in the file.
+    """
+    import h5py
+    from ._datashack import dataset_nbytes
+
+    file_path = os.path.splitext(file_path)[0] + ".h5ad"
+    fingerprints = component_fingerprints(dataset)
+    dirty = dirty_components(dataset, file_path, fingerprints)
+    if dirty is not None:
+        return _save_incremental(dataset, file_path, dirty, fingerprints, progress_callback, is_canceled)
+
+    targets = [file_path, _uns_path(file_path)]
+    partial_files = [target + PARTIAL_SUFFIX for target in targets]
+
+    # the file size is about the size of the arrays in memory
+    progress = Progress(dataset_nbytes(dataset), progress_callback, is_canceled)
+    try:
+        with ProgressFile(partial_files[1], "wb", progress) as file:
+            pickle.dump(dataset.uns, file)
+        with ProgressFile(partial_files[0], "wb+", progress) as file:
+            with h5py.File(file, "w") as h5_file:
+                _write_h5ad(h5_file, dataset)
+                h5_file.attrs[UNS_DIGEST_ATTRIBUTE] = _file_digest(partial_files[1])
+        for partial_file, target in zip(partial_files, targets):
+            os.replace(partial_file, target)
+    except BaseException:
+        for partial_file in partial_files:
+            if os.path.isfile(partial_file):
+                os.remove(partial_file)
+        raise
+
+    _remember_saved_state(file_path, dataset, fingerprints)
+    if progress_callback is not None:
+        progress_callback(progress.total, progress.total)
+    return 0
+
+
+def _link_or_copy(source: str,
+                  target: str):
+    """
+    Hard links the chunks of a zarr store into its copy. zarr writes chunks
+    to a new file that replaces the old one, so writing to the copy never
+    changes the original. The small metadata files are rewritten in place
+    and always copied.
+    """
+    if os.path.basename(source).startswith(".z") or os.path.basename(source) == "zarr.json":
+        return shutil.copy2(source, target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+    return target
+
+
+def _save_incremental(dataset,
+                      file_path: str,
+                      dirty: set,
+                      fingerprints: dict,
+                      progress_callback = None,
+                      is_canceled = None):
+    """
+    Rewrites only the dirty components of an h5ad file or zarr store.
+
+    h5ad files are updated in place, so only the dirty components are
+    written. The file is marked incomplete while it is updated and a cancel
+    only takes effect before the update starts. HDF5 does not reuse the
+    space of replaced components, repack_dataset reclaims it. Returns the
+    bytes that this save left unused in the file.
+
+    zarr stores are updated in a .part copy whose chunks are hard links
+    to the original, which replaces the original once complete.
+    """
+    uns_path = _uns_path(file_path)
+    partial_uns = uns_path + PARTIAL_SUFFIX
+    zarr_store = is_zarr_store(file_path)
+    partial_path = file_path + PARTIAL_SUFFIX if zarr_store else None
+    rewrite_uns = any(component.startswith("uns/") for component in dirty)
+
+    progress = Progress(_dirty_nbytes(dataset, dirty), progress_callback, is_canceled)
+    unused_bytes = 0
+    try:
+        # uns is stored as one pickle and rewritten as a whole
+        uns_digest = None
+        if rewrite_uns:
+            with ProgressFile(partial_uns, "wb", progress) as file:
+                pickle.dump(dataset.uns, file)
+            uns_digest = _file_digest(partial_uns)
+
+        if zarr_store:
+            import zarr
+            if os.path.isdir(partial_path):
+                shutil.rmtree(partial_path)
+            shutil.copytree(file_path, partial_path, copy_function = _link_or_copy)
+            root = zarr.open_group(partial_path, mode = "r+")
+            with ThreadPoolExecutor(max_workers = os.cpu_count()) as executor:
+                _update_components(
+                    root, dataset, dirty,
+                    lambda group, key, matrix: _write_zarr_matrix(group, key, matrix, progress, executor)
+                )
+            if uns_digest is not None:
+                root.attrs[UNS_DIGEST_ATTRIBUTE] = uns_digest
+            # directories cannot be replaced in one step
+            previous_store = file_path + ".old"
+            os.replace(file_path, previous_store)
+            os.replace(partial_path, file_path)
+            shutil.rmtree(previous_store)
+        else:
+            import h5py
+            if progress.is_canceled is not None and progress.is_canceled():
+                raise OperationCanceled()
+            # a half updated file cannot be rolled back, so it is not canceled
+            progress.is_canceled = None
+            with ProgressFile(file_path, "rb+", progress) as file:
+                with h5py.File(file, "r+") as h5_file:
+                    h5_file.attrs[INCOMPLETE_ATTRIBUTE] = True
+                    h5_file.flush()
+                    _update_components(h5_file, dataset, dirty,
+                                       lambda group, key, matrix: _write_elem(group, key, matrix))
+                    if uns_digest is not None:
+                        h5_file.attrs[UNS_DIGEST_ATTRIBUTE] = uns_digest
+                    unused_bytes = h5_file.id.get_freespace()
+                    del h5_file.attrs[INCOMPLETE_ATTRIBUTE]
+
+        if rewrite_uns:
+            os.replace(partial_uns, uns_path)
+    except BaseException:
+        if partial_path is not None and os.path.isdir(partial_path):
+            shutil.rmtree(partial_path)
+        if os.path.isfile(partial_uns):
+            os.remove(partial_uns)
+        raise
+
+    _remember_saved_state(file_path, dataset, fingerprints)
+    if progress_callback is not None:
+        progress_callback(progress.total, progress.total)
+    return unused_bytes
+
+
+def repack_dataset(file_path: str,
+                   progress_callback = None,
+                   is_canceled = None):
+    """
+    Rewrites an h5ad file without the space that incremental saves left
+    unused. h5py copies the stored chunks without decoding them into a
+    .part file that replaces the original once complete.
+    """
+    import h5py
+
+    partial_path = file_path + PARTIAL_SUFFIX
+    progress = Progress(os.path.getsize(file_path), progress_callback, is_canceled)
+    try:
+        with h5py.File(file_path, "r") as source:
+            if INCOMPLETE_ATTRIBUTE in source.attrs:
+                raise ValueError(f"{file_path} was not completely saved and cannot be repacked.")
+            with ProgressFile(partial_path, "wb+", progress) as file:
+                with h5py.File(file, "w") as target:
+                    target.attrs.update(source.attrs)
+                    for name in source.keys():
+                        source.copy(source[name], target, name = name)
+        with _saved_states_lock:
+            saved_state = _saved_states.get(os.path.abspath(file_path))
+        up_to_date = saved_state is not None and _file_signature(file_path) == saved_state[2]
+        os.replace(partial_path, file_path)
+    except BaseException:
+        if os.path.isfile(partial_path):
+            os.remove(partial_path)
+        raise
+
+    # the stored components did not change, so the next save stays incremental
+    dataset = saved_state[0]() if up_to_date else None
+    if dataset is not None:
+        _remember_saved_state(file_path, dataset, saved_state[1])
+    if progress_callback is not None:
+        progress_callback(progress.total, progress.total)
+
+
+def is_zarr_store(file_path: str) -> bool:
+    return file_path.rstrip("/\\").endswith(ZARR_SUFFIX) or os.path.isfile(os.path.join(file_path, ".zgroup"))
+
+
+def _zarr_compressor():
+    from numcodecs import Blosc
+    return Blosc(cname = "zstd", clevel = 5, shuffle = Blosc.BITSHUFFLE)
+
+
+def _write_zarr_matrix(group,
+                       key: str,
+                       matrix,
+                       progress: Progress,
+                       executor: ThreadPoolExecutor):
+    """
+    Writes a dense matrix channel by channel. Each channel is compressed
+    on its own thread, the chunks of different channels never overlap.
+    Sparse matrices are written by anndata.
+    """
+    from ._datashack import _is_sparse
+    if _is_sparse(matrix):
+        _write_elem(group, key, matrix)
+        progress.advance(sum(getattr(matrix, name).nbytes for name in ("data", "indices", "indptr")))
+        return
+
+    n_obs, n_channels = matrix.shape
+    array = group.create_dataset(key,
+                                 shape = matrix.shape,
+                                 dtype = matrix.dtype,
+                                 chunks = (max(min(ZARR_CHUNK_ROWS, n_obs), 1), 1),
+                                 compressor = _zarr_compressor())
+    array.attrs["encoding-type"] = "array"
+    array.attrs["encoding-version"] = "0.2.0"
+
+    def write_channel(channel):
+        array[:, channel] = np.asarray(matrix[:, channel])
+        return n_obs * matrix.dtype.itemsize
+
+    futures = [executor.submit(write_channel, channel) for channel in range(n_channels)]
+    try:
+        for future in as_completed(futures):
+            progress.advance(future.result())
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+
+def save_dataset_zarr(dataset,
+                      store_path: str,
+                      progress_callback = None,
+                      is_canceled = None,
+                      n_threads: int = None):
+    """
+    Saves a dataset as a zarr directory store and its uns as a .uns pickle
+    next to it. X and the layers are chunked by channel and compressed on
+    n_threads threads (default: one per CPU). The store is written to a
+    .part directory first that replaces an existing store once complete.
+    Re-saving a dataset to the store it came from only rewrites the
+    components that changed, like save_dataset.
+    """
+    import zarr
+    from ._datashack import dataset_nbytes
+
+    store_path = os.path.splitext(store_path.rstrip("/\\"))[0] + ZARR_SUFFIX
+    fingerprints = component_fingerprints(dataset)
+    dirty = dirty_components(dataset, store_path, fingerprints)
+    if dirty is not None:
+        return _save_incremental(dataset, store_path, dirty, fingerprints, progress_callback, is_canceled)
+    uns_path = _uns_path(store_path)
+    partial_store = store_path + PARTIAL_SUFFIX
+    partial_uns = uns_path + PARTIAL_SUFFIX
+
+    progress = Progress(dataset_nbytes(dataset), progress_callback, is_canceled)
+    try:
+        if os.path.isdir(partial_store):
+            shutil.rmtree(partial_store)
+        root = zarr.open_group(partial_store, mode = "w")
+        with ThreadPoolExecutor(max_workers = n_threads or os.cpu_count()) as executor:
+            if dataset.X is not None:
+                _write_zarr_matrix(root, "X", dataset.X, progress, executor)
+            layers = root.create_group("layers")
+            layers.attrs["encoding-type"] = "dict"
+            layers.attrs["encoding-version"] = "0.1.0"
+            for layer_name, layer in dataset.layers.items():
+                _write_zarr_matrix(layers, layer_name, layer, progress, executor)
+        _write_elem(root, "obs", dataset.obs)
+        _write_elem(root, "var", dataset.var)
+        for key in ("obsm", "varm", "obsp", "varp"):
+            _write_elem(root, key, dict(getattr(dataset, key)))
+        _write_elem(root, "uns", {})
+        root.attrs["encoding-type"] = "anndata"
+        root.attrs["encoding-version"] = "0.1.0"
+        with ProgressFile(partial_uns, "wb", progress) as file:
+            pickle.dump(dataset.uns, file)
+        root.attrs[UNS_DIGEST_ATTRIBUTE] = _file_digest(partial_uns)
+
+        # directories cannot be replaced in one step
+        previous_store = store_path + ".old"
+        if os.path.isdir(store_path):
+            os.replace(store_path, previous_store)
+        os.replace(partial_store, store_path)
+        os.replace(partial_uns, uns_path)
+        if os.path.isdir(previous_store):
+            shutil.rmtree(previous_store)
+    except BaseException:
+        if os.path.isdir(partial_store):
+            shutil.rmtree(partial_store)
+        if os.path.isfile(partial_uns):
+            os.remove(partial_uns)
+        raise
+
+    _remember_saved_state(store_path, dataset, fingerprints)
+    if progress_callback is not None:
+        progress_callback(progress.total, progress.total)
+    return 0
+
+
+def read_dataset_zarr(store_path: str,
+                      progress_callback = None,
+                      is_canceled = None,
+                      lazy: bool = False):
+    """
+    Opens a zarr store written by save_dataset_zarr into memory. With lazy,
+    X and the layers are dask arrays that stay on disk and are read chunk
+    by chunk when they are computed, so selecting one marker only reads
+    that marker. Everything else is read into memory.
+    """
+    import zarr
+    import anndata as ad
+
+    store_path = store_path.rstrip("/\\")
+    root = zarr.open_group(store_path, mode = "r")
+    _check_consistent(store_path, root.attrs)
+    matrices = [("X", root["X"])] if "X" in root else []
+    if "layers" in root:
+        matrices += [(f"layers/{name}", element) for name, element in root["layers"].items()]
+
+    da = None
+    if lazy:
+        try:
+            import dask.array as da
+        except ImportError:
+            raise ImportError("Opening a zarr store lazily requires dask, please install it.")
+
+    total = sum(element.nbytes for _, element in matrices if isinstance(element, zarr.Array))
+    progress = Progress(total, progress_callback, is_canceled)
+
+    def read_matrix(key, element):
+        if da is not None and isinstance(element, zarr.Array):
+            # the name marks the store the matrix is read from, see backing_files
+            return da.from_zarr(element, name = f"{ZARR_DASK_PREFIX}{os.path.abspath(store_path)}::{key}")
+        matrix = _read_elem(element)
+        progress.advance(getattr(element, "nbytes", 0))
+        return matrix
+
+    read = {key: read_matrix(key, element) for key, element in matrices}
+    X = read.pop("X", None)
+    layers = {key[len("layers/"):]: matrix for key, matrix in read.items()}
+    in_ram = {
+        key: _read_elem(root[key]) if key in root else {}
+        for key in ("obsm", "varm", "obsp", "varp")
+    }
+
+    uns = {}
+    uns_path = _uns_path(store_path)
+    if os.path.isfile(uns_path):
+        with ProgressFile(uns_path, "rb", progress) as file:
+            uns = pickle.load(file)
+
+    dataset = ad.AnnData(X = X,
+                         obs = _read_elem(root["obs"]),
+                         var = _read_elem(root["var"]),
+                         uns = uns,
+                         layers = layers,
+                         **in_ram)
+
+    _remember_saved_state(store_path, dataset, _read_fingerprints(dataset))
+    return dataset
+
+
+class DatasetIOWorker(QThread):
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+    progress = pyqtSignal(object, object)
+
+    def __init__(self,
+                 file_path: str,
+                 dataset = None,
+                 backed: bool = False,
+                 repack: bool = False):
+        """
+        Reads the dataset at file_path or, if a dataset is passed, saves it there.
+        Paths ending in .zarr are read and written as zarr stores. backed reads
+        an h5ad file with X and the layers memory mapped, see read_dataset_backed,
+        or a zarr store with X and the layers as dask arrays, see read_dataset_zarr.
+        repack rewrites the h5ad file at file_path, see repack_dataset.
+        """
+        super().__init__()
+        self.file_path = file_path
+        self.dataset = dataset
+        self.is_save = dataset is not None or repack
+        self.backed = backed
+        self.repack = repack
+        # matrices of a backed read that could not be memory mapped
+        self.in_memory = []
+        # bytes a save left unused in the file
+        self.unused_bytes = 0
+        self._is_running = True
+        self._mutex = QMutex()
+
+    def run(self):
+        try:
+            zarr_store = is_zarr_store(self.file_path)
+            if self.repack:
+                repack_dataset(self.file_path, self.progress.emit, self.is_canceled)
+            elif self.is_save:
+                save = save_dataset_zarr if zarr_store else save_dataset
+                self.unused_bytes = save(self.dataset, self.file_path, self.progress.emit, self.is_canceled)
+            elif zarr_store:
+                self.dataset = read_dataset_zarr(self.file_path, self.progress.emit, self.is_canceled,
+                                                 lazy = self.backed)
+            elif self.backed:
+                self.dataset, self.in_memory = read_dataset_backed(self.file_path)
+            else:
+                self.dataset = read_dataset(self.file_path, self.progress.emit, self.is_canceled)
+            self.finished.emit()
+        except OperationCanceled:
+            self.error.emit("Saving was canceled." if self.is_save else "Opening was canceled.")
+        except Exception as e:
+            # h5py wraps exceptions raised by file objects
+            if self.is_canceled():
+                self.error.emit("Saving was canceled." if self.is_save else "Opening was canceled.")
+            else:
+                self.error.emit(str(e))
+
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
+    def stop(self):
+        with QMutexLocker(self._mutex):
+            self._is_running = False
+
+    def can_terminate(self) -> bool:
+        """
+        Reads and saves to .part files leave no broken file behind when
+        the thread is terminated, saves that rewrite the file in place do.
+        """
+        return not self.is_save or self.repack or not may_save_in_place(self.dataset, self.file_path)
+
+
+def _memmap_dataset(file_path: str,
+                    h5_dataset):
+    """
+    Returns a read-only memory map of an hdf5 dataset or None if the dataset
+    is chunked or compressed and therefore not stored as one block in the file.
+    """
+    if h5_dataset.chunks is not None or h5_dataset.compression is not None:
+        return None
+    if h5_dataset.dtype.kind not in "biuf":
+        return None
+    offset = h5_dataset.id.get_offset()
+    if offset is None:
+        return None
+    return np.memmap(file_path,
+                     dtype = h5_dataset.dtype,
+                     mode = "r",
+                     offset = offset,
+                     shape = h5_dataset.shape)
+
+
+def _memmap_element(file_path: str,
+                    element):
+    """
+    Memory maps a dense array or the buffers of a sparse matrix.
+    Returns None if the element cannot be memory mapped.
+    """
+    import h5py
+    if isinstance(element, h5py.Dataset):
+        return _memmap_dataset(file_path, element)
+
+    encoding = element.attrs.get("encoding-type", "")
+    if isinstance(encoding, bytes):
+        encoding = encoding.decode()
+    if encoding not in SPARSE_ENCODINGS:
+        return None
+    buffers = [_memmap_dataset(file_path, element[name]) for name in ("data", "indices", "indptr")]
+    if any(buffer is None for buffer in buffers):
+        return None
+
+    from scipy import sparse
+    matrix_class = sparse.csr_matrix if encoding == "csr_matrix" else sparse.csc_matrix
+    return matrix_class(tuple(buffers), shape = tuple(element.attrs["shape"]))
+
+
+def read_dataset_backed(file_path: str):
+    """
+    Opens an h5ad file written by FACSPy with X and the layers memory mapped
+    from the file. Only the pages of the rows and channels a tool touches
+    are read from disk. obs, var, obsm, obsp and uns are read into memory.
+
+    Returns the dataset and the names of the matrices that are chunked or
+    compressed in the file and had to be read into memory instead.
+    """
+    import h5py
+    import anndata as ad
+
+    in_memory = []
+
+    def read_matrix(name, element):
+        matrix = _memmap_element(file_path, element)
+        if matrix is None:
+            in_memory.append(name)
+            matrix = _read_elem(element)
+        return matrix
+
+    with h5py.File(file_path, "r") as h5_file:
+        _check_consistent(file_path, h5_file.attrs)
+        X = read_matrix("X", h5_file["X"]) if "X" in h5_file else None
+        layers = {}
+        if "layers" in h5_file:
+            for layer_name, element in h5_file["layers"].items():
+                layers[layer_name] = read_matrix(layer_name, element)
+        in_ram = {
+            key: _read_elem(h5_file[key]) if key in h5_file else {}
+            for key in ("obsm", "varm", "obsp", "varp")
+        }
+        obs = _read_elem(h5_file["obs"])
+        var = _read_elem(h5_file["var"])
+
+    # FACSPy stores uns next to the h5ad file
+    uns = {}
+    uns_file = os.path.splitext(file_path)[0] + ".uns"
+    if os.path.isfile(uns_file):
+        with open(uns_file, "rb") as file:
+            uns = pickle.load(file)
+
+    dataset = ad.AnnData(X = X,
+                         obs = obs,
+                         var = var,
+                         uns = uns,
+                         layers = layers,
+                         **in_ram)
+
+    _remember_saved_state(file_path, dataset, _read_fingerprints(dataset))
+    return dataset, in_memory
+
+
+def backing_files(dataset) -> set:
+    """
+    Returns the absolute paths of the files and zarr stores that X or a layer
+    of the dataset is memory mapped or lazily read from.
+    """
+    file_paths = set()
+    matrices = [dataset.X] + list(dataset.layers.values())
+    for matrix in matrices:
+        name = getattr(matrix, "name", None)
+        if isinstance(name, str) and name.startswith(ZARR_DASK_PREFIX):
+            file_paths.add(name[len(ZARR_DASK_PREFIX):].rsplit("::", 1)[0])
+            continue
+        buffers = [getattr(matrix, name, None) for name in ("data", "indices", "indptr")]
+        for buffer in [matrix] + buffers:
+            while isinstance(buffer, np.ndarray) and not isinstance(buffer, np.memmap):
+                buffer = buffer.base
+            if isinstance(buffer, np.memmap) and buffer.filename is not None:
+                file_paths.add(os.path.abspath(buffer.filename))
+    return file_paths
@@ -0,0 +1,700 @@
+import os
+import copy
+import time
+import weakref
+import tempfile
+import threading
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from PyQt5.QtCore import pyqtSignal, QObject, QThread
+
+# datasets are spilled to disk once the loaded datasets exceed this size
+DEFAULT_MEMORY_BUDGET = 16 * 1024 ** 3
+
+
+class DatasetHandle:
+    """
+    Placeholder for a DATASHACK entry that has not been read from disk yet.
+    Only the file location and metadata that are available without opening
+    the h5ad file are stored. The dataset is read by a DatasetLoadWorker
+    once the entry is selected.
+    """
+
+    def __init__(self,
+                 input_dir: str,
+                 file_name: str):
+        self.input_dir = input_dir
+        self.file_name = file_name
+        self.file_path = os.path.join(input_dir, file_name)
+
+        if os.path.isfile(self.file_path):
+            stat = os.stat(self.file_path)
+            self.file_size = stat.st_size
+            self.modified = stat.st_mtime
+        else:
+            self.file_size = None
+            self.modified = None
+
+    def describe(self) -> str:
+        """
+        Returns the summary that is displayed while the dataset is not loaded.
+        """
+        if self.file_size is None:
+            return f"Dataset file {self.file_path} not found."
+        size_mb = self.file_size / 1024 ** 2
+        modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.modified))
+        return (
+            f"Dataset file {self.file_name} ({size_mb:.1f} MB, modified {modified})\n" +
+            "Loading dataset..."
+        )
+
+    def load(self):
+        """
+        Reads the full AnnData object from disk.
+        """
+        import FACSPy as fp
+        return fp.read_dataset(self.input_dir, self.file_name)
+
+
+class DatasetLoadWorker(QThread):
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, handle: DatasetHandle):
+        super().__init__()
+        self.handle = handle
+        self.dataset = None
+
+    def run(self):
+        try:
+            self.dataset = self.handle.load()
+            self.finished.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+
+    def stop(self):
+        # reading cannot be interrupted, queued loads are dropped by the scheduler
+        pass
+
+    def can_terminate(self) -> bool:
+        return True
+
+
+class SpilledDataset(DatasetHandle):
+    """
+    Registry entry of a dataset that was written to the temporary spill
+    directory to free memory. Like any DatasetHandle, it is read back by
+    a DatasetLoadWorker once the entry is selected.
+    """
+
+    def describe(self) -> str:
+        return "Dataset was moved to disk to free memory.\nLoading dataset..."
+
+    def remove(self):
+        """
+        Deletes the spill files of the dataset.
+        """
+        file_stem = os.path.splitext(self.file_path)[0]
+        for suffix in (".h5ad", ".uns"):
+            if os.path.isfile(file_stem + suffix):
+                os.remove(file_stem + suffix)
+
+
+def _root_array(array: np.ndarray) -> np.ndarray:
+    # views share the buffer of the array they were created from
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def _nbytes(obj,
+            seen: dict) -> int:
+    """
+    Returns the bytes held by arrays, sparse matrices and dataframes in obj.
+    Objects in seen are not counted again, so that views and datasets sharing
+    arrays are only counted once. seen maps id -> object, which keeps temporary
+    objects alive so that their ids are not reused during the walk.
+    """
+    if obj is None or id(obj) in seen:
+        return 0
+    if isinstance(obj, np.ndarray):
+        root = _root_array(obj)
+        if id(root) in seen:
+            return 0
+        seen[id(root)] = root
+        # memory mapped matrices of backed datasets stay on disk
+        if isinstance(root, np.memmap):
+            return 0
+        return root.nbytes
+    seen[id(obj)] = obj
+    # dask arrays of datasets opened from a zarr store stay on disk
+    if hasattr(obj, "compute") and hasattr(obj, "chunks"):
+        return 0
+    # scipy sparse matrices
+    if _is_sparse(obj):
+        return sum(_nbytes(getattr(obj, attribute), seen) for attribute in ("data", "indices", "indptr"))
+    # pandas dataframes and series
+    if hasattr(obj, "memory_usage") and hasattr(obj, "to_numpy"):
+        if hasattr(obj, "columns"):
+            return sum(_nbytes(obj[column], seen) for column in obj.columns)
+        codes = getattr(obj.array, "codes", None)
+        return _nbytes(codes if codes is not None else obj.to_numpy(), seen)
+    if isinstance(obj, dict) or hasattr(obj, "keys") and hasattr(obj, "values"):
+        return sum(_nbytes(value, seen) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(_nbytes(value, seen) for value in obj)
+    # FACSPy objects in .uns such as the metadata or the panel
+    if hasattr(obj, "__dict__"):
+        return sum(_nbytes(value, seen) for value in vars(obj).values())
+    return 0
+
+
+def dataset_nbytes(dataset,
+                   seen: dict = None) -> int:
+    """
+    Returns the bytes used by X, layers, obsm, obsp, obs and uns of an AnnData object.
+    """
+    seen = {} if seen is None else seen
+    return sum(
+        _nbytes(component, seen) for component in
+        (dataset.X, dataset.layers, dataset.obsm, dataset.obsp, dataset.obs, dataset.uns)
+    )
+
+
+class SpillWorker(QThread):
+    """
+    Writes a dataset to its spill file. The worker drops its reference
+    to the dataset once written, so that its job no longer counts as
+    a user of the dataset.
+    """
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, dataset, file_path: str):
+        super().__init__()
+        self.dataset = dataset
+        self.file_path = file_path
+        self._is_running = True
+
+    def run(self):
+        from ._dataset_io import save_dataset
+        try:
+            save_dataset(self.dataset, self.file_path, is_canceled = self.is_canceled)
+            self.dataset = None
+            self.finished.emit()
+        except Exception as e:
+            self.dataset = None
+            self.error.emit(str(e))
+
+    def is_canceled(self) -> bool:
+        return not self._is_running
+
+    def stop(self):
+        self._is_running = False
+
+    def can_terminate(self) -> bool:
+        # spill files are only used once they were written completely
+        return True
+
+
+def _is_sparse(array) -> bool:
+    return all(hasattr(array, attribute) for attribute in ("data", "indices", "indptr"))
+
+
+# id of a buffer shared by copy_on_write -> weak references to the read-only
+# arrays that share it. The arrays keep the buffer alive.
+_sharing = {}
+_sharing_lock = threading.Lock()
+
+
+def _share_array(array: np.ndarray) -> np.ndarray:
+    """
+    Makes array read-only and returns a read-only view of its buffer.
+    Both are registered as sharing the buffer, see _writable.
+    """
+    array.flags.writeable = False
+    view = array.view()
+    with _sharing_lock:
+        for buffer_id in [buffer_id for buffer_id, references in _sharing.items()
+                          if all(reference() is None for reference in references)]:
+            del _sharing[buffer_id]
+        _sharing.setdefault(id(_root_array(array)), []).extend([weakref.ref(array), weakref.ref(view)])
+    return view
+
+
+def _writable(array: np.ndarray) -> np.ndarray:
+    """
+    Returns array made writable again if no other array shares its buffer
+    any longer and a writable copy otherwise. Arrays that copy_on_write
+    did not share are returned unchanged.
+    """
+    if array.flags.writeable:
+        return array
+    with _sharing_lock:
+        references = _sharing.get(id(_root_array(array)), [])
+        if not any(reference() is array for reference in references):
+            return array
+        references[:] = [reference for reference in references
+                         if reference() is not None and reference() is not array]
+        if references:
+            return array.copy()
+    try:
+        array.flags.writeable = True
+        return array
+    except ValueError:
+        # a view of a buffer that was made read-only itself
+        return array.copy()
+
+
+def _share(array):
+    """
+    Returns an object that shares the buffers of array. Both array and the
+    returned object become read-only until materialize is called on
+    the dataset that holds them.
+    """
+    if isinstance(array, np.ndarray):
+        return _share_array(array)
+    if _is_sparse(array):
+        # the constructor does not copy the passed arrays
+        return type(array)(tuple(_share_array(getattr(array, attribute))
+                                 for attribute in ("data", "indices", "indptr")),
+                           shape = array.shape)
+    # e.g. dataframes in .obsm
+    return copy.deepcopy(array)
+
+
+def _materialized(array) -> tuple:
+    """
+    Returns array with writable buffers, see _writable, and whether
+    anything was copied or unlocked.
+    """
+    if isinstance(array, np.ndarray):
+        was_writeable = array.flags.writeable
+        writable = _writable(array)
+        return writable, writable is not array or writable.flags.writeable != was_writeable
+    if _is_sparse(array):
+        parts = [_materialized(getattr(array, attribute)) for attribute in ("data", "indices", "indptr")]
+        if not any(changed for _, changed in parts):
+            return array, False
+        # the constructor does not copy the passed arrays
+        return type(array)(tuple(part for part, _ in parts), shape = array.shape), True
+    return array, False
+
+
+def materialize(dataset) -> int:
+    """
+    Makes the components that dataset shares through copy_on_write writable.
+    Components the other dataset still holds are copied, the others only
+    made writable again. Returns the number of components that changed.
+    """
+    import anndata as ad
+
+    changed = 0
+    if dataset.X is not None:
+        X, X_changed = _materialized(dataset.X)
+        if X_changed:
+            dataset.X = X
+            changed += 1
+    for mapping in (dataset.layers, dataset.obsm, dataset.varm, dataset.obsp, dataset.varp):
+        for key in list(mapping.keys()):
+            value, value_changed = _materialized(mapping[key])
+            if value_changed:
+                mapping[key] = value
+                changed += 1
+    if dataset.raw is not None:
+        raw = dataset.raw
+        X, X_changed = _materialized(raw.X)
+        varm = {key: _materialized(value) for key, value in raw.varm.items()}
+        if X_changed or any(value_changed for _, value_changed in varm.values()):
+            dataset.raw = ad.AnnData(X = X,
+                                     obs = dataset.obs[[]],
+                                     var = raw.var,
+                                     varm = {key: value for key, (value, _) in varm.items()})
+            changed += 1
+    return changed
+
+
+def materialize_on_write(dataset, function, *args, **kwargs):
+    """
+    Calls function(dataset, *args, **kwargs). If it writes in place to a
+    component dataset shares with a copy_on_write copy, the shared
+    components are materialized and function is called once more.
+    """
+    try:
+        return function(dataset, *args, **kwargs)
+    except ValueError as e:
+        if "read-only" not in str(e) or not materialize(dataset):
+            raise
+    return function(dataset, *args, **kwargs)
+
+
+def copy_on_write(dataset):
+    """
+    Copies an AnnData object without duplicating X, layers, obsm, varm, obsp,
+    varp and raw. Both datasets hold read-only arrays of the same buffers.
+    FACSPy stores its results as new entries (adata.layers[key] = ...), which
+    only replaces the entry of the dataset that is written to. An in place
+    write on either side raises, materialize_on_write then copies the shared
+    components of the side that writes and repeats the write.
+    obs, var and uns are small and copied right away.
+    """
+    import anndata as ad
+
+    if dataset.is_view:
+        return dataset.copy()
+
+    def share_all(mapping):
+        return {key: _share(value) for key, value in mapping.items()}
+
+    raw = None
+    if dataset.raw is not None:
+        raw = ad.AnnData(X = _share(dataset.raw.X),
+                         obs = dataset.obs[[]].copy(),
+                         var = dataset.raw.var.copy(),
+                         varm = share_all(dataset.raw.varm))
+
+    return ad.AnnData(
+        X = _share(dataset.X) if dataset.X is not None else None,
+        obs = dataset.obs.copy(),
+        var = dataset.var.copy(),
+        uns = copy.deepcopy(dataset.uns),
+        obsm = share_all(dataset.obsm),
+        varm = share_all(dataset.varm),
+        layers = share_all(dataset.layers),
+        obsp = share_all(dataset.obsp),
+        varp = share_all(dataset.varp),
+        raw = raw
+    )
+
+
+class RegistrySignals(QObject):
+    # dataset key, error message
+    spill_failed = pyqtSignal(str, str)
+
+
+class DatasetRegistry(MutableMapping):
+    """
+    Dict-like store of the open datasets (DATASHACK). The bytes used by every
+    loaded dataset are tracked and once they exceed the memory budget, the least
+    recently used datasets are written to a temporary directory and dropped
+    from memory. Spilling runs as a job of the scheduler, if one is given.
+    Datasets that are in use and datasets that are read from disk on demand
+    are never spilled. A dataset is in use while a queued or running job of
+    the scheduler holds it or while something acquired it, see acquire.
+
+    A spilled dataset is stored as a SpilledDataset handle, which is
+    returned instead of the dataset until it was read back by
+    restore_handle. Nothing is read from disk on access.
+    """
+
+    def __init__(self,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 scheduler = None):
+        self.memory_budget = memory_budget
+        self.scheduler = scheduler
+        # dataset key -> (bytes that are freed once its spill is done, SpillWorker)
+        self._spilling = {}
+        self._entries = {}
+        self._last_used = {}
+        self._usage_counter = 0
+        self._spill_dir = None
+        self._spill_count = 0
+        self._versions = {}
+        self._version_counter = 0
+        self._saved_versions = {}
+        self._cache = {}
+        # id of an acquired dataset -> (weak reference to it, number of users)
+        self._users = {}
+        self._lock = threading.RLock()
+        self.signals = RegistrySignals()
+
+    def __getitem__(self, key):
+        with self._lock:
+            entry = self._entries[key]
+            self._touch(key)
+            return entry
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            previous = self._entries.get(key)
+            if isinstance(previous, SpilledDataset):
+                previous.remove()
+            self._entries[key] = value
+            self._touch(key)
+            self._bump_version(key)
+            self.enforce_memory_budget()
+
+    def __delitem__(self, key):
+        with self._lock:
+            entry = self._entries.pop(key)
+            self._last_used.pop(key, None)
+            self._versions.pop(key, None)
+            self._saved_versions.pop(key, None)
+            self._cache = {cache_key: value for cache_key, value in self._cache.items() if cache_key[0] != key}
+            if isinstance(entry, SpilledDataset):
+                entry.remove()
+
+    def rename(self, key, new_key):
+        """
+        Moves an entry to a new key and keeps its version and saved state.
+        """
+        with self._lock:
+            if new_key in self._entries:
+                raise KeyError(f"Dataset '{new_key}' already exists.")
+            self._entries[new_key] = self._entries.pop(key)
+            for mapping in (self._last_used, self._versions, self._saved_versions, self._spilling):
+                if key in mapping:
+                    mapping[new_key] = mapping.pop(key)
+            self._cache = {cache_key: value for cache_key, value in self._cache.items() if cache_key[0] != key}
+
+    def restore_handle(self, handle, dataset):
+        """
+        Replaces a handle by the dataset that was read from it. The handle
+        is looked up by identity as the entry might have been renamed while
+        it was read. A spilled dataset keeps its version and unsaved changes,
+        other handles are marked as saved. Returns the key or None if the
+        handle was removed.
+        """
+        with self._lock:
+            key = next((key for key, entry in self._entries.items() if entry is handle), None)
+            if key is None:
+                return None
+            self._entries[key] = dataset
+            self._touch(key)
+            if isinstance(handle, SpilledDataset):
+                handle.remove()
+            else:
+                self._bump_version(key)
+                self._saved_versions[key] = self.version(key)
+        self.enforce_memory_budget()
+        return key
+
+    def __iter__(self):
+        return iter(list(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _touch(self, key):
+        self._usage_counter += 1
+        self._last_used[key] = self._usage_counter
+
+    def _bump_version(self, key):
+        # a global counter, so that a key that is reused never gets an old version
+        self._version_counter += 1
+        self._versions[key] = self._version_counter
+
+    def version(self, key) -> int:
+        """
+        Returns the version of a dataset. It increases whenever the entry
+        is replaced or marked as modified.
+        """
+        return self._versions.get(key, 0)
+
+    def mark_modified(self, dataset):
+        """
+        Bumps the version of every entry that holds dataset. Has to be
+        called by every operation that changes a dataset in place.
+        """
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry is dataset:
+                    self._bump_version(key)
+
+    def mark_saved(self, key, version: int = None):
+        """
+        Records that the dataset was read from or saved to a file at the
+        given version (default: the current version).
+        """
+        with self._lock:
+            self._saved_versions[key] = self.version(key) if version is None else version
+
+    def is_modified(self, key) -> bool:
+        """
+        Returns True if a loaded or spilled dataset has changes that are not
+        saved to a file.
+        """
+        return ((self.is_loaded(key) or self.is_spilled(key)) and
+                self._saved_versions.get(key) != self.version(key))
+
+    def cached(self, key, name, compute):
+        """
+        Returns compute(dataset) for the dataset stored under key. The
+        result is cached until the version of the dataset changes.
+        """
+        with self._lock:
+            version = self.version(key)
+            cached = self._cache.get((key, name))
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        value = compute(self[key])
+        with self._lock:
+            self._cache[(key, name)] = (version, value)
+        return value
+
+    def peek(self, key):
+        """
+        Returns the stored entry without reading spilled datasets or
+        changing the usage order.
+        """
+        return self._entries.get(key)
+
+    def is_loaded(self, key) -> bool:
+        return key in self._entries and not isinstance(self._entries[key], DatasetHandle)
+
+    def is_spilled(self, key) -> bool:
+        return isinstance(self._entries.get(key), SpilledDataset)
+
+    def nbytes(self, key) -> int:
+        """
+        Returns the bytes of a loaded dataset, 0 for unloaded entries.
+        """
+        if not self.is_loaded(key):
+            return 0
+        return dataset_nbytes(self._entries[key])
+
+    def memory_usage(self) -> int:
+        """
+        Returns the bytes used by all loaded datasets. Arrays shared
+        between datasets are counted once.
+        """
+        seen = {}
+        with self._lock:
+            loaded = [entry for key, entry in self._entries.items() if self.is_loaded(key)]
+        return sum(dataset_nbytes(dataset, seen) for dataset in loaded)
+
+    def enforce_memory_budget(self):
+        """
+        Spills the least recently used datasets until the loaded datasets
+        fit into the memory budget. The most recently used dataset is kept.
+        Datasets whose spill is still running count as freed.
+        """
+        with self._lock:
+            if self.memory_budget is None:
+                return
+            excess = self.memory_usage() - sum(nbytes for nbytes, _ in self._spilling.values()) - self.memory_budget
+            if excess <= 0:
+                return
+            candidates = sorted(
+                (key for key in self._entries if self.is_loaded(key) and key not in self._spilling),
+                key = lambda key: self._last_used.get(key, 0)
+            )[:-1]
+            for key in candidates:
+                nbytes = self.nbytes(key)
+                if self.spill(key):
+                    excess -= nbytes
+                    if excess <= 0:
+                        return
+
+    def acquire(self, dataset):
+        """
+        Marks dataset as used outside of a scheduler job, e.g. by a window
+        that keeps it between two jobs. It is not spilled until release.
+        """
+        with self._lock:
+            entry = self._users.get(id(dataset))
+            count = entry[1] if entry is not None and entry[0]() is dataset else 0
+            self._users[id(dataset)] = (weakref.ref(dataset), count + 1)
+
+    def release(self, dataset):
+        with self._lock:
+            entry = self._users.get(id(dataset))
+            if entry is None or entry[0]() is not dataset:
+                return
+            if entry[1] > 1:
+                self._users[id(dataset)] = (entry[0], entry[1] - 1)
+            else:
+                del self._users[id(dataset)]
+        self.enforce_memory_budget()
+
+    def in_use(self, dataset) -> bool:
+        entry = self._users.get(id(dataset))
+        if entry is not None and entry[0]() is dataset:
+            return True
+        return self.scheduler is not None and self.scheduler.uses(dataset)
+
+    def _get_spill_dir(self) -> str:
+        if self._spill_dir is None:
+            # removed automatically when the application exits
+            self._spill_dir = tempfile.TemporaryDirectory(prefix = "facspyui_spill_")
+        return self._spill_dir.name
+
+    def can_spill(self, key) -> bool:
+        """
+        Datasets that are read from disk on demand free no memory when
+        spilled and would be read completely. Datasets that are in use
+        would stay in memory anyway.
+        """
+        from ._dataset_io import backing_files
+        if not self.is_loaded(key) or key in self._spilling:
+            return False
+        dataset = self._entries[key]
+        return not backing_files(dataset) and not self.in_use(dataset)
+
+    def spill(self, key) -> bool:
+        """
+        Writes a dataset to the spill directory and drops it from memory,
+        as a job of the scheduler if there is one. Returns True if the
+        dataset was spilled or its spill was started.
+        """
+        with self._lock:
+            if not self.can_spill(key):
+                return False
+            self._spill_count += 1
+            spilled = SpilledDataset(self._get_spill_dir(), f"dataset_{self._spill_count}.h5ad")
+            dataset = self._entries[key]
+            reference = weakref.ref(dataset)
+            version = self.version(key)
+
+            if self.scheduler is None:
+                from ._dataset_io import save_dataset
+                try:
+                    save_dataset(dataset, spilled.file_path)
+                except Exception as e:
+                    self.signals.spill_failed.emit(key, str(e))
+                    spilled.remove()
+                    return False
+                del dataset
+                return self._finish_spill(key, reference, version, spilled)
+
+            from ._jobs import PRIORITY_LOW
+            worker = SpillWorker(dataset, spilled.file_path)
+            self._spilling[key] = (self.nbytes(key), worker)
+            del dataset
+            worker.finished.connect(lambda: self._on_spill_done(worker, reference, version, spilled))
+            worker.error.connect(lambda error_message: self._on_spill_done(worker, reference, version, spilled,
+                                                                           error_message))
+            # only waits for the jobs that write to the dataset
+            self.scheduler.submit(worker, "Freeing memory", key, priority = PRIORITY_LOW, writes = False)
+            return True
+
+    def _on_spill_done(self, worker, reference, version, spilled, error_message: str = None):
+        with self._lock:
+            # the dataset might have been renamed while it was written
+            key = next((key for key, (_, spilling) in self._spilling.items() if spilling is worker), None)
+            self._spilling.pop(key, None)
+            if error_message is not None or key is None:
+                spilled.remove()
+                if error_message is not None and not worker.is_canceled():
+                    self.signals.spill_failed.emit(key or "", error_message)
+                return
+            self._finish_spill(key, reference, version, spilled)
+
+    def _finish_spill(self, key, reference, version, spilled) -> bool:
+        """
+        Replaces the written dataset by its handle, unless it was replaced,
+        changed or taken into use while it was written.
+        """
+        with self._lock:
+            dataset = reference()
+            if (dataset is None or self._entries.get(key) is not dataset or
+                    self.version(key) != version or self.in_use(dataset)):
+                spilled.remove()
+                return False
+            self._entries[key] = spilled
+            return True
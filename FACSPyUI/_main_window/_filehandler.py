@@ -1,48 +1,169 @@
 import os
-from PyQt5.QtWidgets import (QFileDialog, QMessageBox)
-import FACSPy as fp
-from ._create_dataset import CreateDatasetWindow
+from PyQt5.QtWidgets import (QFileDialog, QMessageBox, QProgressDialog)
+from PyQt5.QtCore import Qt
+from ._datashack import DatasetHandle
+
+# a save suggests a repack once it left this fraction of the file unused
+REPACK_HINT_FRACTION = 0.25
 
 class FileHandler:
     def set_main_window(self, main_window):
         self.main_window = main_window
+        # reads and writes that are still running, keeps the workers alive
+        self.io_workers = []
 
     def create_new_dataset(self):
+        from ._create_dataset import CreateDatasetWindow
         self.dataset_window = CreateDatasetWindow(self.main_window)
         self.dataset_window.show()
 
     def open_file(self):
         file_name, _ = QFileDialog.getOpenFileName(self.main_window, "Open File", "", "H5AD Files (*.h5ad)")
         if file_name:
-            try:
-                dataset = fp.read_dataset(file_name = file_name)
-                dataset_key = os.path.splitext(os.path.basename(file_name))[0]
-                if dataset_key in self.main_window.DATASHACK:
-                    dataset_key += "-1"
-                self.main_window.DATASHACK[dataset_key] = dataset
-                self.main_window.load_dataset(dataset_key, dataset)
-                QMessageBox.information(self.main_window, "Success", f"Dataset '{dataset_key}' opened successfully.")
-            except Exception as e:
-                QMessageBox.critical(self.main_window, "Error", f"Failed to open file: {str(e)}")
+            from ._dataset_io import DatasetIOWorker
+            worker = DatasetIOWorker(file_name)
+            worker.finished.connect(lambda: self.on_file_opened(worker))
+            self.run_io_worker(worker, f"Opening {os.path.basename(file_name)}...")
+
+    def open_zarr_store(self, lazy = False):
+        """
+        Opens a dataset saved as a zarr directory store. lazy keeps X and
+        the layers on disk as dask arrays, which tools and plots read chunk
+        by chunk.
+        """
+        store_path = QFileDialog.getExistingDirectory(self.main_window, "Open Zarr Store", "")
+        if store_path:
+            from ._dataset_io import DatasetIOWorker, is_zarr_store
+            if not is_zarr_store(store_path):
+                QMessageBox.critical(self.main_window, "Error", f"{store_path} is not a zarr store.")
+                return
+            worker = DatasetIOWorker(store_path, backed = lazy)
+            worker.finished.connect(lambda: self.on_file_opened(worker))
+            self.run_io_worker(worker, f"Opening {os.path.basename(store_path)}...")
+
+    def on_file_opened(self, worker):
+        dataset_key = os.path.splitext(os.path.basename(worker.file_path.rstrip("/\\")))[0]
+        if dataset_key in self.main_window.DATASHACK:
+            dataset_key += "-1"
+        self.main_window.load_dataset(dataset_key, worker.dataset)
+        self.main_window.DATASHACK.mark_saved(dataset_key)
+        QMessageBox.information(self.main_window, "Success", f"Dataset '{dataset_key}' opened successfully.")
+
+    def run_io_worker(self, worker, label, progress_text = None, dataset_key = None):
+        """
+        Runs a read or write in the background and shows its progress
+        in a non-modal dialog that can cancel it. progress_text formats
+        the (processed, total) progress, the default shows bytes.
+        dataset_key is the dataset that is read, if any.
+        """
+        if progress_text is None:
+            progress_text = lambda processed, total: f"{processed / 1024 ** 3:.2f} of {total / 1024 ** 3:.2f} GB"
+
+        progress_dialog = QProgressDialog(label, "Cancel", 0, 1000, self.main_window)
+        progress_dialog.setWindowTitle("Loading")
+        progress_dialog.setWindowModality(Qt.NonModal)
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.setAutoClose(False)
+        progress_dialog.setAutoReset(False)
+        progress_dialog.canceled.connect(worker.stop)
+
+        def update_progress(processed, total):
+            progress_dialog.setValue(int(1000 * processed / total))
+            progress_dialog.setLabelText(f"{label}\n{progress_text(processed, total)}")
+
+        def on_error(error_message):
+            if not worker.is_canceled():
+                QMessageBox.critical(self.main_window, "Error", error_message)
+
+        def cleanup():
+            progress_dialog.canceled.disconnect(worker.stop)
+            progress_dialog.close()
+            self.io_workers.remove(worker)
+
+        worker.progress.connect(update_progress)
+        worker.error.connect(on_error)
+        worker.finished.connect(cleanup)
+        worker.error.connect(cleanup)
+        self.io_workers.append(worker)
+        progress_dialog.show()
+        self.main_window.jobs.submit(worker, label, dataset_key, writes = False)
+
+    def open_file_backed(self):
+        """
+        Opens an h5ad file with X and the layers memory mapped from disk.
+        """
+        file_name, _ = QFileDialog.getOpenFileName(self.main_window, "Open File (backed)", "", "H5AD Files (*.h5ad)")
+        if file_name:
+            from ._dataset_io import DatasetIOWorker
+            worker = DatasetIOWorker(file_name, backed = True)
+            worker.finished.connect(lambda: self.on_file_opened_backed(worker))
+            self.run_io_worker(worker, f"Opening {os.path.basename(file_name)} (backed)...")
+
+    def on_file_opened_backed(self, worker):
+        dataset_key = os.path.splitext(os.path.basename(worker.file_path))[0]
+        if dataset_key in self.main_window.DATASHACK:
+            dataset_key += "-1"
+        self.main_window.load_dataset(dataset_key, worker.dataset)
+        self.main_window.DATASHACK.mark_saved(dataset_key)
+        message = f"Dataset '{dataset_key}' opened. X and layers are read from disk on demand."
+        if worker.in_memory:
+            message += f"\n{', '.join(worker.in_memory)} are compressed or chunked in the file and were loaded into memory."
+        QMessageBox.information(self.main_window, "Success", message)
 
     def save_file(self):
         dataset_key = self.main_window.dataset_dropdown.currentText()
         if dataset_key not in self.main_window.DATASHACK:
             QMessageBox.warning(self.main_window, "Warning", "No dataset selected to save.")
             return
+        if isinstance(self.main_window.DATASHACK[dataset_key], DatasetHandle):
+            QMessageBox.warning(self.main_window, "Warning", f"Dataset '{dataset_key}' is still loading.")
+            return
 
         # Open a dialog to select a file path for saving the file
-        file_path, _ = QFileDialog.getSaveFileName(self.main_window, "Save File", f"{dataset_key}.h5ad", "H5AD Files (*.h5ad)")
+        file_path, selected_filter = QFileDialog.getSaveFileName(self.main_window, "Save File", f"{dataset_key}.h5ad",
+                                                                 "H5AD Files (*.h5ad);;Zarr Stores (*.zarr)")
         if file_path:
-            output_directory = os.path.dirname(file_path)
-            file_name = os.path.basename(file_path)
-
             dataset = self.main_window.DATASHACK[dataset_key]
 
-            try:
-                # the OS handles the case of an existing filename
-                fp.save_dataset(dataset, output_directory, file_name, overwrite = True)
-                QMessageBox.information(self.main_window, "Success", f"Dataset saved successfully at {file_path}.")
+            from ._dataset_io import backing_files, dirty_components, DatasetIOWorker, ZARR_SUFFIX
+            if selected_filter.startswith("Zarr"):
+                file_path = os.path.splitext(file_path)[0] + ZARR_SUFFIX
+            if os.path.abspath(file_path) in backing_files(dataset):
+                # X and the layers are read from this file and must not be rewritten
+                dirty = dirty_components(dataset, file_path)
+                if dirty is None or any(component == "X" or component.startswith("layers/") for component in dirty):
+                    QMessageBox.critical(self.main_window, "Error",
+                                         "The dataset was opened backed from this file and cannot overwrite it. " +
+                                         "Please choose a different file name.")
+                    return
+
+            # new files are written to a temporary file first and replace an
+            # existing file only once complete. Re-saving to the file the dataset
+            # came from only rewrites the components that changed.
+            worker = DatasetIOWorker(file_path, dataset)
+            worker.finished.connect(lambda: self.on_file_saved(dataset_key, dataset, version, worker))
+            version = self.main_window.DATASHACK.version(dataset_key)
+            self.run_io_worker(worker, f"Saving {os.path.basename(file_path)}...", dataset_key = dataset_key)
 
-            except Exception as e:
-                QMessageBox.critical(self.main_window, "Error", f"Failed to save file: {str(e)}")
+    def on_file_saved(self, dataset_key, dataset, version, worker):
+        # the dataset might have been renamed or removed while it was saved
+        if self.main_window.DATASHACK.peek(dataset_key) is dataset:
+            self.main_window.DATASHACK.mark_saved(dataset_key, version)
+        message = f"Dataset saved successfully at {worker.file_path}."
+        h5ad_path = os.path.splitext(worker.file_path)[0] + ".h5ad"
+        if worker.unused_bytes and worker.unused_bytes > REPACK_HINT_FRACTION * os.path.getsize(h5ad_path):
+            message += (f"\n{worker.unused_bytes / 1024 ** 3:.2f} GB of the file are no longer used. " +
+                        "File > Repack... reclaims them.")
+        QMessageBox.information(self.main_window, "Success", message)
+
+    def repack_file(self):
+        """
+        Rewrites an h5ad file without the space that re-saving left unused.
+        """
+        file_name, _ = QFileDialog.getOpenFileName(self.main_window, "Repack File", "", "H5AD Files (*.h5ad)")
+        if file_name:
+            from ._dataset_io import DatasetIOWorker
+            worker = DatasetIOWorker(file_name, repack = True)
+            worker.finished.connect(lambda: QMessageBox.information(self.main_window, "Success",
+                                                                    f"{os.path.basename(file_name)} was repacked."))
+            self.run_io_worker(worker, f"Repacking {os.path.basename(file_name)}...")
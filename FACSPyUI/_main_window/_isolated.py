@@ -0,0 +1,358 @@
+import re
+import io
+import sys
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ._dataset_io import OperationCanceled, backing_files
+from ._datashack import materialize_on_write
+
+# seconds between two looks at the cancel flag while a tool runs
+POLL_INTERVAL = 0.1
+
+# seconds a canceled process gets to exit before it is killed
+TERMINATE_TIMEOUT = 1
+
+# seconds between two progress reports of the child process
+PROGRESS_INTERVAL = 0.25
+
+# tqdm bars, e.g. "Epochs completed:  45%|####5     | 90/200 [00:03<00:04, ...]"
+TQDM_PATTERN = re.compile(r"(?:(?P<stage>[^|\r\n]*?):\s*)?\d+%\|[^|]*\|\s*(?P<done>\d+)/(?P<total>\d+)")
+# umap-learn without tqdm, e.g. "completed  90  /  200 epochs"
+UMAP_PATTERN = re.compile(r"completed\s+(?P<done>\d+)\s*/\s*(?P<total>\d+)\s+epochs")
+# scikit-learn, e.g. "[t-SNE] Iteration 50: error = 61.6, gradient norm = 0.01"
+TSNE_PATTERN = re.compile(r"\[t-SNE\] Iteration (?P<done>\d+)")
+
+# tools that read the neighbors graph of their gate and layer
+GRAPH_TOOLS = ("umap", "leiden", "diffmap")
+
+# whether run_tool runs the tools in a child process, see Edit menu
+_isolation_enabled = True
+
+
+def isolation_enabled() -> bool:
+    return _isolation_enabled
+
+
+def set_isolation_enabled(enabled: bool):
+    global _isolation_enabled
+    _isolation_enabled = enabled
+
+
+def _share_array(array, blocks: list) -> tuple:
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create = True, size = max(array.nbytes, 1))
+    blocks.append(block)
+    np.ndarray(array.shape, dtype = array.dtype, buffer = block.buf)[...] = array
+    return ("array", block.name, array.shape, array.dtype.str)
+
+
+def _share(value, blocks: list) -> tuple:
+    """
+    Copies arrays and sparse matrices into shared memory blocks and
+    returns what the child process needs to map them. Anything else is
+    pickled, e.g. DataFrames in obsm.
+    """
+    from scipy import sparse
+    if sparse.issparse(value):
+        matrix = value if value.format in ("csr", "csc") else value.tocsr()
+        return ("sparse", matrix.format, matrix.shape,
+                _share_array(matrix.data, blocks),
+                _share_array(matrix.indices, blocks),
+                _share_array(matrix.indptr, blocks))
+    if isinstance(value, np.ndarray) or (hasattr(value, "__array__") and not hasattr(value, "columns")):
+        return _share_array(np.asarray(value), blocks)
+    return ("object", value)
+
+
+def _attach_block(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name = name, track = False)
+    except TypeError:
+        # before Python 3.13 attaching registers the block with the resource
+        # tracker, which would unlink it when the child process exits
+        from multiprocessing import resource_tracker
+        block = shared_memory.SharedMemory(name = name)
+        resource_tracker.unregister(block._name, "shared_memory")
+        return block
+
+
+def _attach(descriptor: tuple, blocks: list):
+    from scipy import sparse
+    kind = descriptor[0]
+    if kind == "object":
+        return descriptor[1]
+    if kind == "sparse":
+        _, matrix_format, shape, data, indices, indptr = descriptor
+        matrix_class = sparse.csr_matrix if matrix_format == "csr" else sparse.csc_matrix
+        return matrix_class((_attach(data, blocks), _attach(indices, blocks), _attach(indptr, blocks)),
+                            shape = shape, copy = False)
+    _, name, shape, dtype = descriptor
+    block = _attach_block(name)
+    blocks.append(block)
+    return np.ndarray(shape, dtype = np.dtype(dtype), buffer = block.buf)
+
+
+def _needed_components(dataset,
+                       tool: str,
+                       kwargs: dict) -> dict:
+    """
+    Returns the keys of the layers, obsm and obsp a tool reads. FACSPy
+    names its results after the gate and layer, e.g. X_pca_<gate>_<layer>,
+    so the embeddings and graphs of other layers are left out. Without a
+    layer argument every layer is needed.
+    """
+    layer = kwargs.get("layer")
+    if layer is None:
+        return {"layers": list(dataset.layers.keys()),
+                "obsm": list(dataset.obsm.keys()),
+                "obsp": list(dataset.obsp.keys())}
+    of_layer = lambda key: f"_{layer}" in key
+    representations = {"gating", kwargs.get("basis"), kwargs.get("use_rep")}
+    return {
+        "layers": [key for key in dataset.layers.keys() if key == layer],
+        "obsm": [key for key in dataset.obsm.keys() if key in representations or of_layer(key)],
+        "obsp": [key for key in dataset.obsp.keys() if tool in GRAPH_TOOLS and of_layer(key)]
+    }
+
+
+def _changed_columns(before, after) -> dict:
+    return {
+        column: after[column] for column in after.columns
+        if column not in before.columns or not after[column].equals(before[column])
+    }
+
+
+def _changes(dataset, before: dict) -> dict:
+    """
+    Collects what a tool added or replaced. Arrays are compared by
+    identity, as the tools assign new arrays instead of writing into the
+    shared ones. uns is small and sent back as a whole, since tools also
+    update nested dictionaries in place.
+    """
+    changes = {"obs": _changed_columns(before["obs"], dataset.obs),
+               "var": _changed_columns(before["var"], dataset.var),
+               "uns": dict(dataset.uns)}
+    for attribute in ("layers", "obsm", "obsp", "varm"):
+        old = before[attribute]
+        new = getattr(dataset, attribute)
+        changes[attribute] = {key: new[key] for key in new.keys() if old.get(key) is not new[key]}
+        changes[f"{attribute}_removed"] = [key for key in old if key not in new.keys()]
+    changes["obs_removed"] = [column for column in before["obs"].columns if column not in dataset.obs.columns]
+    return changes
+
+
+class _ProgressStream(io.TextIOBase):
+    """
+    Replaces stdout and stderr of the child process. The output is passed
+    on and the lines that report progress are sent to the parent process.
+    tqdm redraws its bar with carriage returns, so they end a line as well.
+    """
+
+    def __init__(self, connection, stream, tool: str, kwargs: dict):
+        super().__init__()
+        self.connection = connection
+        self.stream = stream
+        self.tool = tool
+        self.tsne_iterations = kwargs.get("max_iter", kwargs.get("n_iter", 1000))
+        self._buffer = ""
+        self._last_report = 0
+
+    def write(self, text):
+        if self.stream is not None:
+            self.stream.write(text)
+        self._buffer += text
+        *lines, self._buffer = re.split(r"[\r\n]", self._buffer)
+        for line in lines:
+            self._parse(line)
+        return len(text)
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+
+    def _parse(self, line: str):
+        match = TQDM_PATTERN.search(line)
+        if match is not None:
+            stage = (match.group("stage") or "").strip() or self.tool
+            self.report(int(match.group("done")) / max(int(match.group("total")), 1), stage)
+            return
+        match = UMAP_PATTERN.search(line)
+        if match is not None:
+            self.report(int(match.group("done")) / max(int(match.group("total")), 1), "UMAP epochs")
+            return
+        match = TSNE_PATTERN.search(line)
+        if match is not None:
+            self.report(int(match.group("done")) / self.tsne_iterations, "t-SNE iterations")
+
+    def report(self, fraction, stage: str):
+        now = time.time()
+        if fraction is not None and fraction < 1 and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        self.connection.send(("progress", fraction, stage))
+
+
+def _enable_progress_output():
+    """
+    umap-learn only reports its epochs if scanpy asks for verbose output.
+    """
+    try:
+        import scanpy as sc
+        sc.settings.verbosity = 4
+        # binds the log handler to the replaced stderr
+        sc.settings.logfile = sys.stderr
+    except Exception:
+        pass
+
+
+def _run_tool(connection, tool: str, payload: dict, kwargs: dict):
+    """
+    Runs in the child process. Builds the dataset on the shared memory
+    blocks, runs the tool and sends back the changed components.
+    """
+    blocks = []
+    stdout, stderr = sys.stdout, sys.stderr
+    progress = _ProgressStream(connection, stderr, tool, kwargs)
+    sys.stdout = _ProgressStream(connection, stdout, tool, kwargs)
+    sys.stderr = progress
+    try:
+        import anndata as ad
+        import FACSPy as fp
+
+        progress.report(None, f"Preparing {tool}")
+        dataset = ad.AnnData(
+            X = _attach(payload["X"], blocks) if payload["X"] is not None else None,
+            obs = payload["obs"],
+            var = payload["var"],
+            uns = payload["uns"],
+            layers = {key: _attach(value, blocks) for key, value in payload["layers"].items()},
+            obsm = {key: _attach(value, blocks) for key, value in payload["obsm"].items()},
+            obsp = {key: _attach(value, blocks) for key, value in payload["obsp"].items()},
+            varm = payload["varm"]
+        )
+        before = {"obs": dataset.obs.copy(), "var": dataset.var.copy()}
+        for attribute in ("layers", "obsm", "obsp", "varm"):
+            mapping = getattr(dataset, attribute)
+            before[attribute] = {key: mapping[key] for key in mapping.keys()}
+
+        _enable_progress_output()
+        progress.report(None, f"Running {tool}")
+        getattr(fp.tl, tool)(dataset, **kwargs)
+        connection.send(("done", _changes(dataset, before)))
+    except BaseException as e:
+        connection.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+        connection.close()
+
+
+def _apply_changes(dataset, changes: dict):
+    for attribute in ("layers", "obsm", "obsp", "varm"):
+        mapping = getattr(dataset, attribute)
+        for key in changes[f"{attribute}_removed"]:
+            del mapping[key]
+        for key, value in changes[attribute].items():
+            mapping[key] = value
+    for column in changes["obs_removed"]:
+        del dataset.obs[column]
+    for column, values in changes["obs"].items():
+        dataset.obs[column] = values
+    for column, values in changes["var"].items():
+        dataset.var[column] = values
+    for key in [key for key in dataset.uns if key not in changes["uns"]]:
+        del dataset.uns[key]
+    dataset.uns.update(changes["uns"])
+
+
+def run_isolated(dataset,
+                 tool: str,
+                 is_canceled = None,
+                 progress_callback = None,
+                 **kwargs):
+    """
+    Runs fp.tl.<tool> in a child process. The layer, embeddings and graph
+    the tool reads are handed over in shared memory, the child only sends
+    back what the tool changed. Canceling terminates the process right away.
+    progress_callback receives (fraction or None, stage).
+    """
+    if progress_callback is None:
+        progress_callback = lambda fraction, stage: None
+    blocks = []
+    process = None
+    try:
+        progress_callback(None, "Copying data to the tool process")
+        needed = _needed_components(dataset, tool, kwargs)
+        payload = {
+            # the tools read their layer, not X
+            "X": None,
+            "obs": dataset.obs,
+            "var": dataset.var,
+            "uns": dict(dataset.uns),
+            "layers": {key: _share(dataset.layers[key], blocks) for key in needed["layers"]},
+            "obsm": {key: _share(dataset.obsm[key], blocks) for key in needed["obsm"]},
+            "obsp": {key: _share(dataset.obsp[key], blocks) for key in needed["obsp"]},
+            "varm": {key: dataset.varm[key] for key in dataset.varm.keys()}
+        }
+
+        # forking a process that runs Qt is not safe
+        context = multiprocessing.get_context("spawn")
+        receiver, sender = context.Pipe(duplex = False)
+        process = context.Process(target = _run_tool,
+                                  args = (sender, tool, payload, kwargs),
+                                  daemon = True)
+        process.start()
+        sender.close()
+
+        while True:
+            if receiver.poll(POLL_INTERVAL):
+                message = receiver.recv()
+                if message[0] != "progress":
+                    break
+                progress_callback(message[1], message[2])
+                continue
+            if is_canceled is not None and is_canceled():
+                raise OperationCanceled(f"{tool} was canceled.")
+            if not process.is_alive() and not receiver.poll():
+                raise RuntimeError(f"{tool} stopped unexpectedly (exit code {process.exitcode}).")
+        status, result = message
+        if status == "error":
+            raise RuntimeError(result)
+        progress_callback(None, "Storing the results")
+        _apply_changes(dataset, result)
+    finally:
+        if process is not None:
+            if process.is_alive():
+                process.terminate()
+                process.join(TERMINATE_TIMEOUT)
+            if process.is_alive():
+                process.kill()
+            process.join()
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def run_tool(dataset,
+             tool: str,
+             is_canceled = None,
+             progress_callback = None,
+             **kwargs):
+    """
+    Runs fp.tl.<tool> on dataset, in a child process if isolation is
+    enabled. Datasets whose matrices are memory mapped or lazily read from
+    disk always run in the calling thread, as sharing them would read them
+    completely. There, a cancel only takes effect before the start.
+    """
+    if isolation_enabled() and not dataset.isbacked and not backing_files(dataset):
+        run_isolated(dataset, tool, is_canceled, progress_callback, **kwargs)
+        return
+    import FACSPy as fp
+    if is_canceled is not None and is_canceled():
+        raise OperationCanceled(f"{tool} was canceled.")
+    if progress_callback is not None:
+        progress_callback(None, f"Running {tool}")
+    materialize_on_write(dataset, getattr(fp.tl, tool), **kwargs)
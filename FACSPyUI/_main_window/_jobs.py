@@ -0,0 +1,347 @@
+import os
+import time
+import heapq
+import weakref
+import itertools
+
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
+                             QTableWidget, QTableWidgetItem, QAbstractItemView,
+                             QHeaderView, QLabel, QSpinBox)
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_HIGH: "high",
+    PRIORITY_NORMAL: "normal",
+    PRIORITY_LOW: "low"
+}
+
+# milliseconds between two looks at the running threads
+REAP_INTERVAL = 100
+
+# finished jobs that are still listed in the queue view
+HISTORY_LENGTH = 50
+
+# seconds a running job gets to stop when the application quits
+SHUTDOWN_TIMEOUT = 5
+
+
+def default_max_running() -> int:
+    # the FACSPy tools use all cores themselves, so few jobs run at once
+    return max(1, min(2, (os.cpu_count() or 2) // 2))
+
+
+class Job:
+    """
+    A QThread worker with its scheduling information. The worker needs
+    the finished and error signals and a stop() method. Workers that can
+    be terminated without leaving a broken file or state behind say so
+    with a can_terminate() method that returns True.
+
+    Jobs are serialized on the dataset object the worker holds in its
+    dataset attribute, so renaming the dataset does not let a second
+    writer in. Workers without a dataset fall back to dataset_key.
+    """
+
+    def __init__(self,
+                 worker,
+                 label: str,
+                 dataset_key: str = None,
+                 priority: int = PRIORITY_NORMAL,
+                 writes: bool = True):
+        self.worker = worker
+        self.label = label
+        self.dataset_key = dataset_key
+        self.priority = priority
+        self.writes = writes
+        dataset = getattr(worker, "dataset", None)
+        # a weak reference, so that a finished job does not keep the dataset alive
+        self._dataset = weakref.ref(dataset) if dataset is not None else None
+        self._dataset_id = id(dataset)
+        self.state = "queued"
+        self.submitted = time.time()
+        self.started = None
+        self.ended = None
+
+    def can_terminate(self) -> bool:
+        can_terminate = getattr(self.worker, "can_terminate", None)
+        return can_terminate is not None and can_terminate()
+
+    @property
+    def resource(self):
+        """
+        What the job is serialized on. Once the dataset is gone its id
+        might be reused, so the job no longer claims it.
+        """
+        if self._dataset is not None:
+            return ("dataset", self._dataset_id) if self._dataset() is not None else None
+        if self.dataset_key is not None:
+            return ("key", self.dataset_key)
+        return None
+
+    def __repr__(self):
+        return f"Job({self.label!r}, dataset = {self.dataset_key!r}, state = {self.state!r})"
+
+
+class JobScheduler(QObject):
+    """
+    Runs the background workers of all windows on a bounded number of
+    threads. Queued jobs start by priority, then in submission order.
+    Jobs that write to a dataset run alone on that dataset, jobs that only
+    read it may run next to each other.
+    """
+    jobs_changed = pyqtSignal()
+
+    def __init__(self, max_running: int = None):
+        super().__init__()
+        self.max_running = max_running or default_max_running()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._running = []
+        self._history = []
+        self._timer = QTimer(self)
+        self._timer.setInterval(REAP_INTERVAL)
+        self._timer.timeout.connect(self._reap)
+
+    def submit(self,
+               worker,
+               label: str,
+               dataset_key: str = None,
+               priority: int = PRIORITY_NORMAL,
+               writes: bool = True) -> Job:
+        """
+        Queues a worker instead of starting it. dataset_key is the
+        DATASHACK entry the worker works on, None for none.
+        """
+        job = Job(worker, label, dataset_key, priority, writes)
+        worker.finished.connect(lambda: self._set_state(job, "done"))
+        worker.error.connect(lambda _: self._set_state(job, "failed"))
+        heapq.heappush(self._queue, (priority, next(self._sequence), job))
+        self._dispatch()
+        self.jobs_changed.emit()
+        return job
+
+    def _set_state(self, job: Job, state: str):
+        # canceled jobs report the cancellation as an error
+        if job.state != "canceled":
+            job.state = state
+        self.jobs_changed.emit()
+
+    def _can_start(self, job: Job, starting: list) -> bool:
+        if job.resource is None:
+            return True
+        for other in self._running + starting:
+            if other.resource == job.resource and (job.writes or other.writes):
+                return False
+        return True
+
+    def _dispatch(self):
+        """
+        Starts queued jobs while threads are free. A job that has to wait
+        for its dataset does not block the jobs behind it.
+        """
+        waiting = []
+        starting = []
+        while self._queue and len(self._running) + len(starting) < self.max_running:
+            entry = heapq.heappop(self._queue)
+            if self._can_start(entry[2], starting):
+                starting.append(entry[2])
+            else:
+                waiting.append(entry)
+        for entry in waiting:
+            heapq.heappush(self._queue, entry)
+
+        for job in starting:
+            job.state = "running"
+            job.started = time.time()
+            self._running.append(job)
+            job.worker.start()
+        if self._running:
+            self._timer.start()
+
+    def _reap(self):
+        finished = [job for job in self._running if job.worker.isFinished()]
+        if not finished:
+            return
+        for job in finished:
+            self._running.remove(job)
+            job.ended = time.time()
+            if job.state == "running":
+                # the worker returned without reporting a result
+                job.state = "done"
+            self._history.append(job)
+        del self._history[:-HISTORY_LENGTH]
+        if not self._running:
+            self._timer.stop()
+        self._dispatch()
+        self.jobs_changed.emit()
+
+    def cancel(self, job: Job):
+        """
+        Cancels a job. Queued jobs are removed and report the cancellation
+        through their error signal, running jobs are asked to stop.
+        """
+        job.worker.stop()
+        if job.state != "queued":
+            return
+        self._queue = [entry for entry in self._queue if entry[2] is not job]
+        heapq.heapify(self._queue)
+        job.state = "canceled"
+        job.ended = time.time()
+        self._history.append(job)
+        job.worker.error.emit(f"{job.label} was canceled.")
+        self.jobs_changed.emit()
+
+    def set_priority(self, job: Job, priority: int):
+        if job.state != "queued":
+            return
+        job.priority = priority
+        self._queue = [
+            (priority, sequence, queued) if queued is job else (queued_priority, sequence, queued)
+            for queued_priority, sequence, queued in self._queue
+        ]
+        heapq.heapify(self._queue)
+        self.jobs_changed.emit()
+
+    def set_max_running(self, max_running: int):
+        self.max_running = max(1, max_running)
+        self._dispatch()
+        self.jobs_changed.emit()
+
+    def is_busy(self, dataset_key: str) -> bool:
+        return any(job.dataset_key == dataset_key for job in self.jobs() if job.state in ("queued", "running"))
+
+    def uses(self, dataset) -> bool:
+        """
+        Whether a queued or running job still holds dataset. Workers that
+        are done with their dataset may drop it before they finish.
+        """
+        return any(getattr(job.worker, "dataset", None) is dataset
+                   for job in self._running + [entry[2] for entry in self._queue]
+                   if not job.worker.isFinished())
+
+    def jobs(self) -> list:
+        """
+        Returns the running jobs, the queued jobs in start order and the
+        most recently finished jobs.
+        """
+        return self._running + [entry[2] for entry in sorted(self._queue)] + self._history[::-1]
+
+    def running_jobs(self) -> list:
+        return [job for job in self._running if not job.worker.isFinished()]
+
+    def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT):
+        """
+        Drops the queued jobs and asks the running ones to stop. Jobs that
+        can be terminated are terminated once timeout seconds have passed,
+        the others are waited for, e.g. a save that rewrites its file in
+        place. The main window warns about both before it closes.
+        """
+        for _, _, job in list(self._queue):
+            self.cancel(job)
+        deadline = time.time() + timeout
+        for job in list(self._running):
+            job.worker.stop()
+        for job in list(self._running):
+            if job.can_terminate() and not job.worker.wait(max(int((deadline - time.time()) * 1000), 0)):
+                job.worker.terminate()
+            job.worker.wait()
+
+
+class JobQueueWindow(QWidget):
+    """
+    Lists the running, queued and finished jobs of the scheduler.
+    """
+    COLUMNS = ["Job", "Dataset", "Priority", "State", "Time"]
+
+    def __init__(self, main_window):
+        super().__init__()
+        self.main_window = main_window
+        self.scheduler = main_window.jobs
+
+        self.setWindowTitle("Jobs")
+        self.setGeometry(150, 150, 700, 400)
+
+        layout = QVBoxLayout()
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(QLabel("Parallel jobs:"))
+        self.max_running_input = QSpinBox()
+        self.max_running_input.setRange(1, os.cpu_count() or 1)
+        self.max_running_input.setValue(self.scheduler.max_running)
+        self.max_running_input.valueChanged.connect(self.scheduler.set_max_running)
+        button_layout.addWidget(self.max_running_input)
+        button_layout.addStretch()
+
+        self.raise_button = QPushButton("Run Next")
+        self.raise_button.clicked.connect(lambda: self.set_priority(PRIORITY_HIGH))
+        self.lower_button = QPushButton("Run Later")
+        self.lower_button.clicked.connect(lambda: self.set_priority(PRIORITY_LOW))
+        self.cancel_button = QPushButton("Cancel Job")
+        self.cancel_button.clicked.connect(self.cancel_job)
+        button_layout.addWidget(self.raise_button)
+        button_layout.addWidget(self.lower_button)
+        button_layout.addWidget(self.cancel_button)
+        layout.addLayout(button_layout)
+
+        self.setLayout(layout)
+
+        self._jobs = []
+        self.scheduler.jobs_changed.connect(self.refresh)
+        # updates the run times
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.refresh)
+        self._timer.start(1000)
+        self.refresh()
+
+    def refresh(self):
+        selected = self.selected_job()
+        self._jobs = self.scheduler.jobs()
+        self.table.setRowCount(len(self._jobs))
+        now = time.time()
+        for row, job in enumerate(self._jobs):
+            if job.started is None:
+                duration = now - job.submitted if job.ended is None else 0
+            else:
+                duration = (job.ended or now) - job.started
+            values = [job.label,
+                      job.dataset_key or "",
+                      PRIORITY_NAMES.get(job.priority, str(job.priority)),
+                      job.state,
+                      f"{duration:.0f} s"]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+            if job is selected:
+                self.table.selectRow(row)
+
+    def selected_job(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows or rows[0].row() >= len(self._jobs):
+            return None
+        return self._jobs[rows[0].row()]
+
+    def set_priority(self, priority: int):
+        job = self.selected_job()
+        if job is not None:
+            self.scheduler.set_priority(job, priority)
+
+    def cancel_job(self):
+        job = self.selected_job()
+        if job is not None and job.state in ("queued", "running"):
+            self.scheduler.cancel(job)
+
+    def closeEvent(self, event):
+        self._timer.stop()
+        self.scheduler.jobs_changed.disconnect(self.refresh)
+        super().closeEvent(event)
@@ -0,0 +1,232 @@
+import os
+import time
+import weakref
+import threading
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+from ._dataset_io import OperationCanceled
+from ._isolated import run_tool, _share, _attach
+
+# memory the worker processes of a sweep may use together
+SWEEP_MEMORY_BUDGET = 8 * 1024 ** 3
+
+# bytes an edge takes in the igraph of a worker process, with its weight
+BYTES_PER_EDGE = 64
+
+# graph and settings of this worker process, set once when the process starts
+_graph = None
+_use_weights = True
+_blocks = []
+
+
+def default_n_processes(n_resolutions: int,
+                        n_edges: int = 0) -> int:
+    """
+    One core is left for the GUI. Every process holds its own copy of the
+    graph, so large graphs run on fewer processes.
+    """
+    by_memory = SWEEP_MEMORY_BUDGET // max(n_edges * BYTES_PER_EDGE, 1)
+    return max(min(n_resolutions, (os.cpu_count() or 2) - 1, by_memory), 1)
+
+
+def parse_resolutions(text: str) -> list:
+    """
+    Parses '0.2, 0.5, 1.0' or a range 'start:stop:step' that includes stop.
+    Returns the sorted resolutions without duplicates.
+    """
+    text = text.strip()
+    if not text:
+        return []
+    if ":" in text:
+        parts = [float(part) for part in text.split(":")]
+        if len(parts) != 3:
+            raise ValueError("A resolution range has to be given as start:stop:step.")
+        start, stop, step = parts
+        if step <= 0 or stop < start:
+            raise ValueError("A resolution range needs a positive step and stop >= start.")
+        n_steps = int(round((stop - start) / step))
+        resolutions = [round(start + i * step, 10) for i in range(n_steps + 1)]
+    else:
+        resolutions = [float(part) for part in text.replace(";", ",").split(",") if part.strip()]
+    if any(resolution <= 0 for resolution in resolutions):
+        raise ValueError("Resolutions have to be positive.")
+    return sorted(set(resolutions))
+
+
+def sweep_column(gate: str, layer: str, resolution: float) -> str:
+    return f"{gate.split('/')[-1]}_{layer}_leiden_{resolution:g}"
+
+
+# id of the dataset -> (weak reference to the dataset, {graph settings: (neighbors key, weak reference to the graph)}).
+# The identity of the graph tells whether it was replaced since the sweep built it.
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def _graph_records(dataset) -> dict:
+    with _graphs_lock:
+        for dataset_id in [dataset_id for dataset_id, (reference, _) in _graphs.items() if reference() is None]:
+            del _graphs[dataset_id]
+        entry = _graphs.get(id(dataset))
+        if entry is None or entry[0]() is not dataset:
+            entry = (weakref.ref(dataset), {})
+            _graphs[id(dataset)] = entry
+        return entry[1]
+
+
+def _neighbors_graphs(dataset) -> dict:
+    """
+    Returns {neighbors key: connectivities} of the graphs scanpy has
+    registered in uns.
+    """
+    graphs = {}
+    for key, value in dataset.uns.items():
+        if isinstance(value, dict) and value.get("connectivities_key") in dataset.obsp.keys():
+            graphs[key] = dataset.obsp[value["connectivities_key"]]
+    return graphs
+
+
+def shared_graph(dataset,
+                 neighbors_kwargs: dict,
+                 is_canceled = None,
+                 progress_callback = None) -> tuple:
+    """
+    Returns the connectivities of the kNN graph for the gate, layer and
+    channels in neighbors_kwargs and whether an earlier sweep's graph was
+    reused. The graph is only computed if the last one built with the
+    same settings was removed or replaced since.
+    """
+    records = _graph_records(dataset)
+    settings = repr(sorted((key, tuple(value) if isinstance(value, list) else value)
+                           for key, value in neighbors_kwargs.items()))
+    graphs = _neighbors_graphs(dataset)
+    record = records.get(settings)
+    if record is not None and record[0] in graphs and graphs[record[0]] is record[1]():
+        return graphs[record[0]], True
+
+    # holds the previous graphs, so that their ids cannot be reused
+    before = graphs
+    run_tool(dataset, "neighbors", is_canceled, progress_callback, **neighbors_kwargs)
+    graphs = _neighbors_graphs(dataset)
+    new = [key for key, graph in graphs.items() if before.get(key) is not graph]
+    if len(new) != 1:
+        raise RuntimeError("Could not find the neighbors graph that was just computed.")
+    records[settings] = (new[0], weakref.ref(graphs[new[0]]))
+    return graphs[new[0]], False
+
+
+def _init_worker(descriptor: tuple, directed: bool, use_weights: bool):
+    """
+    Builds the igraph once per process, the resolutions then only run
+    the partitioning on it.
+    """
+    global _graph, _use_weights
+    import igraph as ig
+
+    matrix = _attach(descriptor, _blocks).tocoo()
+    # igraph reads the edges from the array without creating Python tuples
+    _graph = ig.Graph(n = matrix.shape[0],
+                      edges = np.column_stack((matrix.row, matrix.col)).astype(np.int64),
+                      directed = directed)
+    _graph.es["weight"] = matrix.data
+    del matrix
+    _use_weights = use_weights
+
+
+def leiden_membership(resolution: float,
+                      n_iterations: int,
+                      random_state: int) -> tuple:
+    """
+    Runs in a worker process. Returns the resolution, the cluster of every
+    cell of the graph and the seconds it took.
+    """
+    import leidenalg
+
+    start = time.time()
+    partition = leidenalg.find_partition(_graph,
+                                         leidenalg.RBConfigurationVertexPartition,
+                                         weights = "weight" if _use_weights else None,
+                                         resolution_parameter = resolution,
+                                         n_iterations = n_iterations,
+                                         seed = random_state)
+    return resolution, np.asarray(partition.membership), time.time() - start
+
+
+def leiden_sweep(dataset,
+                 gate: str,
+                 layer: str,
+                 resolutions: list,
+                 neighbors_kwargs: dict,
+                 directed: bool = True,
+                 use_weights: bool = True,
+                 n_iterations: int = -1,
+                 random_state: int = 0,
+                 is_canceled = None,
+                 progress_callback = None,
+                 n_processes: int = None) -> tuple:
+    """
+    Runs Leiden for every resolution on one shared kNN graph, each
+    resolution in its own task on a process pool. Writes one obs column
+    per resolution, cells outside the gate stay empty.
+    progress_callback receives (fraction or None, stage).
+    Returns [(resolution, column, n_clusters, seconds)] in resolution
+    order and whether the graph was reused.
+    """
+    if progress_callback is None:
+        progress_callback = lambda fraction, stage: None
+    connectivities, reused = shared_graph(dataset, neighbors_kwargs, is_canceled, progress_callback)
+
+    # cells outside the gate have no neighbors
+    in_gate = np.asarray(connectivities.getnnz(axis = 1) > 0)
+    graph = connectivities.tocsr()[in_gate][:, in_gate]
+    progress_callback(0, f"Clustering {len(resolutions)} resolutions")
+
+    blocks = []
+    pool = None
+    try:
+        descriptor = _share(graph, blocks)
+        # forking a process that runs Qt is not safe
+        n_processes = n_processes or default_n_processes(len(resolutions), graph.nnz)
+        pool = multiprocessing.get_context("spawn").Pool(processes = n_processes,
+                                                         initializer = _init_worker,
+                                                         initargs = (descriptor, directed, use_weights))
+        results = [pool.apply_async(leiden_membership, (resolution, n_iterations, random_state))
+                   for resolution in resolutions]
+        pool.close()
+
+        pending = set(range(len(results)))
+        while pending:
+            if is_canceled is not None and is_canceled():
+                raise OperationCanceled("Leiden resolution sweep was canceled.")
+            for i in [i for i in pending if results[i].ready()]:
+                pending.remove(i)
+                if not results[i].successful():
+                    try:
+                        results[i].get()
+                    except Exception as e:
+                        raise RuntimeError(f"Leiden failed at resolution {resolutions[i]:g}: {e}")
+                done = len(results) - len(pending)
+                progress_callback(done / len(results),
+                                  f"Clustering {len(resolutions)} resolutions\nresolution {resolutions[i]:g} done ({done} of {len(results)})")
+            time.sleep(0.1)
+        memberships = [result.get() for result in results]
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    # the columns are only written once all resolutions are done
+    report = []
+    for resolution, membership, seconds in memberships:
+        labels = np.full(dataset.n_obs, np.nan, dtype = object)
+        labels[in_gate] = membership.astype(str)
+        column = sweep_column(gate, layer, resolution)
+        dataset.obs[column] = pd.Categorical(labels, categories = [str(i) for i in range(membership.max() + 1)])
+        report.append((resolution, column, int(membership.max()) + 1, seconds))
+    return report, reused
@@ -8,3 +8,6 @@ else:
     DATA_PATH = "./_datasets"
     ICON_PATH = "./_icons"
 
+
+# autosave checkpoints of the open datasets, one directory per session
+CHECKPOINT_PATH = os.path.join(os.path.expanduser("~"), ".facspyui", "checkpoints")
@@ -0,0 +1,267 @@
+import time
+import hashlib
+import weakref
+import threading
+
+from PyQt5.QtCore import pyqtSignal, QThread, QMutex, QMutexLocker
+
+from ._dataset_io import OperationCanceled, component_fingerprints
+from ._isolated import run_tool
+from ._datashack import materialize_on_write
+
+# tools a pipeline step can run
+STEP_TOOLS = ("transform", "neighbors", "umap", "leiden")
+
+# components every tool rewrites for bookkeeping. They do not identify
+# the results of a step, the obs columns are tracked one by one instead.
+BOOKKEEPING_COMPONENTS = ("obs", "var", "uns/settings")
+
+
+class PipelineStep:
+    """
+    One tool call of a pipeline. params are the keyword arguments of the
+    tool, depends_on the names of the steps whose results it uses.
+    """
+
+    def __init__(self,
+                 name: str,
+                 tool: str,
+                 params: dict = None,
+                 depends_on: list = None):
+        if tool not in STEP_TOOLS:
+            raise ValueError(f"Unknown tool {tool!r}, choose one of {', '.join(STEP_TOOLS)}.")
+        self.name = name
+        self.tool = tool
+        self.params = params or {}
+        self.depends_on = depends_on or []
+
+    def __repr__(self):
+        return f"PipelineStep({self.name!r}, {self.tool!r}, {self.params!r}, depends_on = {self.depends_on!r})"
+
+
+class Pipeline:
+    """
+    A DAG of steps. The common parameters apply to every step except
+    transform and are overridden by the parameters of a step. The layer
+    is also the layer a transform step writes.
+    """
+
+    def __init__(self,
+                 steps: list,
+                 common_params: dict = None):
+        self.steps = steps
+        self.common_params = common_params or {}
+
+    def step_params(self, step: PipelineStep) -> dict:
+        if step.tool == "transform":
+            return {"layer": self.common_params.get("layer"), **step.params}
+        return {**self.common_params, **step.params}
+
+    def ordered_steps(self) -> list:
+        """
+        Returns the steps so that every step comes after its dependencies.
+        """
+        steps = {step.name: step for step in self.steps}
+        if len(steps) != len(self.steps):
+            raise ValueError("Step names must be unique.")
+        ordered = []
+        visiting = set()
+
+        def visit(step):
+            if step in ordered:
+                return
+            if step.name in visiting:
+                raise ValueError(f"Step {step.name!r} depends on itself.")
+            visiting.add(step.name)
+            for dependency in step.depends_on:
+                if dependency not in steps:
+                    raise ValueError(f"Step {step.name!r} depends on the unknown step {dependency!r}.")
+                visit(steps[dependency])
+            visiting.remove(step.name)
+            ordered.append(step)
+
+        for step in self.steps:
+            visit(step)
+        return ordered
+
+
+def default_pipeline(layer: str = "transformed",
+                     gate: str = None) -> Pipeline:
+    """
+    transform -> neighbors -> UMAP and Leiden.
+    """
+    return Pipeline(
+        steps = [
+            PipelineStep("transform", "transform", {"transform": "asinh"}),
+            PipelineStep("neighbors", "neighbors", {"n_neighbors": 15}, ["transform"]),
+            PipelineStep("umap", "umap", {}, ["neighbors"]),
+            PipelineStep("leiden", "leiden", {"resolution": 1.0}, ["neighbors"])
+        ],
+        common_params = {"gate": gate, "layer": layer, "use_only_fluo": True,
+                         "scaling": "MinMaxScaler", "exclude": None}
+    )
+
+
+# id of the dataset -> (weak reference to the dataset, {step name: (key, outputs)}).
+# Fingerprints of arrays contain their object identity, so the records
+# are only valid for the dataset object they were made for.
+_runs = {}
+_runs_lock = threading.Lock()
+
+
+def _step_records(dataset) -> dict:
+    with _runs_lock:
+        for dataset_id in [dataset_id for dataset_id, (reference, _) in _runs.items() if reference() is None]:
+            del _runs[dataset_id]
+        entry = _runs.get(id(dataset))
+        if entry is None or entry[0]() is not dataset:
+            entry = (weakref.ref(dataset), {})
+            _runs[id(dataset)] = entry
+        return entry[1]
+
+
+def _input_components(tool: str, params: dict) -> list:
+    if tool == "transform":
+        return ["layers/compensated", "uns/cofactors"]
+    return [f"layers/{params.get('layer')}", "obsm/gating"]
+
+
+def _obs_fingerprints(dataset) -> dict:
+    import pandas as pd
+    return {
+        f"obs/{column}": pd.util.hash_pandas_object(dataset.obs[column], index = False).sum()
+        for column in dataset.obs.columns
+    }
+
+
+def _fingerprints(dataset) -> dict:
+    fingerprints = component_fingerprints(dataset)
+    fingerprints.update(_obs_fingerprints(dataset))
+    return fingerprints
+
+
+def _step_key(step: PipelineStep,
+              params: dict,
+              fingerprints: dict,
+              records: dict) -> str:
+    """
+    Identifies the tool, its parameters, the components it reads and the
+    results of the steps it depends on.
+    """
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(repr((step.tool, sorted(params.items(), key = lambda item: item[0]))).encode())
+    for component in _input_components(step.tool, params):
+        digest.update(repr((component, fingerprints.get(component))).encode())
+    for dependency in step.depends_on:
+        digest.update(repr(sorted(records[dependency][1].items())).encode())
+    return digest.hexdigest()
+
+
+def _run_transform(dataset, params: dict):
+    import pandas as pd
+    import FACSPy as fp
+
+    params = dict(params)
+    transform = params.pop("transform", "asinh")
+    layer = params.pop("layer")
+    cofactor = params.pop("cofactor", None)
+    cofactor_table = dataset.uns.get("cofactors")
+    if cofactor is not None:
+        cofactor_table = fp.dt.CofactorTable(cofactors = pd.DataFrame({
+            "fcs_colname": list(dataset.var.index),
+            "cofactors": [float(cofactor)] * dataset.n_vars
+        }))
+    materialize_on_write(dataset,
+                         fp.dt.transform,
+                         transform = transform,
+                         key_added = layer,
+                         cofactor_table = cofactor_table,
+                         transform_kwargs = params)
+    fp.sync.synchronize_dataset(dataset)
+
+
+def run_pipeline(dataset,
+                 pipeline: Pipeline,
+                 is_canceled = None,
+                 progress_callback = None) -> tuple:
+    """
+    Runs the steps of pipeline in order. A step is skipped if its tool,
+    parameters and inputs are the same as in its last run on this dataset
+    and its results are still unchanged in the dataset. Changes are found
+    by hashing the components completely, see component_fingerprints, so
+    a layer that was changed in place is never taken for the same input.
+    Returns the names of the computed and of the reused steps and the
+    seconds every computed step took.
+    """
+    records = _step_records(dataset)
+    steps = pipeline.ordered_steps()
+    computed, reused = [], []
+    seconds = {}
+    fingerprints = _fingerprints(dataset)
+    for number, step in enumerate(steps, start = 1):
+        if is_canceled is not None and is_canceled():
+            raise OperationCanceled("Pipeline was canceled.")
+        params = pipeline.step_params(step)
+        key = _step_key(step, params, fingerprints, records)
+        record = records.get(step.name)
+        if (record is not None and record[0] == key and record[1] and
+                all(fingerprints.get(component) == fingerprint for component, fingerprint in record[1].items())):
+            reused.append(step.name)
+            continue
+
+        stage = f"Step {number} of {len(steps)}: {step.name}"
+        step_progress = None
+        if progress_callback is not None:
+            progress_callback(None, stage)
+            step_progress = lambda fraction, detail, stage = stage: progress_callback(fraction, f"{stage}\n{detail}")
+        start = time.time()
+        if step.tool == "transform":
+            _run_transform(dataset, params)
+        else:
+            run_tool(dataset, step.tool, is_canceled, step_progress, **params)
+        seconds[step.name] = time.time() - start
+
+        after = _fingerprints(dataset)
+        outputs = {
+            component: fingerprint for component, fingerprint in after.items()
+            if component not in BOOKKEEPING_COMPONENTS and fingerprints.get(component) != fingerprint
+        }
+        # a step may rewrite what it reads, e.g. the cofactors of a transform
+        records[step.name] = (_step_key(step, params, after, records), outputs)
+        fingerprints = after
+        computed.append(step.name)
+
+    return computed, reused, seconds
+
+
+class PipelineWorker(QThread):
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+    # (fraction done or None, stage)
+    progress = pyqtSignal(object, str)
+
+    def __init__(self, dataset, pipeline):
+        super().__init__()
+        self.dataset = dataset
+        self.pipeline = pipeline
+        self.computed = []
+        self.reused = []
+        self.seconds = {}
+        self._is_running = True
+        self._mutex = QMutex()
+
+    def run(self):
+        try:
+            self.computed, self.reused, self.seconds = run_pipeline(self.dataset, self.pipeline,
+                                                                    self.is_canceled, self.progress.emit)
+            self.finished.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+
+    def is_canceled(self) -> bool:
+        with QMutexLocker(self._mutex):
+            return not self._is_running
+
+    def stop(self):
+        with QMutexLocker(self._mutex):
+            self._is_running = False
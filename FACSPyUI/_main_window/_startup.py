@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import importlib
+import threading
+from contextlib import contextmanager
+
+from PyQt5.QtCore import pyqtSignal, QThread
+
+# (splash message, module) pairs the first window cannot be built without
+REQUIRED_MODULES = [
+    ("Initializing module numpy...", "numpy"),
+    ("Initializing module pandas...", "pandas"),
+    ("Initializing module matplotlib...", "matplotlib.pyplot"),
+    ("Initializing module plotly...", "plotly"),
+]
+
+# modules that are only needed once an analysis is run. They are
+# imported in the background after the window is shown or, if the
+# user is faster, on first use via ModuleLoader.require()
+DEFERRED_MODULES = [
+    "seaborn",
+    "scipy",
+    "sklearn",
+    "scanpy",
+    "FACSPy",
+]
+
+
+class StartupProfiler:
+    """
+    Records the begin and end of every startup phase. The phases are
+    written as a Chrome trace file that can be opened in chrome://tracing
+    or https://ui.perfetto.dev. A disabled profiler records nothing.
+    """
+
+    def __init__(self,
+                 output_path: str = None,
+                 start: float = None):
+        self.output_path = output_path
+        self.enabled = output_path is not None
+        self.start = time.perf_counter() if start is None else start
+        self.events = []
+        self._lock = threading.Lock()
+
+    def record(self,
+               name: str,
+               begin: float,
+               end: float,
+               category: str = "startup"):
+        """
+        Stores a finished phase. Times are perf_counter values.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (begin - self.start) * 1e6,
+                "dur": (end - begin) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident()
+            })
+
+    @contextmanager
+    def phase(self,
+              name: str,
+              category: str = "startup"):
+        """
+        Times the enclosed block as one phase.
+        """
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, begin, time.perf_counter(), category)
+
+    def mark(self,
+             name: str):
+        """
+        Records a point in time, e.g. the first event loop iteration.
+        """
+        now = time.perf_counter()
+        self.record(name, now, now, category = "mark")
+
+    def write(self) -> str:
+        """
+        Writes all phases recorded so far to the output file. Can be called
+        repeatedly, the file is overwritten each time. Returns the path of
+        the file, None if the profiler is disabled.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            events = sorted(self.events, key = lambda event: event["ts"])
+        end = max((event["ts"] + event["dur"] for event in events), default = 0)
+        trace = {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "total_seconds": end / 1e6,
+                "python": sys.version.split()[0]
+            }
+        }
+        with open(self.output_path, "w") as output_file:
+            json.dump(trace, output_file, indent = 1)
+        return os.path.abspath(self.output_path)
+
+
+class DeferredImportWorker(QThread):
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, module_loader):
+        super().__init__()
+        self.module_loader = module_loader
+
+    def run(self):
+        try:
+            for module_name in self.module_loader.deferred:
+                self.module_loader.import_module(module_name, origin = "background")
+            self.finished.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+
+
+class ModuleLoader:
+    """
+    Imports the modules needed for the first window on the GUI thread and
+    defers the rest of the scientific stack. Every import is timed so that
+    slow startups can be traced back to a specific library.
+    """
+
+    def __init__(self,
+                 required: list = None,
+                 deferred: list = None,
+                 profiler: StartupProfiler = None):
+        self.required = REQUIRED_MODULES if required is None else required
+        self.deferred = DEFERRED_MODULES if deferred is None else deferred
+        self.profiler = StartupProfiler() if profiler is None else profiler
+        self.timings = {}
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def import_module(self,
+                      module_name: str,
+                      origin: str):
+        """
+        Imports a module and records how long the import took. Modules that
+        were already pulled in by another import are recorded as 'preloaded'.
+        """
+        # importlib waits for imports that are still running on another
+        # thread, so the module is never returned half initialized
+        if module_name in sys.modules:
+            origin = "preloaded"
+
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        end = time.perf_counter()
+
+        with self._lock:
+            first_import = module_name not in self.timings
+            self.timings.setdefault(module_name, {"seconds": end - start, "origin": origin})
+        if first_import:
+            self.profiler.record(f"import {module_name}", start, end, category = f"import ({origin})")
+
+        return module
+
+    def load_required(self, splash = None):
+        """
+        Sequentially imports the modules of the first window and updates the splash screen.
+        """
+        for message, module_name in self.required:
+            if splash is not None:
+                splash.show_message(message)
+            self.import_module(module_name, origin = "startup")
+
+    def start_deferred(self, on_error = None):
+        """
+        Starts importing the deferred modules in a background thread.
+        on_error receives the message if an import fails, the module is
+        then imported again on first use. When profiling, the import
+        timings are reported once all modules are loaded.
+        """
+        if self._worker is not None:
+            return
+        self._worker = DeferredImportWorker(self)
+        if self.profiler.enabled:
+            self._worker.finished.connect(self._report_profile)
+        if on_error is not None:
+            self._worker.error.connect(on_error)
+        self._worker.start()
+
+    def _report_profile(self):
+        # rewrite the profile so that it includes the background imports
+        output_path = self.profiler.write()
+        print(f"{self.report()}\nStartup profile written to {output_path}")
+
+    def require(self, module_name: str):
+        """
+        Returns the module, importing it on the calling thread if the background
+        loader has not reached it yet.
+        """
+        return self.import_module(module_name, origin = "first use")
+
+    def report(self) -> str:
+        """
+        Returns a human readable summary of all recorded import timings.
+        """
+        with self._lock:
+            timings = dict(self.timings)
+
+        total = sum(entry["seconds"] for entry in timings.values())
+        pending = [module_name for module_name in self.deferred if module_name not in timings]
+
+        lines = ["Module imports:"]
+        for module_name, entry in timings.items():
+            lines.append(f"\t{module_name}: {entry['seconds']:.2f} s ({entry['origin']})")
+        lines.append(f"Total import time: {total:.2f} s")
+        if pending:
+            lines.append(f"Not yet loaded: {', '.join(pending)}")
+
+        return "\n".join(lines)
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+
+class DataFrameTableModel(QAbstractTableModel):
+    """
+    Editable table model that stores the cells of a DataFrame in one
+    object array. The view only asks for the cells that are visible, so
+    tables with many rows open without creating an item per cell. Cells
+    are displayed and edited as text and to_dataframe() returns all
+    columns as strings, like reading every cell text of a QTableWidget.
+    """
+
+    def __init__(self,
+                 dataframe: pd.DataFrame = None,
+                 headers: list = None):
+        super().__init__()
+        self._headers = []
+        self._values = np.empty((0, 0), dtype = object)
+        if dataframe is not None:
+            self.load_dataframe(dataframe)
+        elif headers is not None:
+            self.load_dataframe(pd.DataFrame(columns = headers))
+
+    def load_dataframe(self, dataframe: pd.DataFrame):
+        self.beginResetModel()
+        self._headers = [str(column) for column in dataframe.columns]
+        self._values = dataframe.to_numpy(dtype = object).copy()
+        self.endResetModel()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Returns the table as a DataFrame of strings.
+        """
+        return pd.DataFrame(self._values, columns = self._headers).astype(str)
+
+    def rowCount(self, parent = QModelIndex()):
+        return 0 if parent.isValid() else self._values.shape[0]
+
+    def columnCount(self, parent = QModelIndex()):
+        return 0 if parent.isValid() else len(self._headers)
+
+    def data(self, index, role = Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        return str(self._values[index.row(), index.column()])
+
+    def setData(self, index, value, role = Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        self._values[index.row(), index.column()] = str(value)
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+
+    def headerData(self, section, orientation, role = Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self._headers[section] if section < len(self._headers) else None
+        return str(section + 1)
+
+    def setHeaderData(self, section, orientation, value, role = Qt.EditRole):
+        if orientation != Qt.Horizontal or role not in (Qt.DisplayRole, Qt.EditRole):
+            return False
+        self._headers[section] = str(value)
+        self.headerDataChanged.emit(orientation, section, section)
+        return True
+
+    def header(self, section: int) -> str:
+        return self._headers[section]
+
+    def add_column(self, name: str = "new column"):
+        column = len(self._headers)
+        self.beginInsertColumns(QModelIndex(), column, column)
+        self._headers.append(name)
+        self._values = np.insert(self._values, column, "", axis = 1)
+        self.endInsertColumns()
+
+    def remove_column(self, column: int):
+        if not 0 <= column < len(self._headers):
+            return
+        self.beginRemoveColumns(QModelIndex(), column, column)
+        del self._headers[column]
+        self._values = np.delete(self._values, column, axis = 1)
+        self.endRemoveColumns()
+
+    def add_row(self):
+        row = self._values.shape[0]
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._values = np.insert(self._values, row, "", axis = 0)
+        self.endInsertRows()
+
+    def remove_row(self, row: int):
+        if not 0 <= row < self._values.shape[0]:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self._values = np.delete(self._values, row, axis = 0)
+        self.endRemoveRows()
@@ -0,0 +1,97 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QPalette, QColor
+
+from typing import Literal
+
+# Breeze colors of the widgets that are not covered by the stylesheet,
+# e.g. the matplotlib canvas background and the dropdown section headings
+PALETTE_COLORS = {
+    "light": {
+        QPalette.Window: "#eff0f1",
+        QPalette.WindowText: "#31363b",
+        QPalette.Base: "#fcfcfc",
+        QPalette.AlternateBase: "#eaebec",
+        QPalette.Text: "#31363b",
+        QPalette.Button: "#eff0f1",
+        QPalette.ButtonText: "#31363b",
+        QPalette.Highlight: "#3daee9",
+        QPalette.HighlightedText: "#31363b",
+        QPalette.ToolTipBase: "#eff0f1",
+        QPalette.ToolTipText: "#31363b"
+    },
+    "dark": {
+        QPalette.Window: "#31363b",
+        QPalette.WindowText: "#eff0f1",
+        QPalette.Base: "#1d2023",
+        QPalette.AlternateBase: "#31363b",
+        QPalette.Text: "#eff0f1",
+        QPalette.Button: "#31363b",
+        QPalette.ButtonText: "#eff0f1",
+        QPalette.Highlight: "#3daee9",
+        QPalette.HighlightedText: "#eff0f1",
+        QPalette.ToolTipBase: "#31363b",
+        QPalette.ToolTipText: "#eff0f1"
+    }
+}
+
+
+class ThemeManager(QObject):
+    """
+    Applies the light and dark Breeze themes to the whole application.
+    The stylesheet is only set on the QApplication, so Qt parses it once
+    per theme switch instead of once per window. Open windows are
+    repolished by Qt and do not need to set the stylesheet themselves.
+    Widgets that draw theme dependent colors themselves connect to
+    theme_changed.
+    """
+    theme_changed = pyqtSignal(str)
+
+    def __init__(self,
+                 app,
+                 light_stylesheet: str,
+                 dark_stylesheet: str):
+        super().__init__()
+        self.app = app
+        self._stylesheets = {
+            "light": light_stylesheet,
+            "dark": dark_stylesheet
+        }
+        self._palettes = {}
+        self.theme = None
+
+    @property
+    def is_dark(self) -> bool:
+        return self.theme == "dark"
+
+    @property
+    def stylesheet(self) -> str:
+        return self._stylesheets[self.theme or "light"]
+
+    def palette(self,
+                theme: Literal["light", "dark"]) -> QPalette:
+        """
+        Returns the palette of a theme. Palettes are built once and cached.
+        """
+        if theme not in self._palettes:
+            palette = QPalette()
+            for role, color in PALETTE_COLORS[theme].items():
+                palette.setColor(role, QColor(color))
+            self._palettes[theme] = palette
+        return self._palettes[theme]
+
+    def heading_color(self) -> QColor:
+        return QColor("white" if self.is_dark else "black")
+
+    def apply(self,
+              theme: Literal["light", "dark"]):
+        """
+        Switches the application to the given theme. Nothing happens
+        if the theme is already active.
+        """
+        assert theme in self._stylesheets
+        if theme == self.theme:
+            return
+        self.theme = theme
+        self.app.setPalette(self.palette(theme))
+        self.app.setStyleSheet(self._stylesheets[theme])
+        self.theme_changed.emit(theme)
@@ -47,7 +47,6 @@ class ToolBar(QToolBar, FileHandler):
             self.set_dark_mode()
         else:
             self.set_light_mode()
-        self.update_config_panel()
         self.update_file_icons()
         self.update_label()
 
@@ -68,14 +67,6 @@ class ToolBar(QToolBar, FileHandler):
             self.save_action.setIcon(QIcon(os.path.join(icon_path, "_save_light.svg")))
 
 
-    def update_config_panel(self):
-        config_panel = self.main_window.config_panel
-        current_index = config_panel.analysis_dropdown.currentIndex()
-        config_panel.analysis_dropdown.currentIndexChanged.disconnect(config_panel.on_analysis_type_selected)
-        config_panel.populate_analysis_dropdown()
-        config_panel.analysis_dropdown.currentIndexChanged.connect(config_panel.on_analysis_type_selected)
-        config_panel.analysis_dropdown.setCurrentIndex(current_index)
-
     def set_dark_mode(self):
         self.main_window.set_style_sheet("dark")
 
@@ -1,21 +1,38 @@
 from PyQt5.QtWidgets import (QWidget, QHBoxLayout, QDialog,
                              QVBoxLayout, QListWidget, QListWidgetItem,
                              QDialogButtonBox, QLabel, QLineEdit,
-                             QPushButton, QSizePolicy, QToolTip)
-from PyQt5.QtCore import Qt, pyqtSignal
+                             QPushButton, QSizePolicy, QToolTip,
+                             QProgressBar)
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 from PyQt5.QtGui import QMovie, QPixmap
 from PyQt5.QtSvg import QSvgWidget
 import os
+import time
 from ._paths import ICON_PATH as icon_dir
 from functools import wraps
 
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
 class LoadingScreen(QWidget):
+    """
+    Shows a spinner until the worker reports progress via set_progress,
+    then a progress bar with the current stage, elapsed time and ETA.
+    """
     cancel_signal = pyqtSignal()  # Signal to cancel the operation
 
     def __init__(self, main_window, message="Processing..."):
         super().__init__()
         self.main_window = main_window
-        self.setStyleSheet(self.main_window.stylesheet)
+        self.start_time = time.time()
+        # (stage, time, fraction) of the first report of the current stage
+        self._stage_start = None
         self.setWindowTitle("Loading")
         self.setWindowFlags(Qt.Window | Qt.WindowTitleHint | Qt.CustomizeWindowHint)
 
@@ -34,6 +51,24 @@ class LoadingScreen(QWidget):
         layout.addWidget(self.label, alignment = Qt.AlignCenter)
         layout.addWidget(self.spinner_label, alignment = Qt.AlignCenter)
 
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.hide()
+        self.stage_label = QLabel("")
+        self.stage_label.setAlignment(Qt.AlignCenter)
+        self.time_label = QLabel("")
+        self.time_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.stage_label)
+        layout.addWidget(self.time_label)
+
+        # keeps the elapsed time running between two reports
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_time)
+        self.timer.start(1000)
+        self._eta_end = None
+
         # Create and add the Cancel button
         self.cancel_button = QPushButton("Cancel")
         self.cancel_button.clicked.connect(self.on_cancel)
@@ -47,6 +82,45 @@ class LoadingScreen(QWidget):
         # Optionally, set a size hint if you want the window to have an initial size
         self.resize(self.sizeHint())
 
+    def set_progress(self, fraction, stage = "", detail = ""):
+        """
+        Shows the progress of the current stage. fraction is between 0
+        and 1 or None if the stage does not report how far it got. The
+        ETA is extrapolated from the rate of the current stage, detail
+        is shown below the stage without starting a new one.
+        """
+        now = time.time()
+        if self._stage_start is None or self._stage_start[0] != stage:
+            self._stage_start = (stage, now, fraction or 0)
+            self._eta_end = None
+        self.spinner_label.hide()
+        self.progress_bar.show()
+        self.stage_label.setText(f"{stage}\n{detail}" if detail else stage)
+
+        if fraction is None:
+            # busy indicator
+            self.progress_bar.setRange(0, 0)
+            self._eta_end = None
+        else:
+            self.progress_bar.setRange(0, 1000)
+            self.progress_bar.setValue(int(1000 * min(max(fraction, 0), 1)))
+            _, stage_time, stage_fraction = self._stage_start
+            if fraction > stage_fraction and now > stage_time:
+                rate = (fraction - stage_fraction) / (now - stage_time)
+                self._eta_end = now + (1 - fraction) / rate
+        self.update_time()
+
+    def update_time(self):
+        now = time.time()
+        text = f"Elapsed: {format_duration(now - self.start_time)}"
+        if self._eta_end is not None:
+            text += f"    Remaining: ~{format_duration(max(self._eta_end - now, 0))}"
+        self.time_label.setText(text)
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        super().closeEvent(event)
+
     def on_cancel(self):
         """
         Handle the cancel button click.
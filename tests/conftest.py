@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the application imports its modules relative to the FACSPyUI directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "FACSPyUI"))
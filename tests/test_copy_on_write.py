@@ -0,0 +1,54 @@
+import gc
+
+import pytest
+
+np = pytest.importorskip("numpy")
+ad = pytest.importorskip("anndata")
+pytest.importorskip("PyQt5")
+
+from _main_window._datashack import copy_on_write, materialize_on_write
+
+
+def _dataset():
+    X = np.arange(12, dtype = np.float64).reshape(4, 3)
+    return ad.AnnData(X = X, layers = {"transformed": X * 2})
+
+
+def _write_first_value(dataset, value: float):
+    dataset.layers["transformed"][0, 0] = value
+
+
+def test_write_to_source_leaves_copy_unchanged():
+    source = _dataset()
+    copied = copy_on_write(source)
+
+    materialize_on_write(source, _write_first_value, 100.0)
+
+    assert source.layers["transformed"][0, 0] == 100.0
+    assert copied.layers["transformed"][0, 0] == 0.0
+    assert not np.shares_memory(source.layers["transformed"], copied.layers["transformed"])
+
+
+def test_write_to_copy_leaves_source_unchanged():
+    source = _dataset()
+    copied = copy_on_write(source)
+
+    materialize_on_write(copied, _write_first_value, 100.0)
+
+    assert copied.layers["transformed"][0, 0] == 100.0
+    assert source.layers["transformed"][0, 0] == 0.0
+    assert not np.shares_memory(source.layers["transformed"], copied.layers["transformed"])
+
+
+def test_sole_holder_is_unlocked_without_copy():
+    source = _dataset()
+    layer = source.layers["transformed"]
+    copied = copy_on_write(source)
+    del copied
+    # AnnData objects refer to themselves through their mappings
+    gc.collect()
+
+    materialize_on_write(source, _write_first_value, 100.0)
+
+    assert source.layers["transformed"] is layer
+    assert layer[0, 0] == 100.0